@@ -0,0 +1,41 @@
+from django.contrib import admin
+from .models import CategorySales, ProductRelation, ProductSales, RecordedOrder, SalesTotal
+
+
+class RollupAdmin(admin.ModelAdmin):
+    list_filter = ['period']
+    date_hierarchy = 'bucket'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SalesTotal)
+class SalesTotalAdmin(RollupAdmin):
+    list_display = ['period', 'bucket', 'revenue', 'order_count', 'units_sold']
+
+
+@admin.register(ProductSales)
+class ProductSalesAdmin(RollupAdmin):
+    list_display = ['period', 'bucket', 'product', 'revenue', 'order_count', 'units_sold']
+    search_fields = ['product__name']
+
+
+@admin.register(CategorySales)
+class CategorySalesAdmin(RollupAdmin):
+    list_display = ['period', 'bucket', 'category', 'revenue', 'order_count', 'units_sold']
+
+
+@admin.register(RecordedOrder)
+class RecordedOrderAdmin(admin.ModelAdmin):
+    list_display = ['order', 'recorded_at']
+    search_fields = ['order__id']
+
+
+@admin.register(ProductRelation)
+class ProductRelationAdmin(admin.ModelAdmin):
+    list_display = ['product', 'rank', 'related', 'count']
+    search_fields = ['product__name']
@@ -0,0 +1,45 @@
+from orders.models import Order
+from tasks.queue import enqueue, enqueue_many, task
+
+from . import rollups
+
+
+@task('analytics.record_order')
+def record_order(payload):
+    # Đơn có thể đã bị hủy trước khi worker chạy tới
+    order = Order.objects.filter(pk=payload['order_id'], status__in=rollups.RECORDED_STATUSES).first()
+    if order is not None:
+        rollups.record_order(order)
+
+
+@task('analytics.record_orders')
+def record_orders(payload):
+    # Chạy lại cả lô khi lỗi cũng không cộng trùng (RecordedOrder)
+    rollups.record_orders(Order.objects.filter(pk__in=payload['order_ids']))
+
+
+@task('analytics.unrecord_order')
+def unrecord_order(payload):
+    order = Order.objects.filter(pk=payload['order_id']).exclude(status__in=rollups.RECORDED_STATUSES).first()
+    if order is not None:
+        rollups.unrecord_order(order)
+
+
+def record_later(order_id):
+    enqueue('analytics.record_order', {'order_id': order_id})
+
+
+def unrecord_later(order_id):
+    enqueue('analytics.unrecord_order', {'order_id': order_id})
+
+
+def record_orders_later(queryset, chunk_size=500):
+    """Đưa các đơn chưa được cộng trong queryset vào hàng đợi, mỗi task một lô; trả về số đơn"""
+    order_ids = list(
+        queryset.filter(status__in=rollups.RECORDED_STATUSES, analytics_record__isnull=True)
+        .values_list('pk', flat=True)
+    )
+    enqueue_many('analytics.record_orders', (
+        {'order_ids': order_ids[start:start + chunk_size]} for start in range(0, len(order_ids), chunk_size)
+    ))
+    return len(order_ids)
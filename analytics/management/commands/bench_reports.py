@@ -0,0 +1,123 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from analytics.reports import ReportEngine
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "So sánh báo cáo bằng ORM (vòng lặp kiểu calculate_total và aggregate) với ReportEngine "
+        "trên lịch sử đơn hàng tổng hợp; dữ liệu được tạo trong transaction và rollback sau khi chạy"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip-loop', action='store_true', help='Bỏ qua vòng lặp Python trên ORM instance')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options)
+            self.run(options['skip_loop'])
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        rng = random.Random(42)
+        started = time.perf_counter()
+        user = User.objects.create_user('__bench_reports__')
+        Category.objects.bulk_create([
+            Category(name=f'__bench_reports__ {i}') for i in range(20)
+        ])
+        # MySQL không trả id sau bulk_create: đọc lại
+        categories = list(Category.objects.filter(name__startswith='__bench_reports__'))
+        Product.objects.bulk_create([
+            Product(
+                name=f'Sản phẩm {i}', category=rng.choice(categories),
+                price=rng.randint(1, 500) * 1000, quantity=1000,
+            )
+            for i in range(options['products'])
+        ], batch_size=options['batch_size'])
+        products = list(Product.objects.filter(category__in=categories).order_by('pk'))
+        # Một số sản phẩm bán chạy hơn hẳn, giống catalog thật
+        weights = [1 / (rank + 1) for rank in range(len(products))]
+
+        count = options['orders']
+        batch_size = options['batch_size']
+        now = timezone.now()
+        for offset in range(0, count, batch_size):
+            size = min(batch_size, count - offset)
+            Order.objects.bulk_create([Order(user=user, status='completed', paid=True) for _ in range(size)])
+            orders = Order.objects.filter(user=user).order_by('-pk')[:size]
+            items = []
+            for order in orders:
+                basket = set(rng.choices(products, weights=weights, k=rng.randint(1, 8)))
+                items.extend(
+                    OrderItem(order=order, product=product, quantity=rng.randint(1, 5), price=product.price)
+                    for product in basket
+                )
+            OrderItem.objects.bulk_create(items, batch_size=batch_size)
+
+        # created_at là auto_now_add: rải đơn hàng ra các ngày bằng UPDATE theo khoảng id
+        order_ids = list(Order.objects.filter(user=user).order_by('pk').values_list('pk', flat=True))
+        per_day = max(len(order_ids) // options['days'], 1)
+        for day, start in enumerate(range(0, len(order_ids), per_day)):
+            chunk = order_ids[start:start + per_day]
+            Order.objects.filter(pk__gte=chunk[0], pk__lte=chunk[-1]).update(
+                created_at=now - timedelta(days=options['days'] - day, hours=rng.randint(0, 23))
+            )
+        self.stdout.write(f'Tạo {count} đơn hàng: {time.perf_counter() - started:.1f}s')
+
+    def run(self, skip_loop):
+        line_total = F('quantity') * F('price')
+        revenue = Sum(line_total, output_field=DecimalField(max_digits=14, decimal_places=2))
+        items = OrderItem.objects.filter(order__status__in=('processing', 'completed'))
+        orders = Order.objects.filter(status__in=('processing', 'completed'))
+
+        timings = []
+        if not skip_loop:
+            timings.append(('vòng lặp ORM: tổng từng đơn', self.measure(lambda: [
+                sum(item.get_total_price() for item in order.items.all())
+                for order in orders.prefetch_related('items')
+            ])))
+        timings.append(('ORM: doanh thu theo sản phẩm', self.measure(lambda: list(
+            items.values('product_id').annotate(
+                revenue=revenue, units_sold=Sum('quantity'), order_count=Count('order_id', distinct=True)
+            ).order_by('-revenue')[:20]
+        ))))
+        timings.append(('ORM: doanh thu theo danh mục', self.measure(lambda: list(
+            items.values('product__category_id').annotate(revenue=revenue).order_by('-revenue')
+        ))))
+        timings.append(('ORM: phân bố giỏ hàng', self.measure(lambda: list(
+            orders.annotate(lines=Count('items')).values('lines').annotate(count=Count('id')).order_by('lines')
+        ))))
+        timings.append(('ORM: doanh thu theo ngày', self.measure(lambda: list(
+            items.annotate(day=TruncDay('order__created_at')).values('day').annotate(revenue=revenue).order_by('day')
+        ))))
+
+        engine = ReportEngine()
+        timings.append(('NumPy: nạp dữ liệu', self.measure(engine.load)))
+        timings.append(('NumPy: doanh thu theo sản phẩm', self.measure(lambda: engine.grouped_revenue('product'))))
+        timings.append(('NumPy: doanh thu theo danh mục', self.measure(lambda: engine.grouped_revenue('category'))))
+        timings.append(('NumPy: phân bố giỏ hàng', self.measure(engine.basket_histogram)))
+        timings.append(('NumPy: doanh thu theo ngày', self.measure(lambda: engine.time_buckets('day'))))
+        timings.append(('NumPy: mua cùng nhau (top 50)', self.measure(engine.co_occurrence)))
+
+        for name, elapsed in timings:
+            self.stdout.write(f'{name:<36}{elapsed:>10.1f} ms')
+
+    def measure(self, func):
+        started = time.perf_counter()
+        func()
+        return (time.perf_counter() - started) * 1000
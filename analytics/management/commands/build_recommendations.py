@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics import recommendations
+
+
+class Command(BaseCommand):
+    help = "Tính lại ma trận sản phẩm mua cùng và top-N sản phẩm liên quan từ toàn bộ đơn hàng"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=None, help='Số sản phẩm liên quan giữ cho mỗi sản phẩm')
+        parser.add_argument('--chunk-size', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        pairs, relations = recommendations.build(limit=options['top'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{pairs} cặp sản phẩm, {relations} quan hệ top-N trong {time.perf_counter() - started:.1f}s'
+        ))
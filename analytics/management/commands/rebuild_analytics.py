@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics import rollups
+
+
+class Command(BaseCommand):
+    help = "Xóa và tính lại toàn bộ bảng rollup doanh số từ lịch sử đơn hàng"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Số đơn hàng đọc mỗi lần')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rollups.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Đã tính lại rollup cho {count} đơn hàng trong {time.perf_counter() - started:.1f}s'
+        ))
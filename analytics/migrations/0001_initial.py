@@ -0,0 +1,72 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('orders', '0002_order_indexes'),
+        ('products', '0005_low_stock_threshold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordedOrder',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='analytics_record', serialize=False, to='orders.order')),
+                ('recorded_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SalesTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Giờ'), ('day', 'Ngày')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('units_sold', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('period', 'bucket'), name='sales_total_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CategorySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Giờ'), ('day', 'Ngày')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('units_sold', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='products.category')),
+            ],
+            options={
+                'verbose_name_plural': 'Category sales',
+                'indexes': [models.Index(fields=['period', 'bucket'], name='category_sales_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'bucket', 'category'), name='category_sales_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Giờ'), ('day', 'Ngày')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('units_sold', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='products.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Product sales',
+                'indexes': [models.Index(fields=['period', 'bucket'], name='product_sales_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'bucket', 'product'), name='product_sales_bucket_uniq')],
+            },
+        ),
+    ]
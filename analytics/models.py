@@ -0,0 +1,113 @@
+from django.db import models
+from orders.models import Order
+from products.models import Category, Product
+
+# Trạng thái đơn hàng được tính vào doanh số và gợi ý sản phẩm
+RECORDED_STATUSES = ('processing', 'completed')
+
+PERIOD_CHOICES = [
+    ('hour', 'Giờ'),
+    ('day', 'Ngày'),
+]
+
+
+class SalesRollup(models.Model):
+    """Doanh thu, số đơn, số lượng bán trong một khung giờ/ngày"""
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket = models.DateTimeField()  # Đầu khung giờ/ngày (giờ địa phương)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+    units_sold = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class SalesTotal(SalesRollup):
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'bucket'], name='sales_total_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.bucket}"
+
+
+class ProductSales(SalesRollup):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales')
+
+    class Meta:
+        verbose_name_plural = "Product sales"
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'bucket', 'product'], name='product_sales_bucket_uniq'),
+        ]
+        indexes = [
+            # Top sản phẩm trong khoảng thời gian
+            models.Index(fields=['period', 'bucket'], name='product_sales_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.period} {self.bucket}"
+
+
+class CategorySales(SalesRollup):
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='sales')
+
+    class Meta:
+        verbose_name_plural = "Category sales"
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'bucket', 'category'], name='category_sales_bucket_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'bucket'], name='category_sales_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id} {self.period} {self.bucket}"
+
+
+class RecordedOrder(models.Model):
+    """Đơn hàng đã được cộng vào rollup (mỗi đơn chỉ cộng một lần)"""
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, primary_key=True, related_name='analytics_record')
+    recorded_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Order #{self.order_id}"
+
+
+class ProductPairCount(models.Model):
+    """Số đơn hàng có cả 2 sản phẩm (product_a_id < product_b_id)"""
+    product_a = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    product_b = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product_a', 'product_b'], name='product_pair_uniq'),
+        ]
+        indexes = [
+            # Top cặp của một sản phẩm khi cập nhật dần
+            models.Index(fields=['product_a', '-count'], name='product_pair_a_count_idx'),
+            models.Index(fields=['product_b', '-count'], name='product_pair_b_count_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_a_id} + {self.product_b_id}: {self.count}"
+
+
+class ProductRelation(models.Model):
+    """Top-N sản phẩm hay được mua cùng, tính sẵn cho /api/products/{id}/related/"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='relations')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)  # Số đơn mua cùng
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='product_relation_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} (#{self.rank})"
@@ -0,0 +1,149 @@
+"""
+Gợi ý "thường được mua cùng" từ giỏ hàng (OrderItem).
+
+ProductPairCount là ma trận đồng xuất hiện dạng thưa: mỗi cặp sản phẩm từng
+được mua cùng nhau có một dòng (product_a < product_b) với số đơn. Từ đó
+ProductRelation giữ sẵn top-N sản phẩm liên quan của mỗi sản phẩm, nên
+/api/products/{id}/related/ chỉ là một truy vấn theo khóa.
+
+build() tính lại toàn bộ bằng NumPy; add_order() cập nhật dần khi một đơn
+hàng được cộng vào doanh số (analytics.rollups.record_order) hoặc bị hủy.
+"""
+from itertools import combinations
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from orders.models import OrderItem
+
+from .models import ProductPairCount, ProductRelation
+from .reports import ReportEngine
+
+
+def top_n():
+    return getattr(settings, 'RECOMMENDATION_TOP_N', 10)
+
+
+def basket_pairs(order_index, product_ids):
+    """
+    Mọi cặp (a, b), a < b, trong cùng một đơn hàng.
+    So sánh mảng đã sắp xếp với chính nó lệch d vị trí: dòng i và i+d cùng đơn là một cặp.
+    """
+    order = np.lexsort((product_ids, order_index))
+    order_index = order_index[order]
+    product_ids = product_ids[order]
+    # Bỏ sản phẩm lặp lại trong cùng đơn
+    keep = np.ones(len(order_index), dtype=bool)
+    keep[1:] = (order_index[1:] != order_index[:-1]) | (product_ids[1:] != product_ids[:-1])
+    order_index = order_index[keep]
+    product_ids = product_ids[keep]
+
+    first = []
+    second = []
+    offset = 1
+    while offset < len(order_index):
+        same = order_index[:-offset] == order_index[offset:]
+        if not same.any():
+            break
+        first.append(product_ids[:-offset][same])
+        second.append(product_ids[offset:][same])
+        offset += 1
+    if not first:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    return np.concatenate(first), np.concatenate(second)
+
+
+def top_relations(first, second, counts, limit):
+    """Top `limit` theo count của mỗi sản phẩm, từ các cặp (a, b, count) theo cả 2 chiều"""
+    source = np.concatenate([first, second])
+    target = np.concatenate([second, first])
+    counts = np.concatenate([counts, counts])
+    order = np.lexsort((target, -counts, source))
+    source, target, counts = source[order], target[order], counts[order]
+
+    starts = np.ones(len(source), dtype=bool)
+    starts[1:] = source[1:] != source[:-1]
+    group_start = np.maximum.accumulate(np.where(starts, np.arange(len(source)), 0))
+    rank = np.arange(len(source)) - group_start
+    keep = rank < limit
+    return source[keep], target[keep], counts[keep], rank[keep]
+
+
+def build(limit=None, chunk_size=50000):
+    """Tính lại toàn bộ từ các đơn processing/completed; trả về (số cặp, số quan hệ)"""
+    limit = limit or top_n()
+    engine = ReportEngine(chunk_size=chunk_size).load()
+    first, second = basket_pairs(engine.item_order_index, engine.item_product)
+    width = int(engine.item_product.max()) + 1 if len(engine.item_product) else 1
+    keys, counts = np.unique(first * width + second, return_counts=True)
+    first, second = keys // width, keys % width
+    source, target, related_counts, rank = top_relations(first, second, counts, limit)
+
+    with transaction.atomic():
+        ProductRelation.objects.all().delete()
+        ProductPairCount.objects.all().delete()
+        ProductPairCount.objects.bulk_create(
+            (
+                ProductPairCount(product_a_id=a, product_b_id=b, count=count)
+                for a, b, count in zip(first.tolist(), second.tolist(), counts.tolist())
+            ),
+            batch_size=chunk_size,
+        )
+        ProductRelation.objects.bulk_create(
+            (
+                ProductRelation(product_id=product_id, related_id=related_id, count=count, rank=position)
+                for product_id, related_id, count, position in zip(
+                    source.tolist(), target.tolist(), related_counts.tolist(), rank.tolist()
+                )
+            ),
+            batch_size=chunk_size,
+        )
+    return len(keys), len(source)
+
+
+def add_order(order, sign=1):
+    """Cộng (sign=1) hoặc trừ (sign=-1) các cặp sản phẩm của một đơn, rồi tính lại top-N của chúng"""
+    product_ids = sorted(set(OrderItem.objects.filter(order_id=order.pk).values_list('product_id', flat=True)))
+    if len(product_ids) < 2:
+        return
+
+    for a, b in combinations(product_ids, 2):
+        pair = ProductPairCount.objects.filter(product_a_id=a, product_b_id=b)
+        if pair.update(count=F('count') + sign) or sign < 0:
+            continue
+        try:
+            with transaction.atomic():
+                ProductPairCount.objects.create(product_a_id=a, product_b_id=b, count=1)
+        except IntegrityError:
+            pair.update(count=F('count') + 1)
+
+    if sign < 0:
+        ProductPairCount.objects.filter(product_a_id__in=product_ids, count=0).delete()
+    for product_id in product_ids:
+        refresh_product(product_id)
+
+
+def refresh_product(product_id, limit=None):
+    """Tính lại top-N của một sản phẩm từ ProductPairCount (2 truy vấn theo index)"""
+    limit = limit or top_n()
+    candidates = [
+        (count, related_id)
+        for related_id, count in ProductPairCount.objects.filter(product_a_id=product_id)
+        .order_by('-count', 'product_b_id').values_list('product_b_id', 'count')[:limit]
+    ] + [
+        (count, related_id)
+        for related_id, count in ProductPairCount.objects.filter(product_b_id=product_id)
+        .order_by('-count', 'product_a_id').values_list('product_a_id', 'count')[:limit]
+    ]
+    candidates.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+
+    with transaction.atomic():
+        ProductRelation.objects.filter(product_id=product_id).delete()
+        ProductRelation.objects.bulk_create([
+            ProductRelation(product_id=product_id, related_id=related_id, count=count, rank=rank)
+            for rank, (count, related_id) in enumerate(candidates[:limit])
+            if count > 0
+        ])
@@ -0,0 +1,282 @@
+"""
+Báo cáo ad-hoc trên toàn bộ lịch sử OrderItem bằng NumPy.
+
+Dữ liệu được đọc theo khối bằng values_list() (không tạo ORM instance) vào
+các mảng int64; giá được đổi sang xu (price * 100) ngay trong câu SQL nên
+mọi phép cộng đều là số nguyên chính xác. Các báo cáo (doanh thu theo
+nhóm, phân bố kích thước giỏ hàng, sản phẩm hay mua cùng nhau, tổng hợp
+theo thời gian) đều tính bằng phép toán trên mảng, không lặp từng dòng.
+"""
+import numpy as np
+from django.db.models import F, IntegerField
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+
+from .models import RECORDED_STATUSES
+
+BUCKETS = ('hour', 'day', 'week', 'month', 'hour_of_day', 'weekday')
+GROUPS = ('product', 'category')
+
+
+def money(cents):
+    """Xu (int) -> chuỗi tiền '1234.50' giống DecimalField của DRF"""
+    cents = int(cents)
+    sign = '-' if cents < 0 else ''
+    cents = abs(cents)
+    return f'{sign}{cents // 100}.{cents % 100:02d}'
+
+
+def group_sum(inverse, values, size):
+    """Tổng values theo nhóm (inverse từ np.unique), giữ kiểu int64"""
+    out = np.zeros(size, dtype=np.int64)
+    np.add.at(out, inverse, values)
+    return out
+
+
+class ReportEngine:
+    """
+    engine = ReportEngine(start, end).load()
+    engine.grouped_revenue('category')
+    """
+
+    def __init__(self, start=None, end=None, statuses=RECORDED_STATUSES, chunk_size=50000):
+        self.start = start
+        self.end = end
+        self.statuses = statuses
+        self.chunk_size = chunk_size
+
+    def orders(self):
+        queryset = Order.objects.filter(status__in=self.statuses)
+        if self.start:
+            queryset = queryset.filter(created_at__gte=self.start)
+        if self.end:
+            queryset = queryset.filter(created_at__lte=self.end)
+        return queryset
+
+    def load(self):
+        order_ids = []
+        order_times = []
+        last_pk = 0
+        orders = self.orders().order_by('pk')
+        while True:
+            rows = list(orders.filter(pk__gt=last_pk).values_list('pk', 'created_at')[:self.chunk_size])
+            if not rows:
+                break
+            ids, times = zip(*rows)
+            order_ids.append(np.array(ids, dtype=np.int64))
+            # Giờ địa phương, bỏ tzinfo để NumPy chia khung theo ngày/giờ địa phương
+            order_times.append(np.array(
+                [timezone.localtime(value).replace(tzinfo=None) for value in times], dtype='datetime64[s]'
+            ))
+            last_pk = ids[-1]
+        self.order_ids = np.concatenate(order_ids) if order_ids else np.zeros(0, dtype=np.int64)
+        self.order_times = np.concatenate(order_times) if order_times else np.zeros(0, dtype='datetime64[s]')
+
+        columns = [[] for _ in range(5)]
+        items = OrderItem.objects.filter(order__in=self.orders()).order_by('pk').values_list(
+            'pk', 'order_id', 'product_id', 'product__category_id', 'quantity',
+            Cast(Round(F('price') * 100), IntegerField()),
+        )
+        last_pk = 0
+        while True:
+            rows = list(items.filter(pk__gt=last_pk)[:self.chunk_size])
+            if not rows:
+                break
+            chunk = np.array(rows, dtype=np.int64)
+            for index, column in enumerate(columns, start=1):
+                column.append(chunk[:, index])
+            last_pk = int(chunk[-1, 0])
+
+        def join(parts):
+            return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+        item_order = join(columns[0])
+        # Vị trí đơn hàng của mỗi dòng trong order_ids (đã sắp xếp); bỏ các dòng
+        # của đơn hàng được tạo/đổi trạng thái giữa 2 lần đọc
+        index = np.minimum(np.searchsorted(self.order_ids, item_order), max(self.order_count - 1, 0))
+        keep = self.order_ids[index] == item_order if self.order_count else np.zeros(len(item_order), dtype=bool)
+
+        self.item_order = item_order[keep]
+        self.item_order_index = index[keep]
+        self.item_product = join(columns[1])[keep]
+        self.item_category = join(columns[2])[keep]
+        self.item_quantity = join(columns[3])[keep]
+        self.item_cents = self.item_quantity * join(columns[4])[keep]
+        return self
+
+    @property
+    def order_count(self):
+        return len(self.order_ids)
+
+    def order_totals(self):
+        """(tổng xu, tổng số lượng, số dòng) của từng đơn hàng"""
+        size = self.order_count
+        return (
+            group_sum(self.item_order_index, self.item_cents, size),
+            group_sum(self.item_order_index, self.item_quantity, size),
+            np.bincount(self.item_order_index, minlength=size),
+        )
+
+    def summary(self):
+        cents, units, _ = self.order_totals()
+        return {
+            'order_count': self.order_count,
+            'item_count': len(self.item_order),
+            'revenue': money(cents.sum()),
+            'units_sold': int(units.sum()),
+            'average_order_value': money(cents.mean()) if self.order_count else '0.00',
+        }
+
+    def grouped_revenue(self, by='product', limit=20):
+        """Doanh thu, số lượng bán, số đơn theo sản phẩm/danh mục, doanh thu cao nhất trước"""
+        keys = self.item_product if by == 'product' else self.item_category
+        groups, inverse = np.unique(keys, return_inverse=True)
+        revenue = group_sum(inverse, self.item_cents, len(groups))
+        units = group_sum(inverse, self.item_quantity, len(groups))
+        # Số đơn: đếm cặp (nhóm, đơn hàng) không trùng
+        pairs = np.unique(inverse.astype(np.int64) * max(self.order_count, 1) + self.item_order_index)
+        orders = np.bincount(pairs // max(self.order_count, 1), minlength=len(groups))
+
+        top = np.lexsort((groups, -revenue))[:limit]
+        model = Product if by == 'product' else Category
+        names = dict(model.objects.filter(pk__in=groups[top].tolist()).values_list('pk', 'name'))
+        return [
+            {
+                'id': int(groups[i]),
+                'name': names.get(int(groups[i])),
+                'revenue': money(revenue[i]),
+                'units_sold': int(units[i]),
+                'order_count': int(orders[i]),
+            }
+            for i in top
+        ]
+
+    def basket_histogram(self):
+        """Phân bố số dòng/số lượng mỗi đơn và phân vị giá trị đơn hàng"""
+        cents, units, lines = self.order_totals()
+        if not self.order_count:
+            return {'lines': {}, 'units': {}, 'order_value': {}}
+
+        def histogram(values):
+            counts = np.bincount(values)
+            return {int(size): int(counts[size]) for size in np.flatnonzero(counts)}
+
+        percentiles = np.percentile(cents, [50, 90, 99], method='lower')
+        return {
+            'lines': histogram(lines),
+            'units': histogram(units),
+            'order_value': {
+                'mean': money(cents.mean()),
+                'p50': money(percentiles[0]),
+                'p90': money(percentiles[1]),
+                'p99': money(percentiles[2]),
+                'max': money(cents.max()),
+            },
+        }
+
+    def co_occurrence(self, top=50, limit=20):
+        """
+        Cặp sản phẩm hay được mua cùng nhau, trong `top` sản phẩm có nhiều đơn nhất.
+        Ma trận đơn hàng x sản phẩm được nhân theo khối: C = M.T @ M
+        """
+        if not len(self.item_order):
+            return []
+        products, inverse = np.unique(self.item_product, return_inverse=True)
+        pairs = np.unique(inverse.astype(np.int64) * self.order_count + self.item_order_index)
+        product_index = pairs // self.order_count
+        order_index = pairs % self.order_count
+        orders_per_product = np.bincount(product_index, minlength=len(products))
+
+        selected = np.argsort(-orders_per_product, kind='stable')[:top]
+        column = np.full(len(products), -1, dtype=np.int64)
+        column[selected] = np.arange(len(selected))
+        keep = column[product_index] >= 0
+        product_column = column[product_index[keep]]
+        order_index = order_index[keep]
+
+        size = len(selected)
+        counts = np.zeros((size, size), dtype=np.int64)
+        for start in range(0, self.order_count, self.chunk_size):
+            mask = (order_index >= start) & (order_index < start + self.chunk_size)
+            matrix = np.zeros((min(self.chunk_size, self.order_count - start), size), dtype=np.float32)
+            matrix[order_index[mask] - start, product_column[mask]] = 1
+            counts += np.rint(matrix.T @ matrix).astype(np.int64)
+
+        first, second = np.triu_indices(size, k=1)
+        together = counts[first, second]
+        order = np.lexsort((first, -together))[:limit]
+        order = order[together[order] > 0]
+
+        ids = products[selected]
+        singles = np.diag(counts)
+        names = dict(Product.objects.filter(pk__in=ids.tolist()).values_list('pk', 'name'))
+        results = []
+        for i in order:
+            a, b = first[i], second[i]
+            results.append({
+                'products': [int(ids[a]), int(ids[b])],
+                'names': [names.get(int(ids[a])), names.get(int(ids[b]))],
+                'orders': int(together[i]),
+                'support': round(together[i] / self.order_count, 6),
+                'lift': round(together[i] * self.order_count / (singles[a] * singles[b]), 3),
+            })
+        return results
+
+    def time_buckets(self, bucket='day'):
+        """Doanh thu, số đơn, số lượng theo khung thời gian (giờ địa phương)"""
+        cents, units, _ = self.order_totals()
+        days = self.order_times.astype('datetime64[D]')
+        if bucket == 'hour':
+            keys = self.order_times.astype('datetime64[h]')
+        elif bucket == 'day':
+            keys = days
+        elif bucket == 'week':
+            # 1970-01-01 là thứ Năm: lùi về thứ Hai đầu tuần
+            keys = days - (days.astype(np.int64) + 3) % 7
+        elif bucket == 'month':
+            keys = self.order_times.astype('datetime64[M]')
+        elif bucket == 'hour_of_day':
+            keys = self.order_times.astype('datetime64[h]').astype(np.int64) % 24
+        else:
+            # 0 = thứ Hai
+            keys = (days.astype(np.int64) + 3) % 7
+
+        groups, inverse = np.unique(keys, return_inverse=True)
+        revenue = group_sum(inverse, cents, len(groups))
+        unit_totals = group_sum(inverse, units, len(groups))
+        orders = np.bincount(inverse, minlength=len(groups))
+        return [
+            {
+                'bucket': self.bucket_label(value),
+                'revenue': money(revenue[i]),
+                'order_count': int(orders[i]),
+                'units_sold': int(unit_totals[i]),
+            }
+            for i, value in enumerate(groups)
+        ]
+
+    def bucket_label(self, value):
+        if isinstance(value, np.datetime64):
+            # '2025-01-01T10:00:00' (giờ), '2025-01-01' (ngày/tuần), '2025-01' (tháng)
+            return str(value.astype('datetime64[s]')) if value.dtype == 'datetime64[h]' else str(value)
+        return int(value)
+
+    def run(self, report, **options):
+        """Chạy báo cáo theo tên (dùng cho command và endpoint)"""
+        if report == 'summary':
+            return self.summary()
+        if report in GROUPS:
+            return self.grouped_revenue(report, limit=options.get('limit', 20))
+        if report == 'baskets':
+            return self.basket_histogram()
+        if report == 'co_occurrence':
+            return self.co_occurrence(top=options.get('top', 50), limit=options.get('limit', 20))
+        if report == 'time':
+            return self.time_buckets(options.get('bucket', 'day'))
+        raise ValueError(report)
+
+
+REPORTS = ('summary',) + GROUPS + ('baskets', 'co_occurrence', 'time')
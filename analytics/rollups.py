@@ -0,0 +1,158 @@
+"""
+Cập nhật bảng rollup doanh thu theo giờ/ngày.
+
+Mỗi đơn hàng được cộng vào SalesTotal, ProductSales, CategorySales đúng một
+lần khi chuyển sang processing/completed (RecordedOrder là sổ ghi nhận), và
+được trừ lại nếu bị hủy sau đó. Khung thời gian tính theo created_at của đơn
+hàng, giờ địa phương (TIME_ZONE). rebuild() tính lại toàn bộ từ lịch sử.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+
+from . import recommendations
+from .models import RECORDED_STATUSES, CategorySales, ProductSales, RecordedOrder, SalesTotal
+
+PERIODS = ('hour', 'day')
+ITEM_FIELDS = ('order_id', 'product_id', 'product__category_id', 'quantity', 'price')
+
+
+def bucket_start(value, period):
+    """Đầu khung giờ/ngày chứa value, theo giờ địa phương"""
+    value = timezone.localtime(value)
+    if period == 'day':
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+class Collector:
+    """
+    Cộng dồn các dòng OrderItem thành số liệu cho từng khung.
+    Các dòng phải được sắp xếp theo order_id để đếm số đơn không bị trùng.
+    """
+
+    def __init__(self):
+        # key -> [revenue, units_sold, order_count, order_id cuối cùng đã đếm]
+        self.totals = defaultdict(lambda: [Decimal('0'), 0, 0, None])
+        self.products = defaultdict(lambda: [Decimal('0'), 0, 0, None])
+        self.categories = defaultdict(lambda: [Decimal('0'), 0, 0, None])
+
+    def add(self, created_at, order_id, product_id, category_id, quantity, price):
+        revenue = price * quantity
+        for period in PERIODS:
+            bucket = bucket_start(created_at, period)
+            for stats in (
+                self.totals[(period, bucket)],
+                self.products[(period, bucket, product_id)],
+                self.categories[(period, bucket, category_id)],
+            ):
+                stats[0] += revenue
+                stats[1] += quantity
+                if stats[3] != order_id:
+                    stats[2] += 1
+                    stats[3] = order_id
+
+    def rows(self):
+        """(model, lookup, (revenue, units_sold, order_count)) cho từng khung"""
+        for (period, bucket), stats in self.totals.items():
+            yield SalesTotal, {'period': period, 'bucket': bucket}, stats[:3]
+        for (period, bucket, product_id), stats in self.products.items():
+            yield ProductSales, {'period': period, 'bucket': bucket, 'product_id': product_id}, stats[:3]
+        for (period, bucket, category_id), stats in self.categories.items():
+            yield CategorySales, {'period': period, 'bucket': bucket, 'category_id': category_id}, stats[:3]
+
+
+def collect_order(order):
+    collector = Collector()
+    rows = OrderItem.objects.filter(order_id=order.pk).values_list(*ITEM_FIELDS)
+    for order_id, product_id, category_id, quantity, price in rows:
+        collector.add(order.created_at, order_id, product_id, category_id, quantity, price)
+    return collector
+
+
+def apply_changes(collector, sign=1):
+    """Cộng (sign=1) hoặc trừ (sign=-1) số liệu vào các bảng rollup bằng UPDATE ... F()"""
+    for model, lookup, (revenue, units_sold, order_count) in collector.rows():
+        changes = {
+            'revenue': F('revenue') + revenue * sign,
+            'units_sold': F('units_sold') + units_sold * sign,
+            'order_count': F('order_count') + order_count * sign,
+        }
+        if model.objects.filter(**lookup).update(**changes) or sign < 0:
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.create(
+                    revenue=revenue, units_sold=units_sold, order_count=order_count, **lookup
+                )
+        except IntegrityError:
+            # Request khác vừa tạo cùng khung
+            model.objects.filter(**lookup).update(**changes)
+
+
+def record_order(order):
+    """Cộng đơn hàng vào rollup nếu chưa cộng; trả về True nếu có cộng"""
+    with transaction.atomic():
+        _, created = RecordedOrder.objects.get_or_create(order_id=order.pk)
+        if not created:
+            return False
+        apply_changes(collect_order(order))
+        recommendations.add_order(order)
+    return True
+
+
+def unrecord_order(order):
+    """Trừ đơn hàng đã cộng (ví dụ khi bị hủy); trả về True nếu có trừ"""
+    with transaction.atomic():
+        deleted, _ = RecordedOrder.objects.filter(order_id=order.pk).delete()
+        if not deleted:
+            return False
+        apply_changes(collect_order(order), sign=-1)
+        recommendations.add_order(order, sign=-1)
+    return True
+
+
+def record_orders(queryset):
+    """Cộng các đơn hàng chưa được cộng trong queryset (admin dùng queryset.update())"""
+    orders = queryset.filter(status__in=RECORDED_STATUSES, analytics_record__isnull=True)
+    count = 0
+    for order in orders.only('id', 'created_at').iterator():
+        count += record_order(order)
+    return count
+
+
+def rebuild(chunk_size=2000):
+    """Xóa và tính lại toàn bộ rollup từ Order/OrderItem; trả về số đơn đã cộng"""
+    collector = Collector()
+    order_ids = []
+    orders = Order.objects.filter(status__in=RECORDED_STATUSES).order_by('pk')
+
+    with transaction.atomic():
+        last_pk = 0
+        while True:
+            chunk = dict(orders.filter(pk__gt=last_pk).values_list('pk', 'created_at')[:chunk_size])
+            if not chunk:
+                break
+            items = OrderItem.objects.filter(order_id__in=list(chunk)).order_by('order_id').values_list(*ITEM_FIELDS)
+            for order_id, product_id, category_id, quantity, price in items:
+                collector.add(chunk[order_id], order_id, product_id, category_id, quantity, price)
+            order_ids.extend(chunk)
+            last_pk = max(chunk)
+
+        for model in (SalesTotal, ProductSales, CategorySales, RecordedOrder):
+            model.objects.all().delete()
+
+        rows = defaultdict(list)
+        for model, lookup, (revenue, units_sold, order_count) in collector.rows():
+            rows[model].append(model(revenue=revenue, units_sold=units_sold, order_count=order_count, **lookup))
+        for model, objects in rows.items():
+            model.objects.bulk_create(objects, batch_size=chunk_size)
+        RecordedOrder.objects.bulk_create(
+            [RecordedOrder(order_id=order_id) for order_id in order_ids], batch_size=chunk_size
+        )
+    return len(order_ids)
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from orders.models import Order
+
+from . import jobs, rollups
+
+
+@receiver(post_save, sender=Order)
+def update_rollups(sender, instance, **kwargs):
+    """
+    Đơn hàng sang processing/completed: cộng vào rollup; bị hủy: trừ lại.
+    Worker chạy sau khi transaction commit nên các OrderItem lưu cùng
+    transaction (admin inline) đã có.
+    """
+    if instance.status in rollups.RECORDED_STATUSES:
+        jobs.record_later(instance.pk)
+    elif instance.status == 'cancelled':
+        jobs.unrecord_later(instance.pk)
@@ -0,0 +1,175 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+from tasks.worker import run_pending
+from . import recommendations, rollups
+from .reports import ReportEngine
+from .models import CategorySales, ProductRelation, ProductSales, RecordedOrder, SalesTotal
+
+
+class OrderDataMixin:
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password123')
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'password123', is_staff=True)
+        drinks = Category.objects.create(name='Đồ uống')
+        snacks = Category.objects.create(name='Bánh kẹo')
+        self.coffee = Product.objects.create(name='Cà phê', category=drinks, price=20, quantity=100)
+        self.tea = Product.objects.create(name='Trà', category=drinks, price=10, quantity=100)
+        self.candy = Product.objects.create(name='Kẹo', category=snacks, price=5, quantity=100)
+
+    def create_order(self, lines):
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+            for product, quantity in lines
+        ])
+        return order
+
+    def set_status(self, order, status):
+        order.status = status
+        order.save()
+        run_pending()
+
+
+class SalesRollupTests(OrderDataMixin, APITestCase):
+
+    def snapshot(self):
+        return (
+            sorted(SalesTotal.objects.values_list('period', 'bucket', 'revenue', 'order_count', 'units_sold')),
+            sorted(ProductSales.objects.values_list('period', 'product_id', 'revenue', 'order_count', 'units_sold')),
+            sorted(CategorySales.objects.values_list('period', 'category_id', 'revenue', 'order_count', 'units_sold')),
+        )
+
+    def test_records_once_and_reverses_on_cancel(self):
+        first = self.create_order([(self.coffee, 2), (self.tea, 1), (self.candy, 4)])
+        second = self.create_order([(self.coffee, 1)])
+        self.set_status(first, 'processing')
+        self.set_status(first, 'completed')
+        self.set_status(second, 'processing')
+
+        day = SalesTotal.objects.get(period='day')
+        self.assertEqual((day.revenue, day.order_count, day.units_sold), (Decimal('90'), 2, 8))
+        coffee = ProductSales.objects.get(period='day', product=self.coffee)
+        self.assertEqual((coffee.revenue, coffee.order_count, coffee.units_sold), (Decimal('60'), 2, 3))
+        drinks = CategorySales.objects.get(period='hour', category=self.coffee.category)
+        self.assertEqual((drinks.revenue, drinks.order_count, drinks.units_sold), (Decimal('70'), 2, 4))
+
+        self.set_status(second, 'cancelled')
+        day.refresh_from_db()
+        self.assertEqual((day.revenue, day.order_count, day.units_sold), (Decimal('70'), 1, 7))
+        self.assertFalse(RecordedOrder.objects.filter(order=second).exists())
+
+    def test_rebuild_matches_incremental(self):
+        orders = [
+            self.create_order([(self.coffee, 2), (self.candy, 1)]),
+            self.create_order([(self.tea, 3)]),
+            self.create_order([(self.candy, 5)]),
+        ]
+        for order in orders[:2]:
+            self.set_status(order, 'processing')
+        incremental = self.snapshot()
+
+        self.assertEqual(rollups.rebuild(), 2)
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_endpoints_answer_from_rollups(self):
+        order = self.create_order([(self.coffee, 2), (self.tea, 1), (self.candy, 4)])
+        self.set_status(order, 'processing')
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/analytics/').status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        summary = self.client.get('/api/analytics/').data
+        self.assertEqual(summary['today']['order_count'], 1)
+
+        revenue = self.client.get('/api/analytics/revenue/', {'period': 'hour'}).data
+        self.assertEqual([row['revenue'] for row in revenue], ['70.00'])
+
+        top = self.client.get('/api/analytics/top_products/', {'order_by': 'units_sold', 'limit': 2}).data
+        self.assertEqual([row['product_id'] for row in top], [self.candy.pk, self.coffee.pk])
+
+        categories = self.client.get('/api/analytics/categories/').data
+        self.assertEqual([row['category_name'] for row in categories], ['Đồ uống', 'Bánh kẹo'])
+        self.assertEqual(self.client.get('/api/analytics/revenue/', {'period': 'week'}).status_code, 400)
+
+        report = self.client.get('/api/analytics/report/', {'type': 'category'}).data
+        self.assertEqual([row['revenue'] for row in report], ['50.00', '20.00'])
+
+
+class ReportEngineTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password123')
+        drinks = Category.objects.create(name='Đồ uống')
+        snacks = Category.objects.create(name='Bánh kẹo')
+        self.coffee = Product.objects.create(name='Cà phê', category=drinks, price='19.99', quantity=100)
+        self.tea = Product.objects.create(name='Trà', category=drinks, price=10, quantity=100)
+        self.candy = Product.objects.create(name='Kẹo', category=snacks, price=5, quantity=100)
+        for lines, status in (
+            ([(self.coffee, 2), (self.tea, 1)], 'completed'),
+            ([(self.coffee, 1), (self.tea, 2), (self.candy, 3)], 'processing'),
+            ([(self.candy, 1)], 'completed'),
+            ([(self.coffee, 9)], 'pending'),
+        ):
+            order = Order.objects.create(user=self.user, status=status)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+                for product, quantity in lines
+            ])
+        self.engine = ReportEngine().load()
+
+    def test_grouped_revenue_in_exact_cents(self):
+        products = self.engine.grouped_revenue('product')
+        self.assertEqual(
+            [(row['name'], row['revenue'], row['units_sold'], row['order_count']) for row in products],
+            [('Cà phê', '59.97', 3, 2), ('Trà', '30.00', 3, 2), ('Kẹo', '20.00', 4, 2)],
+        )
+        categories = self.engine.grouped_revenue('category')
+        self.assertEqual([(row['name'], row['order_count']) for row in categories], [('Đồ uống', 2), ('Bánh kẹo', 2)])
+        self.assertEqual(self.engine.summary()['revenue'], '109.97')
+
+    def test_baskets_co_occurrence_and_time(self):
+        baskets = self.engine.basket_histogram()
+        self.assertEqual(baskets['lines'], {1: 1, 2: 1, 3: 1})
+        pairs = self.engine.co_occurrence()
+        self.assertEqual(pairs[0]['products'], sorted([self.coffee.pk, self.tea.pk]))
+        self.assertEqual(pairs[0]['orders'], 2)
+        days = self.engine.time_buckets('day')
+        self.assertEqual([(row['order_count'], row['revenue']) for row in days], [(3, '109.97')])
+
+
+class RecommendationTests(OrderDataMixin, APITestCase):
+
+    def relations(self):
+        return sorted(ProductRelation.objects.values_list('product_id', 'rank', 'related_id', 'count'))
+
+    def test_incremental_matches_build_and_endpoint(self):
+        orders = [
+            self.create_order([(self.coffee, 1), (self.tea, 1), (self.candy, 1)]),
+            self.create_order([(self.coffee, 2), (self.tea, 1)]),
+            self.create_order([(self.coffee, 1), (self.candy, 1)]),
+            self.create_order([(self.tea, 1), (self.candy, 1)]),
+        ]
+        for order in orders:
+            self.set_status(order, 'completed')
+        self.set_status(orders[3], 'cancelled')
+        incremental = self.relations()
+
+        recommendations.build()
+        self.assertEqual(self.relations(), incremental)
+
+        response = self.client.get(f'/api/products/{self.coffee.pk}/related/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['id'], row['bought_together']) for row in response.data],
+            [(self.tea.pk, 2), (self.candy.pk, 2)],
+        )
+        response = self.client.get(f'/api/products/{self.tea.pk}/related/')
+        self.assertEqual([row['id'] for row in response.data], [self.coffee.pk, self.candy.pk])
+        self.assertEqual(self.client.get('/api/products/999999/related/').status_code, 404)
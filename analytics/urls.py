@@ -0,0 +1,11 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import AnalyticsViewSet, related_products
+
+router = DefaultRouter()
+router.register(r'analytics', AnalyticsViewSet, basename='analytics')
+
+urlpatterns = [
+    path('', include(router.urls)),
+    path('products/<int:pk>/related/', related_products, name='product-related'),
+]
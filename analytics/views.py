@@ -0,0 +1,178 @@
+from datetime import timedelta
+
+from django.db.models import F, Sum
+from django.utils import timezone
+from rest_framework import status, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
+
+from grocery_store.exports import parse_datetime_param
+
+from products.models import Product
+from products.serializers import ProductListSerializer
+
+from .models import CategorySales, ProductRelation, ProductSales, SalesTotal
+from .reports import BUCKETS, REPORTS, ReportEngine
+from .rollups import PERIODS, bucket_start
+
+ORDER_FIELDS = ('revenue', 'units_sold', 'order_count')
+MAX_LIMIT = 100
+
+
+def _stats(row):
+    return {
+        'revenue': str(row['revenue'] or 0),
+        'order_count': row['order_count'] or 0,
+        'units_sold': row['units_sold'] or 0,
+    }
+
+
+class AnalyticsViewSet(viewsets.ViewSet):
+    """
+    Thống kê doanh số từ bảng rollup (analytics.rollups), chỉ dành cho admin
+    Tham số chung: ?period=day|hour&from=YYYY-MM-DD&to=YYYY-MM-DD (mặc định 30 ngày gần nhất)
+    """
+    permission_classes = [IsAdminUser]
+
+    def get_range(self, request):
+        period = request.query_params.get('period', 'day')
+        if period not in PERIODS:
+            return None
+        end = parse_datetime_param(request.query_params.get('to'), end=True) or timezone.now()
+        start = parse_datetime_param(request.query_params.get('from')) or end - timedelta(days=30)
+        # Khung chứa thời điểm bắt đầu cũng được tính
+        return period, bucket_start(start, period), end
+
+    def get_limit(self, request):
+        try:
+            return min(max(int(request.query_params.get('limit', 10)), 1), MAX_LIMIT)
+        except ValueError:
+            return 10
+
+    def invalid_period(self):
+        return Response(
+            {"error": "period phải là day hoặc hour"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    def list(self, request):
+        """Tổng quan: hôm nay, 7 ngày và 30 ngày gần nhất"""
+        today = bucket_start(timezone.now(), 'day')
+        days = SalesTotal.objects.filter(period='day')
+        ranges = {
+            'today': today,
+            'last_7_days': today - timedelta(days=6),
+            'last_30_days': today - timedelta(days=29),
+        }
+        return Response({
+            name: _stats(days.filter(bucket__gte=start).aggregate(
+                revenue=Sum('revenue'), order_count=Sum('order_count'), units_sold=Sum('units_sold'),
+            ))
+            for name, start in ranges.items()
+        })
+
+    @action(detail=False, methods=['get'])
+    def revenue(self, request):
+        """Doanh thu theo từng giờ/ngày"""
+        date_range = self.get_range(request)
+        if date_range is None:
+            return self.invalid_period()
+        period, start, end = date_range
+
+        rows = SalesTotal.objects.filter(period=period, bucket__gte=start, bucket__lte=end).order_by('bucket')
+        return Response([
+            {'bucket': timezone.localtime(row['bucket']).isoformat(), **_stats(row)}
+            for row in rows.values('bucket', *ORDER_FIELDS)
+        ])
+
+    @action(detail=False, methods=['get'])
+    def top_products(self, request):
+        """Sản phẩm bán chạy, ?order_by=revenue|units_sold|order_count&limit=10"""
+        date_range = self.get_range(request)
+        if date_range is None:
+            return self.invalid_period()
+        period, start, end = date_range
+        order_by = request.query_params.get('order_by', 'revenue')
+        if order_by not in ORDER_FIELDS:
+            return Response(
+                {"error": "order_by phải là revenue, units_sold hoặc order_count"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = ProductSales.objects.filter(
+            period=period, bucket__gte=start, bucket__lte=end
+        ).values('product_id', product_name=F('product__name')).annotate(
+            revenue=Sum('revenue'), units_sold=Sum('units_sold'), order_count=Sum('order_count'),
+        ).order_by(f'-{order_by}', 'product_id')[:self.get_limit(request)]
+        return Response([
+            {'product_id': row['product_id'], 'product_name': row['product_name'], **_stats(row)}
+            for row in rows
+        ])
+
+    @action(detail=False, methods=['get'])
+    def categories(self, request):
+        """Doanh số theo danh mục"""
+        date_range = self.get_range(request)
+        if date_range is None:
+            return self.invalid_period()
+        period, start, end = date_range
+
+        rows = CategorySales.objects.filter(
+            period=period, bucket__gte=start, bucket__lte=end
+        ).values('category_id', category_name=F('category__name')).annotate(
+            revenue=Sum('revenue'), units_sold=Sum('units_sold'), order_count=Sum('order_count'),
+        ).order_by('-revenue', 'category_id')
+        return Response([
+            {'category_id': row['category_id'], 'category_name': row['category_name'], **_stats(row)}
+            for row in rows
+        ])
+
+    @action(detail=False, methods=['get'])
+    def report(self, request):
+        """
+        Báo cáo ad-hoc tính trực tiếp trên lịch sử OrderItem (analytics.reports)
+        ?type=summary|product|category|baskets|co_occurrence|time&bucket=day&from=&to=&limit=
+        Không giới hạn mặc định 30 ngày: không truyền from/to là toàn bộ lịch sử
+        """
+        report = request.query_params.get('type', 'summary')
+        if report not in REPORTS:
+            return Response(
+                {"error": f"type phải là một trong: {', '.join(REPORTS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in BUCKETS:
+            return Response(
+                {"error": f"bucket phải là một trong: {', '.join(BUCKETS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        engine = ReportEngine(
+            start=parse_datetime_param(request.query_params.get('from')),
+            end=parse_datetime_param(request.query_params.get('to'), end=True),
+        ).load()
+        return Response(engine.run(report, bucket=bucket, limit=self.get_limit(request)))
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def related_products(request, pk):
+    """
+    Sản phẩm thường được mua cùng (top-N tính sẵn trong ProductRelation)
+    GET /api/products/{id}/related/
+    """
+    relations = list(
+        ProductRelation.objects.filter(product_id=pk, related__is_available=True)
+        .select_related('related__category').order_by('rank')
+    )
+    if not relations and not Product.objects.filter(pk=pk).exists():
+        return Response(
+            {"error": "Không tìm thấy sản phẩm"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    data = ProductListSerializer([relation.related for relation in relations], many=True).data
+    for row, relation in zip(data, relations):
+        row['bought_together'] = relation.count
+    return Response(data)
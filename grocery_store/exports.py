@@ -0,0 +1,135 @@
+"""
+Xuất dữ liệu lớn (orders, order items, payment) dạng CSV/NDJSON theo luồng.
+
+Dữ liệu được đọc theo từng khối bằng keyset (pk > id cuối của khối trước)
+với values_list(), không tạo ORM instance và không giữ cả bảng trong bộ
+nhớ. (MySQL không có server-side cursor nên .iterator() vẫn nạp hết kết
+quả về client; đọc theo khối giữ bộ nhớ ổn định trên mọi database.)
+"""
+import csv
+import json
+from datetime import datetime, time
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """File giả cho csv.writer: trả về dòng thay vì ghi"""
+
+    def write(self, value):
+        return value
+
+
+def parse_datetime_param(value, end=False):
+    """Nhận 'YYYY-MM-DD' hoặc ISO datetime; ngày kết thúc tính hết ngày đó"""
+    if not value:
+        return None
+    try:
+        # Đúng định dạng nhưng sai giá trị (tháng 13) thì parse_* raise ValueError
+        parsed = parse_datetime(value)
+        date = parse_date(value) if parsed is None else None
+    except ValueError:
+        parsed = date = None
+    if parsed is None:
+        if date is None:
+            raise ValidationError({"error": f"Ngày không hợp lệ: {value}"})
+        parsed = datetime.combine(date, time.max if end else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def filter_date_range(queryset, request, field='created_at'):
+    """Lọc theo ?from=&to= (bao gồm cả hai đầu)"""
+    start = parse_datetime_param(request.query_params.get('from'))
+    end = parse_datetime_param(request.query_params.get('to'), end=True)
+    if start:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{field}__lte': end})
+    return queryset
+
+
+def iter_rows(queryset, fields, chunk_size=None):
+    """Duyệt values_list theo khối pk tăng dần"""
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list('pk', *fields)[:chunk_size])
+        for row in rows:
+            yield row[1:]
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][0]
+
+
+def format_datetime(value):
+    """Thời gian xuất ra giống nhau ở CSV và NDJSON: ISO 8601 theo UTC, hậu tố Z"""
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value.astimezone(dt_timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return format_datetime(value)
+    return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+    # BOM để Excel đọc đúng tiếng Việt
+    yield '\ufeff' + writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_export_value(value) for value in row])
+
+
+def stream_ndjson(columns, rows):
+    for row in rows:
+        record = dict(zip(columns, map(_export_value, row)))
+        yield json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def batched(stream, size=500):
+    """Gộp nhiều dòng thành một lần ghi ra socket"""
+    buffer = []
+    for line in stream:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def get_export_format(request):
+    export_format = request.query_params.get('fmt', 'csv')
+    if export_format not in FORMATS:
+        raise ValidationError({"error": f"Định dạng không hỗ trợ: {export_format} (csv, ndjson)"})
+    return export_format
+
+
+def export_response(queryset, columns, export_format, filename):
+    """
+    columns: danh sách (tên cột, field cho values_list)
+    """
+    names = [name for name, _ in columns]
+    rows = iter_rows(queryset, [field for _, field in columns])
+    stream = stream_csv(names, rows) if export_format == 'csv' else stream_ndjson(names, rows)
+
+    response = StreamingHttpResponse(batched(stream), content_type=FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -0,0 +1,96 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from grocery_store.pagination import KeysetPagination
+from orders.views import OrderViewSet
+from payment.views import PaymentViewSet
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Chạy EXPLAIN cho câu truy vấn chính của từng endpoint danh sách, "
+        "báo lỗi nếu có endpoint phải quét toàn bảng"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-rows', type=int, default=1000,
+            help='MySQL: bỏ qua full scan trên bảng ước tính ít hơn N dòng (optimizer chọn scan cho bảng nhỏ)',
+        )
+        parser.add_argument('--verbose-plan', action='store_true', help='In toàn bộ kế hoạch thực thi')
+
+    def handle(self, *args, **options):
+        failures = []
+        for name, queryset in self.endpoints():
+            plan, full_scans = self.explain(queryset, options['min_rows'])
+            if options['verbose_plan']:
+                self.stdout.write(plan)
+            if full_scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {name}: {', '.join(full_scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'OK         {name}'))
+
+        if failures:
+            raise CommandError(f'{len(failures)} endpoint quét toàn bảng')
+
+    def endpoints(self):
+        page = slice(0, KeysetPagination.page_size + 1)
+        ordering = KeysetPagination.ordering
+        customer = User(id=1, is_staff=False)
+        staff = User(id=1, is_staff=True)
+
+        products = Product.objects.select_related('category').order_by(*ordering)
+        yield 'GET /api/products/', products[page]
+        yield (
+            'GET /api/products/?category=&is_available=',
+            products.filter(category_id=1, is_available=True)[page],
+        )
+        yield (
+            'GET /api/products/low_stock/',
+            Product.objects.select_related('category').filter(quantity__lte=10, is_available=True),
+        )
+
+        for user in (customer, staff):
+            role = 'admin' if user.is_staff else 'user'
+            orders = self.view_queryset(OrderViewSet, 'list', user)
+            yield f'GET /api/orders/ ({role})', orders.order_by(*ordering)[page]
+            payments = self.view_queryset(PaymentViewSet, 'list', user)
+            yield f'GET /api/payment/ ({role})', payments.order_by(*ordering)[page]
+
+    def view_queryset(self, viewset_class, action, user):
+        """Lấy queryset đúng như viewset dùng cho user này"""
+        request = Request(APIRequestFactory().get('/'))
+        request.user = user
+        view = viewset_class(request=request, action=action, format_kwarg=None, args=(), kwargs={})
+        return view.get_queryset()
+
+    def explain(self, queryset, min_rows):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN {sql}', params)
+                lines = [row[0] for row in cursor.fetchall()]
+                full_scans = [line.strip() for line in lines if 'Seq Scan' in line]
+            elif connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                lines = [row[-1] for row in cursor.fetchall()]
+                full_scans = [
+                    line for line in lines
+                    if line.startswith('SCAN') and 'USING' not in line
+                ]
+            else:
+                cursor.execute(f'EXPLAIN {sql}', params)
+                columns = [column[0] for column in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                lines = [str(row) for row in rows]
+                full_scans = [
+                    f"{row['table']} (~{row['rows']} dòng)" for row in rows
+                    if row.get('type') == 'ALL' and (row.get('rows') or 0) >= min_rows
+                ]
+        return '\n'.join(lines), full_scans
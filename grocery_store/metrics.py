@@ -0,0 +1,340 @@
+"""
+Số liệu hiệu năng theo endpoint: thời gian request, số query và thời gian
+database, thời gian serializer, kích thước response.
+
+RequestMetricsMiddleware đo mỗi request, chạy được cả sync (WSGI) lẫn async
+(ASGI, không thêm lần chuyển thread). Query được đếm bằng một execute wrapper
+gắn một lần vào mỗi connection, cộng vào số liệu của request hiện tại qua
+ContextVar (sync_to_async chép context sang thread chạy ORM nên view async
+cũng được tính); thời gian serializer do SerializerTimingMixin
+(mixin cho ViewSet) cộng vào. Giá trị ghi vào histogram kiểu HDR trong bộ
+nhớ process: bucket log-tuyến tính (16 bucket mỗi lũy thừa 2, sai số dưới
+6.25%), ghi O(1) không cấp phát. Phân vị tính trên cửa sổ trượt
+METRICS_WINDOW giây; _sum/_count cộng dồn từ lúc process chạy.
+
+GET /api/_metrics (admin) trả về dạng text của Prometheus (kiểu summary).
+"""
+import contextvars
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << (SUB_BUCKET_BITS - 1)
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def bucket_index(value):
+    """Giá trị nhỏ hơn 32 có bucket riêng; lớn hơn thì giữ 5 bit cao nhất"""
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return shift * SUB_BUCKETS + (value >> shift)
+
+
+def bucket_upper(index):
+    """Giá trị lớn nhất rơi vào bucket `index`"""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift, mantissa = divmod(index, SUB_BUCKETS)
+    shift -= 1
+    return ((mantissa + SUB_BUCKETS + 1) << shift) - 1
+
+
+class Histogram:
+    """Histogram số nguyên không âm (µs, byte, số query)"""
+    __slots__ = ('counts', 'count', 'max')
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.max = 0
+
+    def record(self, value):
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def percentile(self, quantile):
+        if not self.count:
+            return 0
+        rank = max(quantile * self.count, 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_upper(index), self.max)
+        return self.max
+
+
+# (tên, mô tả, hệ số đổi đơn vị khi xuất)
+METRICS = (
+    ('http_request_duration_seconds', 'Thời gian xử lý request', 1e-6),
+    ('http_request_db_queries', 'Số query database mỗi request', 1),
+    ('http_request_db_duration_seconds', 'Thời gian chạy query database mỗi request', 1e-6),
+    ('http_request_serializer_duration_seconds', 'Thời gian serializer (validate và to_representation)', 1e-6),
+    ('http_response_size_bytes', 'Kích thước body response', 1),
+)
+
+
+class EndpointMetrics:
+    """
+    Số liệu của một (endpoint, method): mỗi metric một histogram cho cửa sổ
+    hiện tại và cửa sổ trước (để tính phân vị), tổng và số lần cộng dồn
+    """
+    __slots__ = ('current', 'previous', 'started', 'counts', 'totals', 'responses')
+
+    def __init__(self, now):
+        self.current = [Histogram() for _ in METRICS]
+        self.previous = [Histogram() for _ in METRICS]
+        self.started = now
+        self.counts = [0] * len(METRICS)
+        self.totals = [0] * len(METRICS)
+        self.responses = {}
+
+    def rotate(self, now, window):
+        if now - self.started >= window:
+            # Quá 2 cửa sổ không có request thì cửa sổ trước cũng đã cũ
+            self.previous = self.current if now - self.started < 2 * window else [Histogram() for _ in METRICS]
+            self.current = [Histogram() for _ in METRICS]
+            self.started = now
+
+    def record(self, status_code, values, now, window):
+        self.rotate(now, window)
+        self.responses[status_code] = self.responses.get(status_code, 0) + 1
+        for position, value in enumerate(values):
+            if value is None:
+                continue
+            value = int(value) if value > 0 else 0
+            self.current[position].record(value)
+            self.counts[position] += 1
+            self.totals[position] += value
+
+    def recent(self, position):
+        merged = Histogram()
+        merged.merge(self.previous[position])
+        merged.merge(self.current[position])
+        return merged
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    @property
+    def window(self):
+        return getattr(settings, 'METRICS_WINDOW', 60)
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def observe(self, endpoint, method, status_code, values):
+        """values: giá trị theo thứ tự METRICS (µs, số query, µs, µs, byte); None là bỏ qua"""
+        now = time.monotonic()
+        window = self.window
+        key = (endpoint, method)
+        with self._lock:
+            metrics = self._endpoints.get(key)
+            if metrics is None:
+                metrics = self._endpoints[key] = EndpointMetrics(now)
+            metrics.record(status_code, values, now, window)
+
+    def render(self):
+        """Dạng text exposition 0.0.4 của Prometheus"""
+        now = time.monotonic()
+        window = self.window
+        rows = []
+        with self._lock:
+            for (endpoint, method), metrics in sorted(self._endpoints.items()):
+                metrics.rotate(now, window)
+                rows.append((
+                    format_labels(endpoint=endpoint, method=method),
+                    sorted(metrics.responses.items()),
+                    [metrics.recent(position) for position in range(len(METRICS))],
+                    list(metrics.counts),
+                    list(metrics.totals),
+                ))
+
+        lines = [
+            '# HELP http_responses_total Số response theo endpoint, method, status',
+            '# TYPE http_responses_total counter',
+        ]
+        for labels, responses, _, _, _ in rows:
+            for status_code, count in responses:
+                lines.append(f'http_responses_total{{{labels},status="{status_code}"}} {count}')
+
+        for position, (name, description, scale) in enumerate(METRICS):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} summary')
+            for labels, _, recent, counts, totals in rows:
+                if not counts[position]:
+                    continue
+                for quantile in QUANTILES:
+                    value = format_value(recent[position].percentile(quantile) * scale)
+                    lines.append(f'{name}{{{labels},quantile="{quantile}"}} {value}')
+                lines.append(f'{name}_sum{{{labels}}} {format_value(totals[position] * scale)}')
+                lines.append(f'{name}_count{{{labels}}} {counts[position]}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+def format_value(value):
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Số liệu của một request, gắn vào request.request_metrics"""
+    __slots__ = ('queries', 'db_time', 'serializer_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Chỉ thêm 2 lần đọc đồng hồ mỗi query
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper của mọi connection: ngoài request được đo thì chạy thẳng"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_counter(sender=None, connection=None, **kwargs):
+    # Connection của mỗi thread (kể cả thread của sync_to_async); mở lại kết nối không gắn thêm
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def endpoint_label(request):
+    # Tên URL (product-list, payment-qr, ...) gọn hơn route dạng regex của router
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+def response_size(response):
+    if response.streaming:
+        # Không đọc trước body dạng luồng (export): chỉ biết kích thước nếu có Content-Length
+        length = response.get('Content-Length')
+        return int(length) if length and length.isdigit() else None
+    return len(response.content)
+
+
+class RequestMetricsMiddleware:
+    """Đặt đầu MIDDLEWARE để tính cả thời gian của các middleware khác"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        # Connection mở trước khi module này được import không nhận connection_created
+        install_query_counter(connection=connection)
+        metrics, token, started = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, started)
+        return response
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return await self.get_response(request)
+
+        metrics, token, started = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, started)
+        return response
+
+    def start(self, request):
+        metrics = request.request_metrics = RequestMetrics()
+        return metrics, _current.set(metrics), time.perf_counter()
+
+    def finish(self, request, response, metrics, started):
+        elapsed = time.perf_counter() - started
+        registry.observe(endpoint_label(request), request.method, response.status_code, (
+            elapsed * 1e6,
+            metrics.queries,
+            metrics.db_time * 1e6,
+            metrics.serializer_time * 1e6,
+            response_size(response),
+        ))
+
+
+def _timed(method, metrics):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            metrics.serializer_time += time.perf_counter() - started
+    return wrapper
+
+
+class SerializerTimingMixin:
+    """
+    Mixin cho ViewSet: cộng thời gian validate (run_validation) và
+    to_representation của serializer vào số liệu của request.
+    Query do serializer chạy (quan hệ lazy) được tính cả ở database
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        metrics = getattr(self.request, 'request_metrics', None)
+        if metrics is not None:
+            # Gán lên instance: Serializer.data và is_valid() gọi qua self.<method>
+            serializer.to_representation = _timed(serializer.to_representation, metrics)
+            serializer.run_validation = _timed(serializer.run_validation, metrics)
+        return serializer
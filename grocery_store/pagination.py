@@ -0,0 +1,93 @@
+"""
+Phân trang cho các endpoint danh sách lớn (products, orders, payment).
+
+Mặc định dùng keyset (cursor) theo (-created_at, -id): không COUNT(*),
+không OFFSET nên trang sâu vẫn nhanh như trang đầu.
+Gửi ?page=N để dùng phân trang theo số trang kiểu cũ; khi đó COUNT(*)
+được cache theo câu SQL trong PAGINATION_COUNT_CACHE_TIMEOUT giây.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator cache kết quả COUNT(*) thay vì đếm lại mỗi request"""
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None:
+            return super().count
+
+        try:
+            sql, params = query.sql_with_params()
+        except Exception:
+            return super().count
+        digest = hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+        key = f'pagination:count:{digest}'
+
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 60))
+        return count
+
+
+class CachedCountPageNumberPagination(PageNumberPagination):
+    django_paginator_class = CachedCountPaginator
+
+
+class KeysetPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class KeysetOrPageNumberPagination(BasePagination):
+    """
+    Chọn kiểu phân trang theo từng request:
+    - Mặc định: keyset (?cursor=...)
+    - Có ?page=N: phân trang theo số trang với count được cache
+    """
+
+    def __init__(self):
+        self.keyset = KeysetPagination()
+        self.page_number = CachedCountPageNumberPagination()
+        self.active = self.keyset
+
+    def get_paginator(self, request):
+        if self.page_number.page_query_param in request.query_params:
+            return self.page_number
+        return self.keyset
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.active = self.get_paginator(request)
+        return self.active.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.active.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.keyset.get_paginated_response_schema(schema)
+
+    def to_html(self):
+        return self.active.to_html()
+
+    def get_results(self, data):
+        return data['results']
+
+    def get_schema_fields(self, view):
+        return self.keyset.get_schema_fields(view) + self.page_number.get_schema_fields(view)
+
+    def get_schema_operation_parameters(self, view):
+        return (
+            self.keyset.get_schema_operation_parameters(view)
+            + self.page_number.get_schema_operation_parameters(view)
+        )
+
+    @property
+    def display_page_controls(self):
+        return self.active.display_page_controls
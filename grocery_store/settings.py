@@ -49,9 +49,15 @@ INSTALLED_APPS = [
     'users',
     'orders',
     'payment',
+    'analytics',
+    'tasks',
+    # Lệnh quản trị dùng chung cho cả project (explain_endpoints)
+    'grocery_store',
 ]
 
 MIDDLEWARE = [
+    # Đặt đầu tiên để đo cả thời gian của các middleware khác (GET /api/_metrics)
+    'grocery_store.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -148,7 +154,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',  # Cho phép không đăng nhập xem sản phẩm
@@ -160,8 +166,115 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Token bucket theo user (hoặc IP) cho từng scope, xem grocery_store.throttling
+    'DEFAULT_THROTTLE_RATES': {
+        'catalog': '300/min',
+        'search': '60/min',
+        'checkout': '30/min',
+        'payment': '30/min',
+        'auth': '20/min',
+    },
+    # Số reverse proxy tin cậy phía trước app: throttle theo IP lấy địa chỉ từ X-Forwarded-For
+    # đúng số proxy này. 0: chỉ dùng REMOTE_ADDR (client tự đặt X-Forwarded-For cũng không đổi
+    # được bucket); chạy sau 1 nginx/load balancer thì đặt 1
+    'NUM_PROXIES': 0,
+}
+
+# Cache
+# Catalog (products, categories) dùng alias riêng để đổi backend độc lập,
+# ví dụ Redis: {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#               'LOCATION': 'redis://127.0.0.1:6379/1'}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+    },
 }
 
+CATALOG_CACHE_ALIAS = 'catalog'
+CATALOG_CACHE_TIMEOUT = 300  # giây
+
+# Tìm kiếm sản phẩm (products.search)
+PRODUCT_SEARCH_MAX_RESULTS = 1000
+# Nạp lại index sau N giây: signal chỉ cập nhật index của process hiện tại,
+# sản phẩm thêm/sửa ở process khác chỉ tìm thấy được sau khi nạp lại
+PRODUCT_SEARCH_INDEX_TTL = 300
+# Tương tự cho index gợi ý sản phẩm (products.suggest)
+PRODUCT_SUGGEST_INDEX_TTL = 300
+
+# Cảnh báo sắp hết hàng (products.low_stock): ngưỡng khi sản phẩm và danh mục
+# đều chưa đặt, và nơi nhận sự kiện (LogSink, WebhookSink, QueueSink)
+LOW_STOCK_DEFAULT_THRESHOLD = 10
+LOW_STOCK_SINKS = [
+    'products.low_stock.LogSink',
+]
+LOW_STOCK_WEBHOOK_URL = None  # Dùng cho WebhookSink, ví dụ 'https://hooks.example.com/low-stock'
+# Nạp lại danh sách sắp hết hàng sau N giây (None: chỉ cập nhật qua signal của process hiện tại)
+LOW_STOCK_INDEX_TTL = 300
+
+# Số sản phẩm "thường được mua cùng" giữ sẵn cho mỗi sản phẩm (analytics.recommendations)
+RECOMMENDATION_TOP_N = 10
+
+# Idempotency-Key (orders.idempotency): thời gian lưu kết quả, thời gian tối đa
+# một request được giữ key, số lần lưu giữa 2 lần dọn key hết hạn
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+IDEMPOTENCY_EVICT_EVERY = 100
+
+# Hàng đợi task (tasks): chạy `python manage.py run_worker` để xử lý.
+# TASKS_ALWAYS_EAGER = True: chạy task ngay sau commit trong process web (không cần worker)
+TASKS_ALWAYS_EAGER = False
+TASKS_MAX_ATTEMPTS = 5
+TASKS_RETRY_BACKOFF = 5  # Giây, nhân đôi sau mỗi lần lỗi
+TASKS_RETRY_MAX_DELAY = 60 * 60
+TASKS_VISIBILITY_TIMEOUT = 5 * 60  # Task running lâu hơn coi như worker đã chết
+TASKS_DONE_RETENTION = 60 * 60  # Giữ task đã xong để tính latency
+
+# Số log mới nhất (payment.logs) trả về kèm mỗi payment
+PAYMENT_RECENT_LOGS = 20
+
+# Mã QR thanh toán (payment.vietqr): mã BIN ngân hàng nhận tiền (MB Bank),
+# thư mục cache ảnh, số ảnh giữ trong bộ nhớ, số pixel mỗi module của ảnh PNG
+VIETQR_BANK_BIN = '970422'
+PAYMENT_QR_CACHE_DIR = MEDIA_ROOT / 'qr'
+PAYMENT_QR_MEMORY_CACHE_SIZE = 256
+PAYMENT_QR_SCALE = 8
+
+# Dọn đơn pending hết hạn (`python manage.py sweep_expired`): đơn quá hạn bị hủy, trả hàng
+# về kho và hủy payment pending của đơn; số dòng mỗi transaction
+ORDER_PENDING_TTL = 24 * 60 * 60
+EXPIRY_BATCH_SIZE = 500
+
+# Xác thực JWT (users.authentication): số user và thời gian (giây) giữ trong cache của
+# mỗi process. AUTH_STATELESS_TOKENS = True: dựng user từ claim username/is_staff của
+# token khi cache chưa có, không query database (đổi quyền có hiệu lực với token cấp sau)
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 60
+AUTH_STATELESS_TOKENS = False
+
+# Nơi giữ bucket của throttling: LocalMemoryStore (mỗi process) hoặc CacheStore
+# (dùng chung qua cache THROTTLE_CACHE_ALIAS, nên trỏ tới Redis/Memcached khi chạy nhiều process)
+THROTTLE_STORE = 'grocery_store.throttling.LocalMemoryStore'
+THROTTLE_CACHE_ALIAS = 'default'
+THROTTLE_MAX_KEYS = 100000
+
+# Số liệu hiệu năng theo endpoint (grocery_store.metrics): bật/tắt middleware,
+# độ dài cửa sổ (giây) để tính phân vị
+METRICS_ENABLED = True
+METRICS_WINDOW = 60
+
+# Số sản phẩm tối đa mỗi request POST /api/products/bulk_stock/
+BULK_STOCK_MAX_ITEMS = 10000
+
+# Số dòng đọc mỗi lần khi xuất CSV/NDJSON (grocery_store.exports)
+EXPORT_CHUNK_SIZE = 2000
+
+# Thời gian cache COUNT(*) khi client chọn phân trang ?page=N (giây)
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+
 # JWT Settings
 from datetime import timedelta
 
@@ -0,0 +1,152 @@
+import csv
+import json
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from orders.models import Order
+from payment.models import Payment
+from products.models import Category, Product
+from . import metrics
+
+
+class ExplainEndpointsTests(TestCase):
+
+    def test_explains_every_list_endpoint(self):
+        out = StringIO()
+        call_command('explain_endpoints', '--verbose-plan', stdout=out)
+        output = out.getvalue()
+        for endpoint in ('GET /api/products/', 'GET /api/orders/ (user)', 'GET /api/payment/ (admin)'):
+            self.assertIn(f'OK         {endpoint}', output)
+
+
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='x')
+        self.other = User.objects.create_user('other', password='x')
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.january = self.create_order(self.user, datetime(2025, 1, 10, 17, 30, tzinfo=dt_timezone.utc))
+        self.february = self.create_order(self.user, datetime(2025, 2, 10, 8, 0, tzinfo=dt_timezone.utc))
+        self.foreign = self.create_order(self.other, datetime(2025, 1, 15, 8, 0, tzinfo=dt_timezone.utc))
+
+    def create_order(self, user, created_at):
+        order = Order.objects.create(user=user, total_price=100)
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        payment = Payment.objects.create(order=order, amount=100)
+        Payment.objects.filter(pk=payment.pk).update(created_at=created_at)
+        return order
+
+    def export(self, url, user):
+        self.client.force_authenticate(user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_and_ndjson_have_same_rows(self):
+        rows = list(csv.DictReader(StringIO(self.export('/api/orders/export/?fmt=csv', self.user).lstrip('\ufeff'))))
+        records = [json.loads(line) for line in self.export('/api/orders/export/?fmt=ndjson', self.user).splitlines()]
+
+        self.assertEqual([row['id'] for row in rows], [str(self.january.pk), str(self.february.pk)])
+        self.assertEqual([record['id'] for record in records], [self.january.pk, self.february.pk])
+        # Cùng một định dạng thời gian (UTC, hậu tố Z) ở cả hai
+        self.assertEqual(rows[0]['created_at'], '2025-01-10T17:30:00Z')
+        self.assertEqual(records[0]['created_at'], rows[0]['created_at'])
+        self.assertEqual(records[0]['total_price'], rows[0]['total_price'])
+
+    def test_user_only_exports_own_orders_and_payments(self):
+        for url in ('/api/orders/export/?fmt=ndjson', '/api/orders/export/?fmt=ndjson&type=items',
+                    '/api/payment/export/?fmt=ndjson'):
+            output = self.export(url, self.user)
+            self.assertNotIn('"other"', output)
+            self.assertNotIn(f'"order_id": {self.foreign.pk},', output)
+
+        records = [json.loads(line) for line in self.export('/api/orders/export/?fmt=ndjson', self.admin).splitlines()]
+        self.assertEqual(len(records), 3)
+
+    def test_date_range_filters(self):
+        def ids(url):
+            return [json.loads(line)['id'] for line in self.export(url, self.admin).splitlines()]
+
+        # to= là ngày thì tính hết ngày đó (theo TIME_ZONE)
+        self.assertEqual(ids('/api/orders/export/?fmt=ndjson&from=2025-01-01&to=2025-01-31'),
+                         [self.january.pk, self.foreign.pk])
+        self.assertEqual(ids('/api/payment/export/?fmt=ndjson&from=2025-02-01'),
+                         [Payment.objects.get(order=self.february).pk])
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/orders/export/?from=2025-13-01')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.data)
+
+
+class RequestMetricsTests(APITestCase):
+
+    def setUp(self):
+        metrics.registry.clear()
+        # Connection của test đã mở trước khi module metrics được import
+        metrics.install_query_counter(connection=connection)
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password123')
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'password123', is_staff=True)
+        for _ in range(3):
+            Order.objects.create(user=self.user)
+
+    def test_histogram_buckets_are_within_precision(self):
+        histogram = metrics.Histogram()
+        for value in range(1, 100001):
+            histogram.record(value)
+        for quantile in (0.5, 0.9, 0.99):
+            expected = quantile * 100000
+            self.assertLessEqual(abs(histogram.percentile(quantile) - expected) / expected, 1 / 16)
+        self.assertEqual(histogram.percentile(1), 100000)
+        for value in (0, 31, 32, 33, 1000, 2 ** 40):
+            self.assertGreaterEqual(metrics.bucket_upper(metrics.bucket_index(value)), value)
+
+    def test_records_queries_serializer_and_size_per_endpoint(self):
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/orders/')
+        self.assertEqual(response.status_code, 200)
+        # Request sau reset connection.queries: đếm trước
+        query_count = len(queries)
+
+        self.client.force_authenticate(self.admin)
+        text = self.client.get('/api/_metrics').content.decode()
+        labels = 'endpoint="order-list",method="GET"'
+        self.assertIn(f'http_responses_total{{{labels},status="200"}} 1', text)
+        self.assertIn(f'http_request_db_queries_sum{{{labels}}} {query_count}', text)
+        self.assertIn(f'http_response_size_bytes_sum{{{labels}}} {len(response.content)}', text)
+        self.assertIn(f'http_request_serializer_duration_seconds_count{{{labels}}} 1', text)
+        self.assertIn('# TYPE http_request_duration_seconds summary', text)
+
+    async def test_async_views_are_measured_without_thread_hop(self):
+        async def get_response(request):
+            return HttpResponse()
+        self.assertTrue(iscoroutinefunction(metrics.RequestMetricsMiddleware(get_response)))
+
+        category = await Category.objects.acreate(name='Đồ uống')
+        await Product.objects.acreate(name='Trà', category=category, price=10, quantity=5)
+        response = await self.async_client.get('/api/async/products/')
+        self.assertEqual(response.status_code, 200)
+
+        text = metrics.registry.render()
+        labels = 'endpoint="async-product-list",method="GET"'
+        self.assertIn(f'http_responses_total{{{labels},status="200"}} 1', text)
+        # Query chạy trong thread của sync_to_async vẫn được tính cho request
+        queries = [
+            line.rsplit(' ', 1)[1] for line in text.splitlines()
+            if line.startswith(f'http_request_db_queries_sum{{{labels}}}')
+        ]
+        self.assertGreater(int(queries[0]), 0)
+
+    def test_endpoint_is_admin_only(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/_metrics').status_code, 403)
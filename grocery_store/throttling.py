@@ -0,0 +1,218 @@
+"""
+Giới hạn tần suất request theo token bucket, theo từng user và từng scope.
+
+Mỗi (scope, user hoặc IP) có một bucket chứa tối đa N token, được nạp lại
+đều N token mỗi chu kỳ; mỗi request lấy 1 token, bucket rỗng thì trả 429
+kèm Retry-After. Tốc độ lấy từ REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] theo
+cú pháp của DRF ('60/min'); scope không có tốc độ thì không giới hạn.
+
+DRF kiểm tra throttle trong APIView.initial(), trước handler của view, nên
+request bị từ chối không chạm tới database. View Django thường (endpoint async
+của catalog) dùng decorator throttle_view() với cùng lớp throttle và cùng bucket.
+Bucket nằm trong THROTTLE_STORE:
+LocalMemoryStore (mỗi process một bộ đếm) hoặc CacheStore (dùng chung giữa
+các process qua cache THROTTLE_CACHE_ALIAS, ví dụ Redis/Memcached).
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.test.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import Throttled
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """'60/min' -> (sức chứa 60 token, nạp 1 token/giây)"""
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period.strip()[0]]
+
+
+def take(state, capacity, refill_rate, now):
+    """
+    Lấy 1 token từ bucket state = (số token, thời điểm cập nhật) hoặc None (bucket đầy).
+    Trả về (state mới, số giây phải chờ); chờ 0 là được phép
+    """
+    tokens, updated = state or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * refill_rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / refill_rate
+
+
+class LocalMemoryStore:
+    """Bucket trong bộ nhớ process; quá THROTTLE_MAX_KEYS key thì bỏ key ít dùng nhất"""
+
+    def __init__(self, max_keys=None):
+        self._max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    @property
+    def max_keys(self):
+        return self._max_keys or getattr(settings, 'THROTTLE_MAX_KEYS', 100000)
+
+    def consume(self, key, capacity, refill_rate):
+        with self._lock:
+            state, wait = take(self._buckets.get(key), capacity, refill_rate, time.monotonic())
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheStore:
+    """
+    Bucket trong Django cache, dùng chung giữa các process/server.
+    Đọc-ghi không nguyên tử: vài request đồng thời có thể cùng lấy token cuối
+    """
+
+    def __init__(self, alias=None):
+        self._alias = alias
+
+    @property
+    def cache(self):
+        return caches[self._alias or getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+    def consume(self, key, capacity, refill_rate):
+        state, wait = take(self.cache.get(key), capacity, refill_rate, time.time())
+        # Hết timeout thì bucket đã nạp đầy, xóa key cũng như giữ lại
+        self.cache.set(key, state, timeout=int(capacity / refill_rate) + 1)
+        return wait
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = import_string(
+            getattr(settings, 'THROTTLE_STORE', 'grocery_store.throttling.LocalMemoryStore')
+        )()
+    return _store
+
+
+@receiver(setting_changed)
+def reset_store(setting, **kwargs):
+    global _store
+    if setting in ('THROTTLE_STORE', 'THROTTLE_CACHE_ALIAS', 'REST_FRAMEWORK'):
+        _store = None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle theo scope; lớp con chọn loại request áp dụng qua applies()"""
+    scope = None
+
+    def applies(self, request, view):
+        return True
+
+    def get_cache_key(self, request):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return f'throttle:{self.scope}:{ident}'
+
+    def allow_request(self, request, view):
+        rate = (api_settings.DEFAULT_THROTTLE_RATES or {}).get(self.scope)
+        if rate is None or not self.applies(request, view):
+            return True
+        capacity, refill_rate = parse_rate(rate)
+        self.wait_seconds = get_store().consume(self.get_cache_key(request), capacity, refill_rate)
+        return self.wait_seconds == 0
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class CatalogThrottle(TokenBucketThrottle):
+    """Đọc danh sách/chi tiết sản phẩm, danh mục"""
+    scope = 'catalog'
+
+    def applies(self, request, view):
+        return request.method in ('GET', 'HEAD')
+
+
+class SearchThrottle(TokenBucketThrottle):
+    """Tìm kiếm (?search=) và gợi ý: tốn CPU database hơn đọc thường, tính thêm bucket riêng"""
+    scope = 'search'
+
+    def applies(self, request, view):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        return getattr(view, 'action', None) == 'suggest' or bool(
+            request.query_params.get(api_settings.SEARCH_PARAM, '').strip()
+        )
+
+
+class CheckoutThrottle(TokenBucketThrottle):
+    """Tạo đơn hàng (giữ tồn kho) và các action POST khác của đơn hàng"""
+    scope = 'checkout'
+
+    def applies(self, request, view):
+        return request.method == 'POST'
+
+
+class PaymentThrottle(TokenBucketThrottle):
+    """Tạo QR, xác nhận, hủy thanh toán"""
+    scope = 'payment'
+
+    def applies(self, request, view):
+        return request.method == 'POST'
+
+
+class AuthThrottle(TokenBucketThrottle):
+    """Đăng ký, đăng nhập, refresh token: theo IP để chặn dò mật khẩu"""
+    scope = 'auth'
+
+    def get_cache_key(self, request):
+        return f'throttle:{self.scope}:ip:{self.get_ident(request)}'
+
+
+def throttle_view(*throttle_classes):
+    """
+    Throttle cho view async không qua APIView (products.async_views): cùng bucket
+    với view DRF cùng scope; bị từ chối thì trả 429 kèm Retry-After như DRF
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            # Không có authenticator: user ẩn danh, bucket theo IP
+            drf_request = Request(request)
+            waits = []
+            for throttle_class in throttle_classes:
+                throttle = throttle_class()
+                if isinstance(get_store(), LocalMemoryStore):
+                    allowed = throttle.allow_request(drf_request, None)
+                else:
+                    # CacheStore gọi cache qua mạng: chạy trong thread, không chặn event loop
+                    allowed = await sync_to_async(throttle.allow_request)(drf_request, None)
+                if not allowed:
+                    waits.append(throttle.wait())
+            if waits:
+                exc = Throttled(max(waits))
+                response = JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+                response['Retry-After'] = str(math.ceil(max(waits)))
+                return response
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -6,6 +6,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from .views import prometheus_metrics
+
 # Swagger/OpenAPI Schema
 schema_view = get_schema_view(
     openapi.Info(
@@ -33,7 +35,10 @@ urlpatterns = [
     path('api/', include('products.urls')),
     path('api/', include('orders.urls')),
     path('api/', include('payment.urls')),
+    path('api/', include('analytics.urls')),
+    path('api/', include('tasks.urls')),
     path('api/auth/', include('users.urls')),
+    path('api/_metrics', prometheus_metrics, name='metrics'),
 ]
 
 # Media files trong development
@@ -0,0 +1,15 @@
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+from . import metrics
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def prometheus_metrics(request):
+    """
+    Số liệu hiệu năng theo endpoint dạng text của Prometheus, chỉ dành cho admin
+    GET /api/_metrics
+    """
+    return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
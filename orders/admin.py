@@ -1,4 +1,5 @@
 from django.contrib import admin
+from analytics.jobs import record_orders_later
 from .models import Order, OrderItem
 
 
@@ -25,10 +26,13 @@ class OrderAdmin(admin.ModelAdmin):
 
     def mark_as_paid(self, request, queryset):
         queryset.update(paid=True, status='processing')
+        # update() không gửi post_save: đưa việc cộng doanh số vào hàng đợi
+        record_orders_later(queryset)
     mark_as_paid.short_description = "Đánh dấu đã thanh toán"
 
     def mark_as_completed(self, request, queryset):
         queryset.update(status='completed')
+        record_orders_later(queryset)
     mark_as_completed.short_description = "Đánh dấu hoàn thành"
 
     def save_formset(self, request, form, formset, change):
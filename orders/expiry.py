@@ -0,0 +1,141 @@
+"""
+Dọn đơn hàng và payment pending đã hết hạn.
+
+Đơn pending quá ORDER_PENDING_TTL giây bị hủy, trả hàng về kho và hủy luôn
+payment pending của đơn (release_orders, dùng chung với API hủy đơn).
+Payment chỉ hết hạn cùng đơn hàng: đơn còn mở thì khách vẫn quét QR và
+thanh toán được; payment còn pending của đơn đã hủy cũng được dọn. Mỗi lô tối đa
+`batch_size` dòng được chọn qua index (status, created_at), khóa bằng
+SELECT ... FOR UPDATE SKIP LOCKED và xử lý trong một transaction ngắn:
+vài câu UPDATE cho cả lô, tồn kho cộng lại bằng F(), PaymentLog ghi bằng
+bulk_create. Dòng đang bị request khác khóa được bỏ qua, để lần quét sau.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from payment.logs import payment_logs
+from payment.models import Payment
+from products import inventory
+
+from .models import Order, OrderItem
+
+
+def get_order_ttl():
+    return getattr(settings, 'ORDER_PENDING_TTL', 24 * 60 * 60)
+
+
+def get_batch_size():
+    return getattr(settings, 'EXPIRY_BATCH_SIZE', 500)
+
+
+def expired_orders(now=None):
+    cutoff = (now or timezone.now()) - timedelta(seconds=get_order_ttl())
+    return Order.objects.filter(status='pending', paid=False, created_at__lt=cutoff)
+
+
+def expired_payments(now=None):
+    """Payment pending của đơn đã hủy (subquery, không JOIN để FOR UPDATE chỉ khóa payment)"""
+    return Payment.objects.filter(
+        status='pending', order__in=Order.objects.filter(status='cancelled').values('pk'),
+    )
+
+
+def _lock_batch(queryset, batch_size):
+    # Cũ nhất trước; skip_locked: không chờ checkout/xác nhận thanh toán đang chạy
+    return list(
+        queryset.select_for_update(skip_locked=True)
+        .order_by('created_at', 'id')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+
+
+def _cancel_payments(payment_ids, now, message):
+    Payment.objects.filter(pk__in=payment_ids).update(status='cancelled', updated_at=now)
+    for payment_id in payment_ids:
+        payment_logs.add(payment_id, 'cancelled', message)
+
+
+def release_orders(order_ids, now, message):
+    """
+    Trả hàng của các đơn vừa bị hủy về kho và hủy payment pending của chúng.
+    Gọi trong transaction, khi các đơn đang bị khóa (SELECT ... FOR UPDATE)
+    """
+    # Gộp theo sản phẩm: mỗi product chỉ 1 nhánh trong câu UPDATE trả hàng
+    quantities = dict(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values('product_id').order_by()
+        .annotate(total=Sum('quantity'))
+        .values_list('product_id', 'total')
+    )
+    inventory.release(quantities)
+
+    payment_ids = list(
+        Payment.objects.filter(order_id__in=order_ids, status='pending').values_list('pk', flat=True)
+    )
+    _cancel_payments(payment_ids, now, message)
+
+
+def expire_orders(batch_size=None, now=None):
+    """Hủy 1 lô đơn hết hạn, trả hàng về kho; trả về số đơn đã hủy"""
+    now = now or timezone.now()
+    with payment_logs.batch():
+        order_ids = _lock_batch(expired_orders(now), batch_size or get_batch_size())
+        if not order_ids:
+            return 0
+
+        Order.objects.filter(pk__in=order_ids).update(status='cancelled', updated_at=now)
+        release_orders(order_ids, now, 'Đơn hàng hết hạn thanh toán')
+    return len(order_ids)
+
+
+def expire_payments(batch_size=None, now=None):
+    """Hủy 1 lô payment pending của đơn đã hủy; trả về số payment đã hủy"""
+    now = now or timezone.now()
+    with payment_logs.batch():
+        payment_ids = _lock_batch(expired_payments(now), batch_size or get_batch_size())
+        _cancel_payments(payment_ids, now, 'Đơn hàng đã bị hủy')
+    return len(payment_ids)
+
+
+class SweepResult:
+
+    def __init__(self):
+        self.orders = 0
+        self.payments = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def as_dict(self):
+        return {
+            'orders': self.orders,
+            'payments': self.payments,
+            'batches': self.batches,
+            'elapsed_seconds': round(self.elapsed, 3),
+        }
+
+
+def sweep(batch_size=None, max_batches=None, pause=0):
+    """
+    Quét cho tới khi hết dòng hết hạn (hoặc đủ max_batches lô), nghỉ `pause`
+    giây giữa các lô để không chiếm database liên tục
+    """
+    batch_size = batch_size or get_batch_size()
+    result = SweepResult()
+    for expire, field in ((expire_orders, 'orders'), (expire_payments, 'payments')):
+        while max_batches is None or result.batches < max_batches:
+            count = expire(batch_size)
+            if count:
+                result.batches += 1
+                setattr(result, field, getattr(result, field) + count)
+            if count < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+    result.elapsed = time.perf_counter() - result.started
+    return result
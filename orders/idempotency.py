@@ -0,0 +1,170 @@
+"""
+Idempotency-Key cho các request ghi (tạo đơn hàng, tạo/xác nhận thanh toán).
+
+Client gửi header Idempotency-Key; lần đầu request chạy bình thường và kết
+quả (status + body JSON) được lưu trong IdempotencyKey. Gửi lại cùng key thì
+nhận lại đúng kết quả đã lưu mà không chạy lại phần ghi. Hai request cùng
+key chạy song song: request sau nhận 409. Key hết hạn sau IDEMPOTENCY_KEY_TTL
+giây và được xóa dần (xem evict_expired).
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+_stored = 0
+
+
+def get_ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+
+
+def get_lock_timeout():
+    """Request giữ key quá thời gian này coi như đã chết (process bị kill giữa chừng)"""
+    return getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60)
+
+
+def _digest(*parts):
+    return hashlib.sha256('\x1f'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    body = json.dumps(data, sort_keys=True, cls=JSONEncoder, default=str)
+    return _digest(request.method, request.path, body)
+
+
+def evict_expired(limit=1000):
+    """Xóa tối đa `limit` key đã hết hạn; trả về số key đã xóa"""
+    expired = list(
+        IdempotencyKey.objects.filter(expires_at__lt=timezone.now()).values_list('pk', flat=True)[:limit]
+    )
+    if not expired:
+        return 0
+    return IdempotencyKey.objects.filter(pk__in=expired).delete()[0]
+
+
+def _maybe_evict():
+    # Dọn key hết hạn sau mỗi IDEMPOTENCY_EVICT_EVERY lần lưu, không cần cron
+    global _stored
+    _stored += 1
+    if _stored >= getattr(settings, 'IDEMPOTENCY_EVICT_EVERY', 100):
+        _stored = 0
+        evict_expired()
+
+
+def _claim(key, request_fingerprint):
+    """
+    Tạo dòng giữ chỗ cho key. Trả về None nếu giành được key, ngược lại
+    trả về Response (kết quả đã lưu, 409 hoặc 422).
+    """
+    now = timezone.now()
+    for _ in range(2):
+        existing = IdempotencyKey.objects.filter(pk=key).first()
+        if existing is None:
+            try:
+                with transaction.atomic():
+                    IdempotencyKey.objects.create(
+                        key=key, fingerprint=request_fingerprint, expires_at=now + timedelta(seconds=get_ttl())
+                    )
+                return None
+            except IntegrityError:
+                # Request khác cùng key vừa giữ chỗ
+                continue
+
+        abandoned = (
+            existing.status_code is None
+            and existing.created_at < now - timedelta(seconds=get_lock_timeout())
+        )
+        if existing.expires_at < now or abandoned:
+            IdempotencyKey.objects.filter(pk=key, created_at=existing.created_at).delete()
+            continue
+        if existing.fingerprint != request_fingerprint:
+            return Response(
+                {"error": "Idempotency-Key đã được dùng cho một request khác"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if existing.status_code is None:
+            return Response(
+                {"error": "Request với Idempotency-Key này đang được xử lý"},
+                status=status.HTTP_409_CONFLICT
+            )
+        response = Response(json.loads(existing.response or 'null'), status=existing.status_code)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    return Response(
+        {"error": "Request với Idempotency-Key này đang được xử lý"},
+        status=status.HTTP_409_CONFLICT
+    )
+
+
+def idempotent(scope):
+    """
+    Decorator cho action của viewset:
+
+        @idempotent('orders.create')
+        def create(self, request, *args, **kwargs): ...
+
+    Không có header Idempotency-Key thì request chạy như cũ.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            raw_key = request.META.get(HEADER)
+            if not raw_key:
+                return view(self, request, *args, **kwargs)
+            if len(raw_key) > MAX_KEY_LENGTH:
+                return Response(
+                    {"error": f"Idempotency-Key tối đa {MAX_KEY_LENGTH} ký tự"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            key = _digest(request.user.pk, scope, raw_key)
+            replay = _claim(key, fingerprint(request))
+            if replay is not None:
+                return replay
+
+            try:
+                # Phần ghi của view và kết quả lưu lại cùng commit hoặc cùng rollback
+                with transaction.atomic():
+                    response = view(self, request, *args, **kwargs)
+                    if response.status_code >= 500:
+                        raise _ServerError(response)
+                    IdempotencyKey.objects.filter(pk=key).update(
+                        status_code=response.status_code,
+                        # Cùng encoder với JSONRenderer để bản phát lại giống hệt lần đầu
+                        response=json.dumps(response.data, cls=JSONEncoder, ensure_ascii=False),
+                    )
+            except _ServerError as error:
+                IdempotencyKey.objects.filter(pk=key).delete()
+                return error.response
+            except Exception:
+                # Lỗi: bỏ giữ chỗ để client gửi lại được
+                IdempotencyKey.objects.filter(pk=key).delete()
+                raise
+
+            _maybe_evict()
+            return response
+        return wrapper
+    return decorator
+
+
+class _ServerError(Exception):
+
+    def __init__(self, response):
+        self.response = response
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from orders.idempotency import evict_expired
+
+
+class Command(BaseCommand):
+    help = "Xóa các Idempotency-Key đã hết hạn"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            deleted = evict_expired(limit=options['batch_size'])
+            total += deleted
+            if deleted < options['batch_size']:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Đã xóa {total} key hết hạn'))
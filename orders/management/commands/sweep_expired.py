@@ -0,0 +1,48 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders import expiry
+
+
+class Command(BaseCommand):
+    help = "Hủy đơn hàng/payment pending đã hết hạn và trả hàng về kho, theo từng lô nhỏ"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Số dòng mỗi transaction (EXPIRY_BATCH_SIZE)')
+        parser.add_argument('--max-batches', type=int, default=None, help='Dừng sau N lô mỗi lượt quét')
+        parser.add_argument('--pause', type=float, default=0.0, help='Nghỉ giữa các lô (giây)')
+        parser.add_argument('--loop', type=float, default=None, help='Chạy liên tục, quét lại sau N giây')
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ đếm số dòng hết hạn')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(
+                f'Hết hạn: {expiry.expired_orders().count()} đơn hàng, '
+                f'{expiry.expired_payments().count()} payment'
+            )
+            return
+
+        self.running = True
+
+        def stop(signum, frame):
+            # Xong lô đang chạy rồi mới dừng
+            self.running = False
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        while self.running:
+            result = expiry.sweep(
+                batch_size=options['batch_size'], max_batches=options['max_batches'], pause=options['pause'],
+            ).as_dict()
+            self.stdout.write(
+                f"Đã hủy {result['orders']} đơn hàng, {result['payments']} payment "
+                f"({result['batches']} lô) trong {result['elapsed_seconds']:.2f}s"
+            )
+            if options['loop'] is None:
+                break
+            deadline = time.monotonic() + options['loop']
+            while self.running and time.monotonic() < deadline:
+                time.sleep(min(1.0, options['loop']))
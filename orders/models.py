@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import DecimalField, F, Sum
 from django.contrib.auth.models import User
 from products.models import Product
 
@@ -20,13 +21,24 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Danh sách của admin / phân trang keyset
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            # Danh sách của user: user=... sắp xếp theo -created_at
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+            # Quét đơn pending hết hạn (orders.expiry)
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
 
     def calculate_total(self):
         """Tính tổng tiền từ các OrderItem"""
-        total = sum(item.get_total_price() for item in self.items.all())
+        # Cộng trong database thay vì lặp từng item
+        total = self.items.aggregate(
+            total=Sum(F('quantity') * F('price'), output_field=DecimalField(max_digits=10, decimal_places=2))
+        )['total'] or 0
         self.total_price = total
         self.save()
         return total
@@ -50,3 +62,19 @@ class OrderItem(models.Model):
         if not self.price:
             self.price = self.product.price
         super().save(*args, **kwargs)
+
+
+class IdempotencyKey(models.Model):
+    """
+    Kết quả đã lưu của request ghi có header Idempotency-Key.
+    key = sha256(user_id, scope, Idempotency-Key) để khóa chính ngắn và cố định.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    fingerprint = models.CharField(max_length=64)  # sha256 của method, path và body
+    status_code = models.PositiveSmallIntegerField(null=True)  # NULL: đang xử lý
+    response = models.TextField(blank=True)  # Body JSON đã trả về
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
@@ -1,9 +1,30 @@
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 from .models import Order, OrderItem
+from products import inventory
+from products.models import Product
 from products.serializers import ProductListSerializer
 
 
+class BasketProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Lấy product từ cache của giỏ hàng (nạp 1 lần cho cả đơn)
+    thay vì 1 query cho mỗi dòng
+    """
+
+    def to_internal_value(self, data):
+        basket_products = self.context.get('basket_products')
+        if basket_products is None:
+            return super().to_internal_value(data)
+        try:
+            return basket_products[int(data)]
+        except (KeyError, TypeError, ValueError):
+            return super().to_internal_value(data)
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
+    product = BasketProductField(queryset=Product.objects.all())
     product_name = serializers.CharField(source='product.name', read_only=True)
     total_price = serializers.SerializerMethodField()
 
@@ -53,25 +74,61 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'user_name', 'items', 'total_price', 'paid', 'status', 'created_at', 'updated_at']
         read_only_fields = ['total_price', 'created_at', 'updated_at']
 
+    def to_internal_value(self, data):
+        # Nạp toàn bộ product trong giỏ hàng bằng 1 query
+        items = data.get('items') if hasattr(data, 'get') else None
+        if isinstance(items, list):
+            product_ids = set()
+            for item in items:
+                try:
+                    product_ids.add(int(item.get('product')))
+                except (AttributeError, TypeError, ValueError):
+                    continue
+            self.context['basket_products'] = Product.objects.in_bulk(product_ids)
+        return super().to_internal_value(data)
+
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
 
-        # Tạo OrderItems
-        for item_data in items_data:
-            # price đã được tự động gán trong validate()
-            order_item = OrderItem.objects.create(order=order, **item_data)
+        with transaction.atomic():
+            products = self._reserve_stock(items_data)
 
-            # Trừ tồn kho
-            product = item_data['product']
-            if hasattr(product, 'stock'):
-                product.stock -= item_data['quantity']
-                product.save()
-
-        # Tự động tính tổng tiền
-        order.calculate_total()
+            # Tính tổng tiền trong bộ nhớ, không cần query lại items
+            order_items = []
+            total = 0
+            for item_data in items_data:
+                product = products[item_data['product'].pk]
+                # price đã được tự động gán trong validate()
+                price = item_data.get('price') or product.price
+                order_items.append(OrderItem(
+                    product=product, quantity=item_data['quantity'], price=price
+                ))
+                total += price * item_data['quantity']
+
+            order = Order.objects.create(total_price=total, **validated_data)
+            for order_item in order_items:
+                order_item.order = order
+            OrderItem.objects.bulk_create(order_items)
+
+        self._attach_items(order)
         return order
 
+    def _reserve_stock(self, items_data):
+        """Giữ hàng cho cả giỏ, thiếu hàng thì không trừ dòng nào"""
+        quantities = inventory.aggregate_quantities(
+            (item_data['product'].pk, item_data['quantity']) for item_data in items_data
+        )
+        try:
+            return inventory.reserve(quantities)
+        except inventory.InsufficientStock as exc:
+            raise serializers.ValidationError({"items": exc.message})
+
+    def _attach_items(self, order):
+        """Nạp items (kèm product) cho response bằng 1 query, kể cả khi MySQL không trả id sau bulk_create"""
+        prefetch_related_objects(
+            [order], Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        )
+
     def update(self, instance, validated_data):
         items_data = validated_data.pop('items', None)
 
@@ -100,4 +157,7 @@ class OrderListSerializer(serializers.ModelSerializer):
         fields = ['id', 'user_name', 'total_price', 'paid', 'status', 'items_count', 'created_at']
 
     def get_items_count(self, obj):
+        # items_count được annotate sẵn trong OrderViewSet.get_queryset()
+        if hasattr(obj, 'items_count'):
+            return obj.items_count
         return obj.items.count()
@@ -1,3 +1,272 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from payment.models import Payment, PaymentLog
+from products.models import Category, Product
+from . import expiry
+from .idempotency import evict_expired
+from .models import IdempotencyKey, Order, OrderItem
+
+
+class OrderQueryCountTests(APITestCase):
+    """Số query của mỗi endpoint phải cố định, không phụ thuộc số dòng"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', 'buyer@example.com', 'password123')
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'password123', is_staff=True)
+        category = Category.objects.create(name='Đồ uống')
+        cls.products = [
+            Product.objects.create(name=f'Sản phẩm {i}', category=category, price=10, quantity=1000)
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def create_orders(self, count, lines=3):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=1, price=product.price)
+                for product in self.products[:lines]
+            ])
+
+    def count_queries(self, url, user):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_list_query_count_is_constant(self):
+        self.create_orders(1)
+        small = self.count_queries('/api/orders/', self.user)
+        self.create_orders(9, lines=5)
+        large = self.count_queries('/api/orders/', self.user)
+        self.assertEqual(small, large)
+        # Keyset: chỉ 1 SELECT có annotate items_count, không COUNT(*)
+        self.assertEqual(large, 1)
+
+    def test_admin_list_query_count_is_constant(self):
+        self.create_orders(10)
+        self.assertEqual(self.count_queries('/api/orders/', self.admin), 1)
+
+    def test_page_number_list_caches_count(self):
+        self.create_orders(10)
+        # Lần đầu COUNT(*) + SELECT, sau đó count lấy từ cache
+        self.assertEqual(self.count_queries('/api/orders/?page=1', self.user), 2)
+        self.assertEqual(self.count_queries('/api/orders/?page=1', self.user), 1)
+
+    def test_cursor_pages_cover_all_orders(self):
+        self.create_orders(15, lines=1)
+        self.client.force_authenticate(self.user)
+        seen = []
+        url = '/api/orders/'
+        while url:
+            response = self.client.get(url)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(sorted(seen), sorted(Order.objects.values_list('id', flat=True)))
+
+    def test_list_items_count(self):
+        self.create_orders(1, lines=4)
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/orders/')
+        self.assertEqual(response.data['results'][0]['items_count'], 4)
+
+    def test_detail_query_count_is_constant(self):
+        self.create_orders(1, lines=1)
+        small = self.count_queries(f'/api/orders/{Order.objects.first().pk}/', self.user)
+        self.create_orders(1, lines=5)
+        large = self.count_queries(f'/api/orders/{Order.objects.order_by("-pk").first().pk}/', self.user)
+        self.assertEqual(small, large)
+        # SELECT order + prefetch items (kèm product)
+        self.assertEqual(large, 2)
+
+    def test_my_orders_query_count_is_constant(self):
+        self.create_orders(2)
+        small = self.count_queries('/api/orders/my_orders/', self.user)
+        self.create_orders(8, lines=5)
+        large = self.count_queries('/api/orders/my_orders/', self.user)
+        self.assertEqual(small, large)
+
+    def test_create_query_count_is_constant(self):
+        self.client.force_authenticate(self.user)
+
+        def create(lines):
+            payload = {'items': [{'product': product.pk, 'quantity': 1} for product in self.products[:lines]]}
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/orders/', payload, format='json')
+            self.assertEqual(response.status_code, 201)
+            return len(queries)
+
+        self.assertEqual(create(1), create(5))
+
+    def test_create_returns_items_with_bounded_queries(self):
+        self.client.force_authenticate(self.user)
+        payload = {'items': [{'product': product.pk, 'quantity': 2} for product in self.products]}
+        # Nạp giỏ, kiểm tra user, khóa + trừ kho, tạo order, bulk_create items,
+        # nạp items cho response, cộng 4 savepoint của các transaction lồng nhau
+        with self.assertNumQueries(11):
+            response = self.client.post('/api/orders/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(item['product'], item['quantity'], item['product_name']) for item in response.data['items']],
+            [(product.pk, 2, product.name) for product in self.products],
+        )
+        self.assertEqual(response.data['total_price'], '100.00')
+
+
+class IdempotencyKeyTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password123')
+        category = Category.objects.create(name='Đồ uống')
+        self.product = Product.objects.create(name='Cà phê', category=category, price=10, quantity=10)
+        self.client.force_authenticate(self.user)
+
+    def create_order(self, key, quantity=2):
+        payload = {'items': [{'product': self.product.pk, 'quantity': quantity}]}
+        return self.client.post('/api/orders/', payload, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_stored_response_without_writing(self):
+        first = self.create_order('abc')
+        self.assertEqual(first.status_code, 201)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.create_order('abc')
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.assertFalse(any(q['sql'].startswith(('INSERT', 'UPDATE')) for q in queries))
+
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)
+
+        self.assertEqual(self.create_order('other').status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_reused_key_with_different_body_or_in_progress(self):
+        self.create_order('abc')
+        self.assertEqual(self.create_order('abc', quantity=3).status_code, 422)
+
+        IdempotencyKey.objects.update(status_code=None)
+        self.assertEqual(self.create_order('abc').status_code, 409)
+
+    def test_failed_request_releases_key(self):
+        self.assertEqual(self.create_order('abc', quantity=50).status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.create_order('abc', quantity=1).status_code, 201)
+
+    def test_expired_keys_run_again_and_are_evicted(self):
+        self.create_order('abc')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timezone.timedelta(seconds=1))
+        self.assertEqual(self.create_order('abc').status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timezone.timedelta(seconds=1))
+        self.assertEqual(evict_expired(), 1)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class ExpiryTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password123')
+        category = Category.objects.create(name='Đồ uống')
+        self.products = [
+            Product.objects.create(name=f'Sản phẩm {i}', category=category, price=10, quantity=100)
+            for i in range(2)
+        ]
+        self.client.force_authenticate(self.user)
+
+    def create_order(self, quantity, age):
+        payload = {'items': [{'product': product.pk, 'quantity': quantity} for product in self.products]}
+        order_id = self.client.post('/api/orders/', payload, format='json').data['id']
+        created_at = timezone.now() - timezone.timedelta(seconds=age)
+        Order.objects.filter(pk=order_id).update(created_at=created_at)
+        payment = Payment.objects.create(order_id=order_id, amount=10 * quantity)
+        Payment.objects.filter(pk=payment.pk).update(created_at=created_at)
+        return order_id, payment.pk
+
+    def stock(self):
+        return [product.stock for product in Product.objects.filter(pk__in=[p.pk for p in self.products])]
+
+    def test_sweep_cancels_in_batches_and_releases_stock(self):
+        expired = [self.create_order(quantity, age=2 * 24 * 60 * 60) for quantity in (1, 2, 3)]
+        fresh_order, fresh_payment = self.create_order(5, age=60 * 60)
+        cancelled_order, cancelled_payment = self.create_order(1, age=60 * 60)
+        Order.objects.filter(pk=expired[2][0]).update(status='processing', paid=True)
+        self.assertEqual(self.client.post(f'/api/orders/{cancelled_order}/cancel/').status_code, 200)
+        # Hủy qua API trả hàng về kho và hủy payment ngay
+        self.assertEqual(self.stock(), [89, 89])
+        self.assertEqual(Payment.objects.get(pk=cancelled_payment).status, 'cancelled')
+
+        result = expiry.sweep(batch_size=1)
+        self.assertEqual((result.orders, result.payments, result.batches), (2, 0, 2))
+        self.assertEqual(self.stock(), [92, 92])
+        self.assertEqual(
+            list(Order.objects.filter(status='cancelled').order_by('pk').values_list('pk', flat=True)),
+            [expired[0][0], expired[1][0], cancelled_order],
+        )
+        # Payment chỉ hết hạn cùng đơn: đơn processing và đơn mới còn mở vẫn giữ payment pending
+        self.assertEqual(
+            set(Payment.objects.filter(status='pending').values_list('pk', flat=True)),
+            {expired[2][1], fresh_payment},
+        )
+        self.assertEqual(Payment.objects.get(pk=cancelled_payment).status, 'cancelled')
+        self.assertEqual(PaymentLog.objects.filter(status='cancelled').count(), 3)
+        self.assertEqual(Order.objects.get(pk=fresh_order).status, 'pending')
+
+        self.assertEqual(expiry.sweep().batches, 0)
+        self.assertEqual(self.stock(), [92, 92])
+
+    def test_api_cancel_releases_stock_once(self):
+        order, payment = self.create_order(4, age=60)
+        self.assertEqual(self.stock(), [96, 96])
+        response = self.client.post(f'/api/orders/{order}/cancel/')
+        self.assertEqual((response.status_code, response.data['status']), (200, 'cancelled'))
+        self.assertEqual(self.stock(), [100, 100])
+        self.assertEqual(Payment.objects.get(pk=payment).status, 'cancelled')
+        self.assertEqual(PaymentLog.objects.get(payment_id=payment).message, 'Đơn hàng đã bị hủy')
+
+        self.assertEqual(self.client.post(f'/api/orders/{order}/cancel/').status_code, 400)
+        self.assertEqual(self.stock(), [100, 100])
+
+    def test_confirm_rejects_cancelled_and_qr_reopens_payment(self):
+        expired_order, expired_payment = self.create_order(1, age=2 * 24 * 60 * 60)
+        open_order, open_payment = self.create_order(1, age=60 * 60)
+        expiry.sweep()
+
+        # Hàng đã trả về kho: không được xác nhận thanh toán của đơn hết hạn
+        response = self.client.post(f'/api/payment/{expired_payment}/confirm_payment/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.data)
+        response = self.client.post('/api/payment/create_qr_payment/', {'order_id': expired_order}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # Khách tự hủy payment khi đơn còn mở: tạo lại QR thì payment được mở lại
+        self.client.post(f'/api/payment/{open_payment}/cancel_payment/')
+        self.assertEqual(self.client.post(f'/api/payment/{open_payment}/confirm_payment/').status_code, 400)
+        response = self.client.post('/api/payment/create_qr_payment/', {'order_id': open_order}, format='json')
+        self.assertEqual((response.status_code, response.data['id'], response.data['status']),
+                         (201, open_payment, 'pending'))
+        response = self.client.post(f'/api/payment/{open_payment}/confirm_payment/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get(pk=open_order).status, 'processing')
+        self.assertEqual(Order.objects.get(pk=expired_order).status, 'cancelled')
+
+    def test_batch_query_count_is_constant(self):
+        def expire(count):
+            for _ in range(count):
+                self.create_order(1, age=2 * 24 * 60 * 60)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(expiry.expire_orders(), count)
+            return len(queries)
+
+        self.assertEqual(expire(1), expire(5))
@@ -1,12 +1,21 @@
 from django.shortcuts import render
+from django.db.models import Count, Prefetch
+from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from grocery_store import exports
+from grocery_store.metrics import SerializerTimingMixin
+from grocery_store.pagination import KeysetOrPageNumberPagination
+from grocery_store.throttling import CheckoutThrottle
+from payment.logs import payment_logs
+from . import expiry
+from .idempotency import idempotent
 from .models import Order, OrderItem
 from .serializers import OrderSerializer, OrderListSerializer
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     """
     API endpoint cho quản lý đơn hàng
     - List: GET /api/orders/
@@ -16,21 +25,32 @@ class OrderViewSet(viewsets.ModelViewSet):
     - Delete: DELETE /api/orders/{id}/
     """
     permission_classes = [IsAuthenticated]
+    throttle_classes = [CheckoutThrottle]
+    pagination_class = KeysetOrPageNumberPagination
 
     def get_queryset(self):
         """User chỉ xem đơn hàng của mình, Admin xem tất cả"""
         user = self.request.user
-        if user.is_staff:
-            return Order.objects.all()
-        return Order.objects.filter(user=user)
+        queryset = Order.objects.select_related('user')
+        if not user.is_staff:
+            queryset = queryset.filter(user=user)
+
+        # Nạp sẵn dữ liệu cho serializer, tránh N+1 query
+        if self.action == 'list':
+            # GROUP BY bỏ qua Meta.ordering nên phải sắp xếp lại
+            return queryset.annotate(items_count=Count('items')).order_by('-created_at')
+        return queryset.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        )
 
     def get_serializer_class(self):
         if self.action == 'list':
             return OrderListSerializer
         return OrderSerializer
 
+    @idempotent('orders.create')
     def create(self, request, *args, **kwargs):
-        """Tạo đơn hàng mới"""
+        """Tạo đơn hàng mới (hỗ trợ header Idempotency-Key)"""
         data = request.data.copy()
         data['user'] = request.user.id
 
@@ -53,24 +73,81 @@ class OrderViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
-        """Hủy đơn hàng"""
+        """Hủy đơn hàng, trả hàng về kho và hủy payment đang chờ"""
         order = self.get_object()
 
-        if order.status == 'completed':
-            return Response(
-                {"error": "Không thể hủy đơn hàng đã hoàn thành"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        with payment_logs.batch():
+            # Khóa đơn như sweeper (orders.expiry) để hàng không bị trả về kho 2 lần
+            locked = Order.objects.select_for_update().get(pk=order.pk)
+            if locked.status == 'completed':
+                return Response(
+                    {"error": "Không thể hủy đơn hàng đã hoàn thành"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if locked.status == 'cancelled':
+                return Response(
+                    {"error": "Đơn hàng đã bị hủy trước đó"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        order.status = 'cancelled'
-        order.save()
+            locked.status = 'cancelled'
+            locked.save()
+            expiry.release_orders([order.pk], timezone.now(), 'Đơn hàng đã bị hủy')
 
+        order.refresh_from_db(fields=['status', 'paid', 'updated_at'])
         serializer = self.get_serializer(order)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def my_orders(self, request):
         """Lấy danh sách đơn hàng của user hiện tại"""
-        orders = Order.objects.filter(user=request.user)
+        orders = self.get_queryset().filter(user=request.user)
         serializer = self.get_serializer(orders, many=True)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Xuất đơn hàng dạng CSV/NDJSON theo luồng
+        GET /api/orders/export/?fmt=csv|ndjson&type=orders|items&from=2025-01-01&to=2025-01-31
+        """
+        export_format = exports.get_export_format(request)
+        export_type = request.query_params.get('type', 'orders')
+
+        if export_type == 'items':
+            queryset = OrderItem.objects.all()
+            if not request.user.is_staff:
+                queryset = queryset.filter(order__user=request.user)
+            queryset = exports.filter_date_range(queryset, request, field='order__created_at')
+            columns = [
+                ('order_id', 'order_id'),
+                ('order_created_at', 'order__created_at'),
+                ('order_status', 'order__status'),
+                ('product_id', 'product_id'),
+                ('product_name', 'product__name'),
+                ('quantity', 'quantity'),
+                ('price', 'price'),
+            ]
+            return exports.export_response(queryset, columns, export_format, 'order_items')
+
+        if export_type != 'orders':
+            return Response(
+                {"error": "type phải là orders hoặc items"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = Order.objects.all()
+        if not request.user.is_staff:
+            queryset = queryset.filter(user=request.user)
+        queryset = exports.filter_date_range(queryset, request)
+        columns = [
+            ('id', 'id'),
+            ('user_id', 'user_id'),
+            ('username', 'user__username'),
+            ('status', 'status'),
+            ('paid', 'paid'),
+            ('total_price', 'total_price'),
+            ('created_at', 'created_at'),
+            ('updated_at', 'updated_at'),
+        ]
+        return exports.export_response(queryset, columns, export_format, 'orders')
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Payment, PaymentLog
+from .reconciliation import confirm_payments
 
 
 class PaymentLogInline(admin.TabularInline):
@@ -19,11 +20,16 @@ class PaymentAdmin(admin.ModelAdmin):
     actions = ['mark_as_completed']
 
     def mark_as_completed(self, request, queryset):
-        for payment in queryset:
-            payment.status = 'completed'
-            payment.save()
-            payment.order.paid = True
-            payment.order.save()
+        # Vài câu UPDATE theo lô thay vì 2 lần save() mỗi payment
+        confirmed, cancelled = confirm_payments(
+            dict.fromkeys(queryset.values_list('pk', flat=True)),
+            message='Admin xác nhận thanh toán',
+            statuses=None,
+        )
+        message = f"Đã xác nhận {len(confirmed)} thanh toán"
+        if cancelled:
+            message += f", bỏ qua {len(cancelled)} thanh toán của đơn đã hủy"
+        self.message_user(request, message)
     mark_as_completed.short_description = "Đánh dấu đã thanh toán"
 
     def save_model(self, request, obj, form, change):
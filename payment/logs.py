@@ -0,0 +1,65 @@
+"""
+Ghi PaymentLog theo lô thay vì một INSERT cho mỗi log.
+
+    with payment_logs.batch():
+        payment.save()
+        payment_logs.add(payment, 'completed', 'Thanh toán đã được xác nhận')
+
+Trong batch(), log được gom lại và ghi bằng một bulk_create ở cuối
+transaction, ngay trước khi commit: log commit hoặc rollback cùng thay đổi
+của payment nên không mất log nào khi commit. add() ngoài batch() ghi log
+ngay (một INSERT, trong transaction hiện tại nếu có).
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Payment, PaymentLog
+
+# Số log mỗi câu INSERT
+BULK_BATCH_SIZE = 1000
+
+
+class PaymentLogWriter:
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _batches(self):
+        if not hasattr(self._local, 'batches'):
+            self._local.batches = []
+        return self._local.batches
+
+    @contextmanager
+    def batch(self):
+        """Transaction gom các log được add() bên trong và ghi chúng trước khi commit"""
+        entries = []
+        batches = self._batches()
+        batches.append(entries)
+        try:
+            with transaction.atomic():
+                yield entries
+                if entries:
+                    PaymentLog.objects.bulk_create(entries, batch_size=BULK_BATCH_SIZE)
+        finally:
+            batches.pop()
+
+    def add(self, payment, status, message=''):
+        """payment: instance hoặc id"""
+        if isinstance(payment, Payment):
+            # Bỏ log đã prefetch (PaymentViewSet) để serializer đọc lại cả log mới
+            vars(payment).pop('recent_logs', None)
+            entry = PaymentLog(payment=payment, status=status, message=message, created_at=timezone.now())
+        else:
+            entry = PaymentLog(payment_id=payment, status=status, message=message, created_at=timezone.now())
+        batches = self._batches()
+        if batches:
+            batches[-1].append(entry)
+        else:
+            entry.save()
+        return entry
+
+
+payment_logs = PaymentLogWriter()
@@ -0,0 +1,45 @@
+import csv
+from xml.etree import ElementTree
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payment.reconciliation import PARSERS, Reconciler, detect_format
+
+
+class Command(BaseCommand):
+    help = "Đối soát sao kê ngân hàng (CSV hoặc camt XML) với các payment đang chờ và xác nhận các khoản khớp"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File sao kê (CSV có header: reference,amount,description,date)')
+        parser.add_argument('--format', choices=sorted(PARSERS), help='Mặc định đoán theo đuôi file')
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ khớp và báo cáo, không xác nhận')
+        parser.add_argument('--report', help='Ghi các dòng không khớp ra file CSV')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or detect_format(options['path'])
+        reconciler = Reconciler(dry_run=options['dry_run'])
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                result = reconciler.run(PARSERS[file_format](fileobj))
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except (ValueError, UnicodeDecodeError, ElementTree.ParseError) as exc:
+            raise CommandError(f'File {file_format} không hợp lệ: {exc}')
+
+        if options['report']:
+            fields = ['line', 'reference', 'memo', 'amount', 'order_id', 'expected', 'reason']
+            with open(options['report'], 'w', newline='', encoding='utf-8') as report:
+                writer = csv.DictWriter(report, fieldnames=fields)
+                writer.writeheader()
+                writer.writerows(result.mismatches)
+
+        summary = result.as_dict(max_mismatches=0)
+        action = 'Khớp' if options['dry_run'] else 'Đã xác nhận'
+        confirmed = summary['matched'] if options['dry_run'] else summary['confirmed']
+        self.stdout.write(
+            f"{action} {confirmed}/{summary['total']} dòng ({summary['matched_amount']} VND), "
+            f"bỏ qua {summary['ignored']}, không khớp {summary['mismatched']} "
+            f"trong {summary['elapsed_seconds']:.2f}s"
+        )
+        for reason, count in sorted(summary['mismatch_counts'].items()):
+            self.stdout.write(f'  {reason}: {count}')
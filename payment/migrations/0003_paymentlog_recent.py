@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:49
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0002_payment_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='paymentlog',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AlterField(
+            model_name='paymentlog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='paymentlog',
+            index=models.Index(fields=['payment', '-created_at', '-id'], name='paymentlog_payment_recent_idx'),
+        ),
+    ]
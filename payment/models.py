@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from orders.models import Order
 
 
@@ -34,6 +35,12 @@ class Payment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Danh sách của admin / phân trang keyset
+            models.Index(fields=['-created_at', '-id'], name='payment_created_idx'),
+            # Quét payment pending hết hạn (orders.expiry)
+            models.Index(fields=['status', 'created_at'], name='payment_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Payment #{self.id} for Order #{self.order.id}"
@@ -44,10 +51,15 @@ class PaymentLog(models.Model):
     payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='logs')
     status = models.CharField(max_length=20)
     message = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Không dùng auto_now_add: log ghi theo lô (payment.logs) giữ thời điểm được tạo
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # N log mới nhất của mỗi payment
+            models.Index(fields=['payment', '-created_at', '-id'], name='paymentlog_payment_recent_idx'),
+        ]
 
     def __str__(self):
         return f"Log for Payment #{self.payment.id} - {self.status}"
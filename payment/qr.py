@@ -0,0 +1,374 @@
+"""
+Mã hóa QR Code (ISO/IEC 18004, chế độ byte) và xuất ảnh PNG/SVG.
+
+Không phụ thuộc thư viện QR bên ngoài: encode() trả về ma trận module
+(list các hàng bool, True = ô đen); render_png() dùng Pillow, render_svg()
+tạo chuỗi SVG. Chỉ hỗ trợ chế độ byte vì payload VietQR là ASCII.
+"""
+import io
+
+from PIL import Image
+
+# Mức sửa lỗi: (chỉ số trong bảng, 2 bit format)
+ERROR_CORRECTION = {
+    'L': (0, 1),
+    'M': (1, 0),
+    'Q': (2, 3),
+    'H': (3, 2),
+}
+
+# Số codeword sửa lỗi mỗi khối và số khối, theo mức sửa lỗi rồi version 1-40
+ECC_CODEWORDS_PER_BLOCK = (
+    (-1, 7, 10, 15, 20, 26, 18, 20, 24, 30, 18, 20, 24, 26, 30, 22, 24, 28, 30, 28, 28,
+     28, 28, 30, 30, 26, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    (-1, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26,
+     26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28),
+    (-1, 13, 22, 18, 26, 18, 24, 18, 22, 20, 24, 28, 26, 24, 20, 30, 24, 28, 28, 26, 30,
+     28, 30, 30, 30, 30, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    (-1, 17, 28, 22, 16, 22, 28, 26, 26, 24, 28, 24, 28, 22, 24, 24, 30, 28, 28, 26, 28,
+     30, 24, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+)
+NUM_ERROR_CORRECTION_BLOCKS = (
+    (-1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 4, 4, 4, 4, 4, 6, 6, 6, 6, 7, 8,
+     8, 9, 9, 10, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 19, 20, 21, 22, 24, 25),
+    (-1, 1, 1, 1, 2, 2, 4, 4, 4, 5, 5, 5, 8, 9, 9, 10, 10, 11, 13, 14, 16,
+     17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49),
+    (-1, 1, 1, 2, 2, 4, 4, 6, 6, 8, 8, 8, 10, 12, 16, 12, 17, 16, 18, 21, 20,
+     23, 23, 25, 27, 29, 34, 34, 35, 38, 40, 43, 45, 48, 51, 53, 56, 59, 62, 65, 68),
+    (-1, 1, 1, 2, 4, 4, 4, 5, 6, 8, 8, 11, 11, 16, 16, 18, 16, 19, 21, 25, 25,
+     25, 34, 30, 32, 35, 37, 40, 42, 45, 48, 51, 54, 57, 60, 63, 66, 70, 74, 77, 81),
+)
+
+MASKS = (
+    lambda x, y: (x + y) % 2 == 0,
+    lambda x, y: y % 2 == 0,
+    lambda x, y: x % 3 == 0,
+    lambda x, y: (x + y) % 3 == 0,
+    lambda x, y: (x // 3 + y // 2) % 2 == 0,
+    lambda x, y: x * y % 2 + x * y % 3 == 0,
+    lambda x, y: (x * y % 2 + x * y % 3) % 2 == 0,
+    lambda x, y: ((x + y) % 2 + x * y % 3) % 2 == 0,
+)
+
+# Mẫu giống finder pattern (1:1:3:1:1) kèm 4 ô trắng, dùng khi chấm điểm mask
+FINDER_LIKE = ('10111010000', '00001011101')
+
+
+def _gf_multiply(x, y):
+    """Nhân trong GF(2^8) với đa thức 0x11D"""
+    z = 0
+    for i in reversed(range(8)):
+        z = (z << 1) ^ ((z >> 7) * 0x11D)
+        z ^= ((y >> i) & 1) * x
+    return z
+
+
+def _rs_divisor(degree):
+    result = [0] * (degree - 1) + [1]
+    root = 1
+    for _ in range(degree):
+        for j in range(degree):
+            result[j] = _gf_multiply(result[j], root)
+            if j + 1 < degree:
+                result[j] ^= result[j + 1]
+        root = _gf_multiply(root, 0x02)
+    return result
+
+
+def _rs_remainder(data, divisor):
+    result = [0] * len(divisor)
+    for byte in data:
+        factor = byte ^ result.pop(0)
+        result.append(0)
+        for i, coefficient in enumerate(divisor):
+            result[i] ^= _gf_multiply(coefficient, factor)
+    return result
+
+
+def _raw_data_modules(version):
+    """Số module dành cho dữ liệu (kể cả sửa lỗi) của một version"""
+    result = (16 * version + 128) * version + 64
+    if version >= 2:
+        count = version // 7 + 2
+        result -= (25 * count - 10) * count - 55
+        if version >= 7:
+            result -= 36
+    return result
+
+
+def _data_codewords(version, level):
+    return (
+        _raw_data_modules(version) // 8
+        - ECC_CODEWORDS_PER_BLOCK[level][version] * NUM_ERROR_CORRECTION_BLOCKS[level][version]
+    )
+
+
+def _alignment_positions(version, size):
+    if version == 1:
+        return []
+    count = version // 7 + 2
+    step = (version * 8 + count * 3 + 5) // (count * 4 - 4) * 2
+    return [6] + sorted(size - 7 - i * step for i in range(count - 1))
+
+
+def _bit(value, index):
+    return (value >> index) & 1 != 0
+
+
+class _Symbol:
+
+    def __init__(self, version, level):
+        self.version = version
+        self.level = level
+        self.size = version * 4 + 17
+        self.modules = [[False] * self.size for _ in range(self.size)]
+        self.function = [[False] * self.size for _ in range(self.size)]
+
+    def set_function(self, x, y, dark):
+        self.modules[y][x] = dark
+        self.function[y][x] = True
+
+    def draw_function_patterns(self):
+        size = self.size
+        for i in range(size):
+            self.set_function(6, i, i % 2 == 0)
+            self.set_function(i, 6, i % 2 == 0)
+        for x, y in ((3, 3), (size - 4, 3), (3, size - 4)):
+            self.draw_finder(x, y)
+
+        positions = _alignment_positions(self.version, size)
+        last = len(positions) - 1
+        for i, x in enumerate(positions):
+            for j, y in enumerate(positions):
+                # Bỏ 3 vị trí trùng finder pattern
+                if (i, j) not in ((0, 0), (0, last), (last, 0)):
+                    self.draw_alignment(x, y)
+
+        self.draw_format_bits(0)
+        self.draw_version()
+
+    def draw_finder(self, x, y):
+        for dy in range(-4, 5):
+            for dx in range(-4, 5):
+                xx, yy = x + dx, y + dy
+                if 0 <= xx < self.size and 0 <= yy < self.size:
+                    self.set_function(xx, yy, max(abs(dx), abs(dy)) not in (2, 4))
+
+    def draw_alignment(self, x, y):
+        for dy in range(-2, 3):
+            for dx in range(-2, 3):
+                self.set_function(x + dx, y + dy, max(abs(dx), abs(dy)) != 1)
+
+    def draw_format_bits(self, mask):
+        data = ERROR_CORRECTION[self.level][1] << 3 | mask
+        remainder = data
+        for _ in range(10):
+            remainder = (remainder << 1) ^ ((remainder >> 9) * 0x537)
+        bits = (data << 10 | remainder) ^ 0x5412
+        size = self.size
+
+        for i in range(6):
+            self.set_function(8, i, _bit(bits, i))
+        self.set_function(8, 7, _bit(bits, 6))
+        self.set_function(8, 8, _bit(bits, 7))
+        self.set_function(7, 8, _bit(bits, 8))
+        for i in range(9, 15):
+            self.set_function(14 - i, 8, _bit(bits, i))
+
+        for i in range(8):
+            self.set_function(size - 1 - i, 8, _bit(bits, i))
+        for i in range(8, 15):
+            self.set_function(8, size - 15 + i, _bit(bits, i))
+        self.set_function(8, size - 8, True)
+
+    def draw_version(self):
+        if self.version < 7:
+            return
+        remainder = self.version
+        for _ in range(12):
+            remainder = (remainder << 1) ^ ((remainder >> 11) * 0x1F25)
+        bits = self.version << 12 | remainder
+        for i in range(18):
+            dark = _bit(bits, i)
+            a = self.size - 11 + i % 3
+            b = i // 3
+            self.set_function(a, b, dark)
+            self.set_function(b, a, dark)
+
+    def add_error_correction(self, data):
+        """Chia khối, thêm codeword Reed-Solomon và xen kẽ các khối"""
+        level = ERROR_CORRECTION[self.level][0]
+        block_count = NUM_ERROR_CORRECTION_BLOCKS[level][self.version]
+        ecc_length = ECC_CODEWORDS_PER_BLOCK[level][self.version]
+        raw_codewords = _raw_data_modules(self.version) // 8
+        short_blocks = block_count - raw_codewords % block_count
+        short_length = raw_codewords // block_count
+
+        divisor = _rs_divisor(ecc_length)
+        blocks = []
+        offset = 0
+        for i in range(block_count):
+            length = short_length - ecc_length + (0 if i < short_blocks else 1)
+            block = data[offset:offset + length]
+            offset += length
+            ecc = _rs_remainder(block, divisor)
+            if i < short_blocks:
+                block.append(0)
+            blocks.append(block + ecc)
+
+        result = []
+        for i in range(len(blocks[0])):
+            for j, block in enumerate(blocks):
+                # Byte đệm của khối ngắn không được ghi
+                if i != short_length - ecc_length or j >= short_blocks:
+                    result.append(block[i])
+        return result
+
+    def draw_codewords(self, codewords):
+        index = 0
+        total = len(codewords) * 8
+        for right in range(self.size - 1, 0, -2):
+            if right <= 6:
+                right -= 1
+            upward = (right + 1) & 2 == 0
+            for vertical in range(self.size):
+                y = self.size - 1 - vertical if upward else vertical
+                for x in (right, right - 1):
+                    if not self.function[y][x] and index < total:
+                        self.modules[y][x] = _bit(codewords[index >> 3], 7 - (index & 7))
+                        index += 1
+
+    def apply_mask(self, mask):
+        test = MASKS[mask]
+        for y in range(self.size):
+            row = self.modules[y]
+            function = self.function[y]
+            for x in range(self.size):
+                if not function[x] and test(x, y):
+                    row[x] = not row[x]
+
+    def penalty(self):
+        size = self.size
+        rows = [''.join('1' if dark else '0' for dark in row) for row in self.modules]
+        columns = [''.join(row[x] for row in rows) for x in range(size)]
+        score = 0
+
+        for line in rows + columns:
+            # Chuỗi >= 5 ô cùng màu
+            run = 1
+            for i in range(1, size + 1):
+                if i < size and line[i] == line[i - 1]:
+                    run += 1
+                    continue
+                if run >= 5:
+                    score += run - 2
+                run = 1
+            # Mẫu giống finder pattern, vùng ngoài ký hiệu tính là trắng
+            padded = '0000' + line + '0000'
+            for pattern in FINDER_LIKE:
+                start = padded.find(pattern)
+                while start != -1:
+                    score += 40
+                    start = padded.find(pattern, start + 1)
+
+        for y in range(size - 1):
+            for x in range(size - 1):
+                if rows[y][x] == rows[y][x + 1] == rows[y + 1][x] == rows[y + 1][x + 1]:
+                    score += 3
+
+        dark = sum(line.count('1') for line in rows)
+        total = size * size
+        score += ((abs(dark * 20 - total * 10) + total - 1) // total - 1) * 10
+        return score
+
+
+def encode_data(data, level='M', min_version=1):
+    """
+    Chọn version nhỏ nhất đủ chứa dữ liệu và tạo các codeword dữ liệu (chế độ
+    byte, đã thêm terminator và byte đệm), chưa có codeword sửa lỗi.
+    Trả về (version, codewords)
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if level not in ERROR_CORRECTION:
+        raise ValueError(f'Mức sửa lỗi không hợp lệ: {level}')
+    level_index = ERROR_CORRECTION[level][0]
+
+    for version in range(min_version, 41):
+        count_bits = 8 if version < 10 else 16
+        capacity = _data_codewords(version, level_index) * 8
+        used = 4 + count_bits + len(data) * 8
+        if len(data) < 1 << count_bits and used <= capacity:
+            break
+    else:
+        raise ValueError('Dữ liệu quá dài cho QR Code')
+
+    bits = [(0b0100 >> i) & 1 for i in reversed(range(4))]
+    bits += [(len(data) >> i) & 1 for i in reversed(range(count_bits))]
+    for byte in data:
+        bits += [(byte >> i) & 1 for i in reversed(range(8))]
+    bits += [0] * min(4, capacity - len(bits))
+    bits += [0] * (-len(bits) % 8)
+    codewords = [int(''.join(map(str, bits[i:i + 8])), 2) for i in range(0, len(bits), 8)]
+    pad = 0xEC
+    while len(codewords) < capacity // 8:
+        codewords.append(pad)
+        pad ^= 0xEC ^ 0x11
+    return version, codewords
+
+
+def encode(data, level='M', min_version=1):
+    """Mã hóa bytes/str thành ma trận QR nhỏ nhất đủ chứa dữ liệu"""
+    version, codewords = encode_data(data, level, min_version)
+    symbol = _Symbol(version, level)
+    symbol.draw_function_patterns()
+    symbol.draw_codewords(symbol.add_error_correction(codewords))
+
+    best_mask, best_score = 0, None
+    for mask in range(len(MASKS)):
+        symbol.apply_mask(mask)
+        symbol.draw_format_bits(mask)
+        score = symbol.penalty()
+        if best_score is None or score < best_score:
+            best_mask, best_score = mask, score
+        symbol.apply_mask(mask)
+    symbol.apply_mask(best_mask)
+    symbol.draw_format_bits(best_mask)
+    return symbol.modules
+
+
+def render_png(matrix, scale=8, border=4):
+    """Ảnh PNG đen trắng (1 bit/pixel), mỗi module scale x scale pixel, viền trắng border module"""
+    size = len(matrix) + border * 2
+    image = Image.new('1', (size, size), 1)
+    image.putdata([
+        0 if 0 <= y - border < len(matrix) and 0 <= x - border < len(matrix) and matrix[y - border][x - border] else 1
+        for y in range(size)
+        for x in range(size)
+    ])
+    image = image.resize((size * scale, size * scale), Image.NEAREST)
+    output = io.BytesIO()
+    image.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+def render_svg(matrix, border=4):
+    """SVG co giãn được, các ô đen liền nhau trên một hàng gộp thành một hình chữ nhật"""
+    size = len(matrix) + border * 2
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < len(row):
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < len(row) and row[x]:
+                x += 1
+            path.append(f'M{start + border} {y + border}h{x - start}v1h-{x - start}z')
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/>'
+        f'<path d="{"".join(path)}" fill="#000"/></svg>\n'
+    )
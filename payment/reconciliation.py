@@ -0,0 +1,361 @@
+"""
+Đối soát sao kê ngân hàng với các payment đang chờ.
+
+Sao kê (CSV hoặc XML dạng camt.053/camt.054) được đọc theo luồng, từng
+dòng tiền vào được khớp với payment pending qua nội dung "Order {id}" và
+số tiền, tra trong một dict order_id -> payment nạp một lần cho cả lần
+chạy. Các payment khớp được xác nhận hàng loạt trong một transaction
+(UPDATE theo lô, PaymentLog ghi bằng bulk_create); các dòng không khớp
+được đưa vào báo cáo kèm lý do.
+"""
+import csv
+import io
+import re
+import time
+from decimal import Decimal, InvalidOperation
+from xml.etree import ElementTree
+
+from django.db import connection
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from analytics.jobs import record_orders_later
+from orders.models import Order
+
+from .logs import payment_logs
+from .models import Payment
+
+# "Order 12", "ORDER12", "order #12"; ngân hàng thường viết hoa và bỏ dấu cách
+ORDER_MEMO = re.compile(r'ORDER\s*#?\s*(\d+)', re.IGNORECASE)
+
+# Tên cột chấp nhận trong file CSV (chữ thường)
+CSV_COLUMNS = {
+    'amount': ('amount', 'credit', 'so_tien', 'số tiền', 'so tien'),
+    'memo': ('description', 'memo', 'remark', 'content', 'noi_dung', 'nội dung', 'noi dung'),
+    'reference': ('reference', 'transaction_id', 'ref', 'ma_gd', 'mã gd'),
+    'booked_at': ('date', 'booking_date', 'transaction_date', 'ngay', 'ngày'),
+}
+
+# Lý do không khớp
+NO_REFERENCE = 'no_reference'
+NOT_FOUND = 'not_found'
+ALREADY_COMPLETED = 'already_completed'
+NOT_PENDING = 'not_pending'
+AMOUNT_MISMATCH = 'amount_mismatch'
+DUPLICATE = 'duplicate'
+INVALID_AMOUNT = 'invalid_amount'
+ORDER_CANCELLED = 'order_cancelled'
+
+
+class StatementLine:
+    __slots__ = ('line', 'reference', 'amount', 'memo', 'booked_at')
+
+    def __init__(self, line, reference, amount, memo, booked_at=''):
+        self.line = line
+        self.reference = reference
+        self.amount = amount
+        self.memo = memo
+        self.booked_at = booked_at
+
+
+def _text_stream(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+    return io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+
+def parse_amount(text):
+    """'150,000' / '150000.00' -> Decimal; không đọc được thì None"""
+    try:
+        return Decimal((text or '').replace(',', '').replace(' ', ''))
+    except InvalidOperation:
+        return None
+
+
+def parse_csv(fileobj):
+    """Sao kê CSV có header; cột chi (số tiền âm) vẫn được trả về để bỏ qua khi đối soát"""
+    reader = csv.reader(_text_stream(fileobj))
+    header = [name.strip().lower() for name in next(reader, [])]
+    columns = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in header:
+                columns[field] = header.index(alias)
+                break
+    missing = [field for field in ('amount', 'memo') if field not in columns]
+    if missing:
+        raise ValueError(f"Sao kê CSV thiếu cột: {', '.join(missing)}")
+
+    def cell(row, field):
+        index = columns.get(field)
+        return row[index].strip() if index is not None and index < len(row) else ''
+
+    for line, row in enumerate(reader, start=2):
+        if not row:
+            continue
+        yield StatementLine(
+            line, cell(row, 'reference'), parse_amount(cell(row, 'amount')),
+            cell(row, 'memo'), cell(row, 'booked_at'),
+        )
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_camt(fileobj):
+    """Mỗi <Ntry> của camt.053/camt.054 là một dòng; khoản chi (DBIT) có số tiền âm"""
+    line = 0
+    for _, element in ElementTree.iterparse(fileobj, events=('end',)):
+        if _local_name(element.tag) != 'Ntry':
+            continue
+        line += 1
+        values = {}
+        memo = []
+        for child in element.iter():
+            name = _local_name(child.tag)
+            text = (child.text or '').strip()
+            if name == 'Ustrd':
+                memo.append(text)
+            elif name in ('AcctSvcrRef', 'NtryRef', 'EndToEndId'):
+                values.setdefault('reference', text)
+            elif name in ('Dt', 'DtTm'):
+                values.setdefault('booked_at', text)
+            elif name in ('Amt', 'CdtDbtInd'):
+                values.setdefault(name, text)
+        # Đọc xong thì bỏ nội dung để file lớn không nằm hết trong bộ nhớ
+        element.clear()
+
+        amount = parse_amount(values.get('Amt'))
+        if amount is not None and values.get('CdtDbtInd') == 'DBIT':
+            amount = -amount
+        yield StatementLine(
+            line, values.get('reference', ''), amount, ' '.join(memo), values.get('booked_at', ''),
+        )
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'camt': parse_camt,
+    'xml': parse_camt,
+}
+
+
+def detect_format(filename, default='csv'):
+    extension = (filename or '').rsplit('.', 1)[-1].lower()
+    return extension if extension in PARSERS else default
+
+
+def _set_transaction_ids(references):
+    """
+    Một câu UPDATE ... SET transaction_id = CASE id WHEN ... END cho cả lô.
+    Dựng SQL trực tiếp: Case/When của ORM tốn vài trăm µs mỗi nhánh khi có hàng nghìn nhánh
+    """
+    if not references:
+        return
+    table = connection.ops.quote_name(Payment._meta.db_table)
+    column = connection.ops.quote_name('transaction_id')
+    key = connection.ops.quote_name(Payment._meta.pk.column)
+    branches = ' '.join(['WHEN %s THEN %s'] * len(references))
+    placeholders = ', '.join(['%s'] * len(references))
+    params = [value for pair in references.items() for value in pair] + list(references)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {column} = CASE {key} {branches} END WHERE {key} IN ({placeholders})',
+            params,
+        )
+
+
+def confirm_payments(references, message='Thanh toán đã được xác nhận', statuses=('pending',), chunk_size=1000):
+    """
+    Xác nhận hàng loạt trong một transaction: references = {payment_id: mã giao dịch hoặc None}.
+    Chỉ payment có status trong `statuses` (None: mọi payment chưa completed) được xác nhận.
+    Khóa đơn hàng trước rồi mới tới payment, cùng thứ tự với orders.expiry; payment của đơn
+    đã hủy (hàng đã trả về kho) không được xác nhận.
+    Trả về (đã xác nhận, đơn đã hủy): 2 danh sách (payment_id, order_id)
+    """
+    now = timezone.now()
+    confirmed = []
+    cancelled = []
+    payment_ids = list(references)
+    with payment_logs.batch():
+        for start in range(0, len(payment_ids), chunk_size):
+            chunk = payment_ids[start:start + chunk_size]
+            order_ids = Payment.objects.filter(pk__in=chunk).values_list('order_id', flat=True)
+            order_statuses = dict(
+                Order.objects.select_for_update().filter(pk__in=list(order_ids))
+                .order_by('pk').values_list('pk', 'status')
+            )
+
+            payments = Payment.objects.select_for_update().filter(pk__in=chunk)
+            if statuses is None:
+                payments = payments.exclude(status='completed')
+            else:
+                payments = payments.filter(status__in=statuses)
+            rows = []
+            for payment_id, order_id in payments.values_list('pk', 'order_id'):
+                if order_statuses.get(order_id) == 'cancelled':
+                    cancelled.append((payment_id, order_id))
+                else:
+                    rows.append((payment_id, order_id))
+            if not rows:
+                continue
+
+            ids = [payment_id for payment_id, _ in rows]
+            Payment.objects.filter(pk__in=ids).update(status='completed', paid_at=now, updated_at=now)
+            _set_transaction_ids({payment_id: references[payment_id] for payment_id in ids if references[payment_id]})
+
+            # Giống confirm_payment: đơn đang chờ chuyển sang processing
+            orders = Order.objects.filter(pk__in=[order_id for _, order_id in rows])
+            orders.update(
+                paid=True,
+                status=Case(When(status='pending', then=Value('processing')), default=F('status')),
+                updated_at=now,
+            )
+            # update() không gửi post_save: cộng doanh số qua hàng đợi
+            record_orders_later(orders)
+
+            for payment_id in ids:
+                payment_logs.add(payment_id, 'completed', message)
+            confirmed.extend(rows)
+    return confirmed, cancelled
+
+
+class ReconciliationResult:
+
+    def __init__(self):
+        self.total = 0
+        self.ignored = 0
+        self.matched = []
+        self.matched_amount = Decimal('0')
+        self.confirmed = 0
+        self.mismatches = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def mismatch(self, line, reason, order_id=None, expected=None):
+        self.mismatches.append({
+            'line': line.line,
+            'reference': line.reference,
+            'memo': line.memo,
+            'amount': None if line.amount is None else str(line.amount),
+            'order_id': order_id,
+            'expected': None if expected is None else str(expected),
+            'reason': reason,
+        })
+
+    def mismatch_counts(self):
+        counts = {}
+        for mismatch in self.mismatches:
+            counts[mismatch['reason']] = counts.get(mismatch['reason'], 0) + 1
+        return counts
+
+    def as_dict(self, max_mismatches=1000):
+        return {
+            'total': self.total,
+            'ignored': self.ignored,
+            'matched': len(self.matched),
+            'matched_amount': str(self.matched_amount),
+            'confirmed': self.confirmed,
+            'mismatched': len(self.mismatches),
+            'mismatch_counts': self.mismatch_counts(),
+            'mismatches': self.mismatches[:max_mismatches],
+            'elapsed_seconds': round(self.elapsed, 3),
+        }
+
+
+class Reconciler:
+    """
+    reconciler = Reconciler()
+    result = reconciler.run(parse_csv(file))
+    """
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        # order_id -> (payment_id, số tiền, đơn đã hủy), nạp 1 lần cho cả lần đối soát
+        self.pending = {
+            order_id: (payment_id, amount, order_status == 'cancelled')
+            for payment_id, order_id, amount, order_status in Payment.objects.filter(status='pending')
+            .values_list('pk', 'order_id', 'amount', 'order__status').iterator(chunk_size=5000)
+        }
+
+    def run(self, lines):
+        result = ReconciliationResult()
+        references = {}
+        unknown = []
+        for line in lines:
+            result.total += 1
+            if line.amount is None:
+                result.mismatch(line, INVALID_AMOUNT)
+                continue
+            if line.amount <= 0:
+                # Khoản chi hoặc phí, không phải tiền khách trả
+                result.ignored += 1
+                continue
+
+            found = ORDER_MEMO.search(line.memo)
+            if not found:
+                result.mismatch(line, NO_REFERENCE)
+                continue
+            order_id = int(found.group(1))
+            payment = self.pending.get(order_id)
+            if payment is None:
+                unknown.append((line, order_id))
+                continue
+            payment_id, expected, order_cancelled = payment
+            if order_cancelled:
+                result.mismatch(line, ORDER_CANCELLED, order_id, expected)
+                continue
+            if payment_id in references:
+                result.mismatch(line, DUPLICATE, order_id, expected)
+                continue
+            if line.amount != expected:
+                result.mismatch(line, AMOUNT_MISMATCH, order_id, expected)
+                continue
+
+            references[payment_id] = line.reference[:100] or None
+            result.matched.append((payment_id, order_id, line))
+            result.matched_amount += line.amount
+
+        self.classify_unknown(unknown, result)
+        if references and not self.dry_run:
+            confirmed, cancelled = confirm_payments(references, message='Xác nhận qua đối soát sao kê')
+            result.confirmed = len(confirmed)
+            self.reject_cancelled(cancelled, result)
+        result.elapsed = time.perf_counter() - result.started
+        return result
+
+    def reject_cancelled(self, cancelled, result):
+        """Đơn bị hủy sau khi nạp danh sách pending: chuyển từ khớp sang không khớp"""
+        if not cancelled:
+            return
+        payment_ids = {payment_id for payment_id, _ in cancelled}
+        matched = []
+        for payment_id, order_id, line in result.matched:
+            if payment_id in payment_ids:
+                result.matched_amount -= line.amount
+                result.mismatch(line, ORDER_CANCELLED, order_id, self.pending[order_id][1])
+            else:
+                matched.append((payment_id, order_id, line))
+        result.matched = matched
+        result.mismatches.sort(key=lambda mismatch: mismatch['line'])
+
+    def classify_unknown(self, unknown, result, chunk_size=1000):
+        """Đơn không có payment pending: đã thanh toán, đã hủy/thất bại hay không tồn tại"""
+        order_ids = sorted({order_id for _, order_id in unknown})
+        statuses = {}
+        for start in range(0, len(order_ids), chunk_size):
+            statuses.update(
+                Payment.objects.filter(order_id__in=order_ids[start:start + chunk_size])
+                .values_list('order_id', 'status')
+            )
+        for line, order_id in unknown:
+            payment_status = statuses.get(order_id)
+            if payment_status is None:
+                reason = NOT_FOUND
+            elif payment_status == 'completed':
+                reason = ALREADY_COMPLETED
+            else:
+                reason = NOT_PENDING
+            result.mismatch(line, reason, order_id)
+        result.mismatches.sort(key=lambda mismatch: mismatch['line'])
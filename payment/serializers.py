@@ -1,7 +1,12 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Payment, PaymentLog
 
 
+def recent_logs_limit():
+    return getattr(settings, 'PAYMENT_RECENT_LOGS', 20)
+
+
 class PaymentLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = PaymentLog
@@ -9,8 +14,8 @@ class PaymentLogSerializer(serializers.ModelSerializer):
 
 
 class PaymentSerializer(serializers.ModelSerializer):
-    order_id = serializers.IntegerField(source='order.id', read_only=True)
-    logs = PaymentLogSerializer(many=True, read_only=True)
+    order_id = serializers.IntegerField(read_only=True)
+    logs = serializers.SerializerMethodField()
 
     class Meta:
         model = Payment
@@ -21,3 +26,9 @@ class PaymentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['qr_code_url', 'created_at', 'updated_at', 'paid_at']
 
+    def get_logs(self, obj):
+        """PAYMENT_RECENT_LOGS log mới nhất (đã prefetch vào recent_logs nếu có)"""
+        logs = getattr(obj, 'recent_logs', None)
+        if logs is None:
+            logs = obj.logs.all()[:recent_logs_limit()]
+        return PaymentLogSerializer(logs, many=True).data
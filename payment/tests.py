@@ -1,3 +1,310 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from orders.models import Order
+from tasks.models import Task
+from . import qr, vietqr
+from .reconciliation import Reconciler, parse_camt, parse_csv
+from .logs import PaymentLogWriter
+from .models import Payment, PaymentLog
+
+
+class PaymentLogTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password123')
+        self.order = Order.objects.create(user=self.user, total_price=100)
+        self.payment = Payment.objects.create(order=self.order, amount=100)
+        self.client.force_authenticate(self.user)
+
+    def test_batch_writes_logs_in_one_insert_with_the_transaction(self):
+        writer = PaymentLogWriter()
+        with CaptureQueriesContext(connection) as queries:
+            with writer.batch():
+                for i in range(5):
+                    writer.add(self.payment, 'pending', f'log {i}')
+        inserts = [query for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(self.payment.logs.count(), 5)
+
+        with self.assertRaises(ZeroDivisionError):
+            with writer.batch():
+                writer.add(self.payment, 'failed')
+                1 / 0
+        self.assertEqual(self.payment.logs.count(), 5)
+
+    def test_add_outside_batch_writes_with_current_transaction(self):
+        writer = PaymentLogWriter()
+        with self.assertRaises(ZeroDivisionError):
+            with transaction.atomic():
+                writer.add(self.payment, 'pending')
+                self.assertEqual(self.payment.logs.count(), 1)
+                1 / 0
+        self.assertFalse(PaymentLog.objects.exists())
+
+        writer.add(self.payment.pk, 'completed')
+        self.assertEqual(self.payment.logs.get().status, 'completed')
+
+    @override_settings(PAYMENT_RECENT_LOGS=3)
+    def test_detail_returns_latest_logs_including_new_one(self):
+        PaymentLog.objects.bulk_create([
+            PaymentLog(payment=self.payment, status='pending', message=f'log {i}') for i in range(10)
+        ])
+        other = Payment.objects.create(order=Order.objects.create(user=self.user), amount=10)
+        PaymentLog.objects.create(payment=other, status='pending')
+
+        response = self.client.get('/api/payment/')
+        self.assertEqual(response.status_code, 200)
+        logs = {row['id']: len(row['logs']) for row in response.data['results']}
+        self.assertEqual(logs, {self.payment.pk: 3, other.pk: 1})
+
+        response = self.client.post(f'/api/payment/{self.payment.pk}/cancel_payment/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['logs']), 3)
+        self.assertEqual(response.data['logs'][0]['status'], 'cancelled')
+        self.assertIsNotNone(response.data['logs'][0]['id'])
+
+
+# Ma trận QR (version 7, mức M, mask 2) của build_payload('970422', '0796791500', 150000, 'Order 7'),
+# đã đối chiếu với một bộ mã hóa QR độc lập; '#' là ô đen
+VIETQR_MATRIX = """
+#######..#.#.#.###...#.#...##.#.....#.#######
+#.....#..##..##.#.#.....###..#..#..#..#.....#
+#.###.#.##.#.##.#.#..#..##..#.#.##.#..#.###.#
+#.###.#.#.#.#.###.###.#.#..#..#....##.#.###.#
+#.###.#.###.#.####..######..#.#.#####.#.###.#
+#.....#.#..##....#..#...#....#...#....#.....#
+#######.#.#.#.#.#.#.#.#.#.#.#.#.#.#.#.#######
+........#.##.###...##...#...#.####.##........
+#.#####..#...#..##.######..#..#..#.#..#####..
+###....##...#.#...##.#..##....####..#..#..###
+###..###...####...##.#..#..#.#.#..######.##..
+..#.....##..#..#.....#....#.#.###...#...#.#..
+.########.##.#.#..##..####.#..#...##...#.#...
+.#.#...##...####.#....##...#..#.##..#.....###
+..#####.......##..#####.####.#....######.##..
+##.###..##.####.......#.#...#####....#.#.##.#
+..##.##.###....#..#..#..##.#.##....#..#..####
+##.###.#.#..#...##..##.#...#..####..##.#####.
+.###..#...#..#.#..####..####.#....####.#...#.
+##.....####.##..#....#.##...#.###.#.#...#.#..
+##..#######....#.##.########.###..########..#
+..###...#..##.#.###.#...#..#..##...##...#.###
+..#.#.#.##...##...#.#.#.####.#.#..#.#.#.#.#..
+.####...#.##.#..###.#...#...######..#...#.#..
+.#.######.####.#..########.#..#..##.######...
+.#..##.###...#...###..#....#..####..#..#..###
+##.#..#.###..##.#.#....#.###.#....#.#..#.....
+##...#.###.#...#........##..######...###..#..
+.##.####.....#..###..#..#.##.#...#..#...##.#.
+.###.#..##.##..####.#.#.#...#.#.##...#.#..#..
+#####.###..##.#..#.#.#..####.#....#....##..#.
+#..#.#.##.############.###..######.#####.##.#
+#..##.##.#..#..##.####.###.#..#...#.#...#.##.
+####.#.#.##......###..#.#..#..#.##.#...#..###
+....#.#.###...##....##.#.##..#....#..........
+.####..#.#..##.#.##.#...#...#.#.##.#####..#..
+#..##.#.#......#..#.######.#.###.##.######...
+........##..#..#.####...#..#..#.....#...#.###
+#######.....##...#.##.#.####.#.#.##.#.#.#.#..
+#.....#.#....#....#.#...#...######..#...#.###
+#.###.#.##.#.....#..#####..#.##.....######.#.
+#.###.#.#.#..##.#.#..#..#..#..#..#.#.#.#.####
+#.###.#.#.#.#...#.......####.#....#.#.....##.
+#.....#..#.#..##...###.#.#..#####...##....#..
+#######.##..####..#..#..####.....#...#.###.#.
+"""
+
+
+class VietQRTests(APITestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        override = override_settings(PAYMENT_QR_CACHE_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        vietqr.qr_images.clear()
+
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password123')
+        self.order = Order.objects.create(user=self.user, total_price=150000)
+        self.client.force_authenticate(self.user)
+
+    def test_payload_fields_and_crc(self):
+        self.assertEqual(vietqr.crc16_ccitt(b'123456789'), 0x29B1)
+        payload = vietqr.build_payload('970422', '0796791500', 150000, 'Order 7')
+        self.assertTrue(payload.startswith('000201010212'))
+        self.assertIn('0010A000000727', payload)
+        self.assertIn('0006970422', payload)
+        self.assertIn('5406150000', payload)
+        self.assertIn('62110807Order 7', payload)
+        self.assertEqual(payload[-8:-4], '6304')
+        self.assertEqual(payload[-4:], f'{vietqr.crc16_ccitt(payload[:-4].encode()):04X}')
+
+    def test_encoder_picks_smallest_version(self):
+        matrix = qr.encode('HELLO', level='M')
+        self.assertEqual(len(matrix), 21)
+        # Finder pattern góc trên trái
+        self.assertEqual(matrix[0][:7], [True] * 7)
+        self.assertEqual(matrix[1][:7], [True] + [False] * 5 + [True])
+        self.assertEqual(len(qr.encode('x' * 200, level='M')), 4 * 10 + 17)
+
+    def test_reed_solomon_matches_published_example(self):
+        # "HELLO WORLD" 1-M (chế độ alphanumeric): 16 codeword dữ liệu, 10 codeword sửa lỗi
+        data = [32, 91, 11, 120, 209, 114, 220, 77, 67, 64, 236, 17, 236, 17, 236, 17]
+        self.assertEqual(
+            qr._rs_remainder(data, qr._rs_divisor(10)),
+            [196, 35, 39, 119, 235, 215, 231, 226, 93, 23],
+        )
+
+    def test_data_and_ecc_codewords(self):
+        version, data = qr.encode_data('HELLO', level='M')
+        self.assertEqual(version, 1)
+        # 0100 | 00000101 | 'HELLO' | terminator 0000, rồi byte đệm 0xEC 0x11 xen kẽ
+        self.assertEqual(data, [64, 84, 132, 84, 196, 196, 240] + [236, 17] * 4 + [236])
+        self.assertEqual(
+            qr._Symbol(version, 'M').add_error_correction(data),
+            data + [35, 115, 35, 153, 236, 8, 201, 247, 55, 223],
+        )
+
+    def test_vietqr_matrix(self):
+        payload = vietqr.build_payload('970422', '0796791500', 150000, 'Order 7')
+        rows = [''.join('#' if dark else '.' for dark in row) for row in qr.encode(payload, level='M')]
+        self.assertEqual(rows, VIETQR_MATRIX.split())
+
+    def test_create_qr_payment_saves_url_once(self):
+        first = self.client.post('/api/payment/create_qr_payment/', {'order_id': self.order.pk}, format='json')
+        second = self.client.post('/api/payment/create_qr_payment/', {'order_id': self.order.pk}, format='json')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.data['qr_code_url'], second.data['qr_code_url'])
+        self.assertTrue(first.data['qr_code_url'].endswith(f'/api/payment/{first.data["id"]}/qr.png'))
+        self.assertEqual(PaymentLog.objects.count(), 1)
+
+    def test_image_is_rendered_once_and_cached(self):
+        payment = Payment.objects.create(order=self.order, amount=150000, account_number='0796791500')
+        url = f'/api/payment/{payment.pk}/qr.png'
+        with mock.patch.object(vietqr.qr_images, 'render', wraps=vietqr.qr_images.render) as render:
+            response = self.client.get(url, HTTP_ACCEPT='image/png')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'image/png')
+            self.assertTrue(response.content.startswith(b'\x89PNG'))
+
+            self.assertEqual(self.client.get(url).content, response.content)
+            vietqr.qr_images.clear()
+            self.assertEqual(self.client.get(url).content, response.content)
+            self.assertEqual(render.call_count, 1)
+
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        svg = self.client.get(f'/api/payment/{payment.pk}/qr.svg')
+        self.assertEqual(svg['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', svg.content)
+
+        self.client.force_authenticate(User.objects.create_user('other', 'other@example.com', 'password123'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+CAMT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>
+<Ntry><Amt Ccy="VND">20000</Amt><CdtDbtInd>CRDT</CdtDbtInd><BookgDt><Dt>2025-01-02</Dt></BookgDt>
+<AcctSvcrRef>FT002</AcctSvcrRef><NtryDtls><TxDtls><RmtInf><Ustrd>ORDER%d</Ustrd></RmtInf></TxDtls></NtryDtls></Ntry>
+<Ntry><Amt Ccy="VND">5000</Amt><CdtDbtInd>DBIT</CdtDbtInd><AcctSvcrRef>FT003</AcctSvcrRef></Ntry>
+</Stmt></BkToCstmrStmt></Document>"""
+
+
+class ReconciliationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password123')
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'password123', is_staff=True)
+        self.payments = []
+        for amount in (10000, 20000, 30000, 40000):
+            order = Order.objects.create(user=self.user, total_price=amount)
+            self.payments.append(Payment.objects.create(order=order, amount=amount))
+        self.payments[3].status = 'completed'
+        self.payments[3].save()
+
+    def statement(self):
+        first, second, third, paid = [payment.order_id for payment in self.payments]
+        rows = [
+            'reference,amount,description,date',
+            f'FT001,"10,000",CK ORDER {first} thanh toan,2025-01-02',
+            f'FT002,10000,Order {first},2025-01-02',
+            f'FT003,25000,Order {third},2025-01-02',
+            'FT004,5000,chuyen tien,2025-01-02',
+            f'FT005,40000,Order {paid},2025-01-02',
+            'FT006,1000,Order 999999,2025-01-02',
+            'FT007,-3000,Phi dich vu,2025-01-02',
+        ]
+        return io.BytesIO('\n'.join(rows).encode('utf-8'))
+
+    def test_matches_and_confirms_in_bulk(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = Reconciler().run(parse_csv(self.statement()))
+        self.assertLess(len(queries), 20)
+        report = result.as_dict()
+        self.assertEqual((report['total'], report['matched'], report['confirmed'], report['ignored']), (7, 1, 1, 1))
+        self.assertEqual(report['mismatch_counts'], {
+            'duplicate': 1, 'amount_mismatch': 1, 'no_reference': 1, 'already_completed': 1, 'not_found': 1,
+        })
+        self.assertEqual([row['line'] for row in report['mismatches']], [3, 4, 5, 6, 7])
+
+        first = Payment.objects.get(pk=self.payments[0].pk)
+        self.assertEqual((first.status, first.transaction_id), ('completed', 'FT001'))
+        self.assertIsNotNone(first.paid_at)
+        self.assertEqual(first.logs.get().message, 'Xác nhận qua đối soát sao kê')
+        order = first.order
+        self.assertEqual((order.paid, order.status), (True, 'processing'))
+        self.assertEqual(Task.objects.get(name='analytics.record_orders').payload, {'order_ids': [order.pk]})
+        self.assertEqual(Payment.objects.filter(status='pending').count(), 2)
+
+    def test_camt_xml_and_dry_run(self):
+        xml = io.BytesIO(CAMT % self.payments[1].order_id)
+        lines = list(parse_camt(xml))
+        self.assertEqual([(line.reference, line.amount) for line in lines], [('FT002', 20000), ('FT003', -5000)])
+
+        result = Reconciler(dry_run=True).run(iter(lines))
+        self.assertEqual((len(result.matched), result.confirmed), (1, 0))
+        self.assertEqual(Payment.objects.get(pk=self.payments[1].pk).status, 'pending')
+
+    def test_cancelled_orders_are_mismatches(self):
+        first, second = self.payments[0], self.payments[1]
+        Order.objects.filter(pk=first.order_id).update(status='cancelled')
+        reconciler = Reconciler()
+        # Đơn bị hủy sau khi nạp danh sách pending (API hoặc sweeper)
+        Order.objects.filter(pk=second.order_id).update(status='cancelled')
+        statement = io.BytesIO(
+            f'reference,amount,description\nFT001,10000,Order {first.order_id}\nFT002,20000,Order {second.order_id}\n'
+            .encode('utf-8')
+        )
+        report = reconciler.run(parse_csv(statement)).as_dict()
+        self.assertEqual((report['matched'], report['confirmed'], report['matched_amount']), (0, 0, '0'))
+        self.assertEqual(report['mismatch_counts'], {'order_cancelled': 2})
+        self.assertEqual([row['line'] for row in report['mismatches']], [2, 3])
+        self.assertEqual(Payment.objects.filter(pk__in=[first.pk, second.pk], status='pending').count(), 2)
+        self.assertFalse(Order.objects.filter(pk__in=[first.order_id, second.order_id], paid=True).exists())
+
+    def test_endpoint_is_admin_only(self):
+        self.client.force_authenticate(self.user)
+        upload = SimpleUploadedFile('statement.csv', self.statement().getvalue())
+        self.assertEqual(self.client.post('/api/payment/reconcile/', {'file': upload}).status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        upload = SimpleUploadedFile('statement.xml', CAMT % self.payments[1].order_id)
+        response = self.client.post('/api/payment/reconcile/', {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['confirmed'], 1)
+        self.assertEqual(Payment.objects.get(pk=self.payments[1].pk).transaction_id, 'FT002')
+
+        upload = SimpleUploadedFile('statement.csv', b'foo,bar\n1,2\n')
+        self.assertEqual(self.client.post('/api/payment/reconcile/', {'file': upload}).status_code, 400)
@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 from .views import PaymentViewSet
 
@@ -6,6 +6,11 @@ router = DefaultRouter()
 router.register(r'payment', PaymentViewSet, basename='payment')
 
 urlpatterns = [
+    re_path(
+        r'^payment/(?P<pk>\d+)/qr\.(?P<fmt>png|svg)$',
+        PaymentViewSet.as_view({'get': 'qr_image'}),
+        name='payment-qr',
+    ),
     path('', include(router.urls)),
 ]
 
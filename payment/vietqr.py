@@ -0,0 +1,182 @@
+"""
+Tạo payload VietQR (chuẩn EMVCo Merchant-Presented QR của NAPAS) và ảnh QR
+ngay trên server, không gọi img.vietqr.io.
+
+Ảnh được cache theo nội dung: khóa là SHA-256 của (payload, định dạng, kích
+thước), payload lại chỉ phụ thuộc (ngân hàng, số tài khoản, số tiền, nội
+dung chuyển khoản). Lần đầu ảnh được vẽ và ghi vào PAYMENT_QR_CACHE_DIR;
+các lần sau đọc từ LRU trong bộ nhớ hoặc từ file, không tốn CPU vẽ lại.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import qr
+
+logger = logging.getLogger(__name__)
+
+# Định danh dịch vụ chuyển khoản nhanh NAPAS 247 tới tài khoản
+NAPAS_GUID = 'A000000727'
+SERVICE_ACCOUNT_TRANSFER = 'QRIBFTTA'
+CURRENCY_VND = '704'
+COUNTRY_VN = 'VN'
+
+FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+def _crc16_table():
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = (crc << 1) ^ 0x1021 if crc & 0x8000 else crc << 1
+        table.append(crc & 0xFFFF)
+    return table
+
+
+_CRC_TABLE = _crc16_table()
+
+
+def crc16_ccitt(data):
+    """CRC-16/CCITT-FALSE (đa thức 0x1021, giá trị đầu 0xFFFF) theo EMVCo"""
+    crc = 0xFFFF
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC_TABLE[(crc >> 8) ^ byte]
+    return crc
+
+
+def tlv(tag, value):
+    """Trường EMVCo: mã 2 số + độ dài 2 số + giá trị"""
+    if len(value) > 99:
+        raise ValueError(f'Trường {tag} dài quá 99 ký tự')
+    return f'{tag}{len(value):02d}{value}'
+
+
+def build_payload(bank_bin, account_number, amount=None, info=''):
+    """
+    Payload VietQR chuyển khoản tới tài khoản; có amount thì là QR động
+    (ứng dụng ngân hàng điền sẵn số tiền)
+    """
+    beneficiary = tlv('00', bank_bin) + tlv('01', account_number)
+    merchant = tlv('00', NAPAS_GUID) + tlv('01', beneficiary) + tlv('02', SERVICE_ACCOUNT_TRANSFER)
+    payload = tlv('00', '01') + tlv('01', '12' if amount else '11') + tlv('38', merchant) + tlv('53', CURRENCY_VND)
+    if amount:
+        payload += tlv('54', str(int(amount)))
+    payload += tlv('58', COUNTRY_VN)
+    if info:
+        payload += tlv('62', tlv('08', info))
+    payload += '6304'
+    return payload + f'{crc16_ccitt(payload.encode("ascii")):04X}'
+
+
+def get_bank_bin():
+    return getattr(settings, 'VIETQR_BANK_BIN', '970422')
+
+
+def payment_info(order_id):
+    """Nội dung chuyển khoản, dùng để đối soát sao kê"""
+    return f'Order {order_id}'
+
+
+def payment_payload(payment):
+    return build_payload(
+        get_bank_bin(),
+        payment.account_number or '0123456789',
+        payment.amount,
+        payment_info(payment.order_id),
+    )
+
+
+class QRImageCache:
+    """LRU trong bộ nhớ trước một thư mục file đặt tên theo hash nội dung"""
+
+    def __init__(self, directory=None, max_entries=None, scale=None):
+        self._directory = directory
+        self._max_entries = max_entries
+        self._scale = scale
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def directory(self):
+        if self._directory:
+            return self._directory
+        return getattr(settings, 'PAYMENT_QR_CACHE_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'qr')
+
+    @property
+    def max_entries(self):
+        return self._max_entries or getattr(settings, 'PAYMENT_QR_MEMORY_CACHE_SIZE', 256)
+
+    @property
+    def scale(self):
+        return self._scale or getattr(settings, 'PAYMENT_QR_SCALE', 8)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def key(self, payload, image_format):
+        return hashlib.sha256(f'{image_format}\x1f{self.scale}\x1f{payload}'.encode('utf-8')).hexdigest()
+
+    def path(self, key, image_format):
+        return os.path.join(self.directory, key[:2], f'{key}.{image_format}')
+
+    def get(self, payload, image_format):
+        """(khóa, nội dung ảnh) của payload, vẽ nếu chưa có trong cache"""
+        if image_format not in FORMATS:
+            raise ValueError(f'Định dạng ảnh không hỗ trợ: {image_format}')
+        key = self.key(payload, image_format)
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+                return key, content
+
+        path = self.path(key, image_format)
+        try:
+            with open(path, 'rb') as file:
+                content = file.read()
+        except FileNotFoundError:
+            content = self.render(payload, image_format)
+            try:
+                self.write(path, content)
+            except OSError as exc:
+                # Không ghi được đĩa vẫn trả ảnh, chỉ mất cache file
+                logger.warning('Không ghi được cache ảnh QR %s: %s', path, exc)
+
+        with self._lock:
+            self._entries[key] = content
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return key, content
+
+    def render(self, payload, image_format):
+        matrix = qr.encode(payload, level='M')
+        if image_format == 'png':
+            return qr.render_png(matrix, scale=self.scale)
+        return qr.render_svg(matrix).encode('utf-8')
+
+    def write(self, path, content):
+        # Ghi file tạm rồi đổi tên: request khác không bao giờ đọc phải file ghi dở
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(content)
+            os.replace(temporary, path)
+        except OSError:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+
+qr_images = QRImageCache()
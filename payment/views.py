@@ -1,30 +1,51 @@
+from xml.etree import ElementTree
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from django.db.models import Prefetch
+from django.http import HttpResponse, HttpResponseNotModified
+from django.urls import reverse
 from django.utils import timezone
+from . import reconciliation, vietqr
+from .logs import payment_logs
 from .models import Payment, PaymentLog
-from .serializers import PaymentSerializer
+from .serializers import PaymentSerializer, recent_logs_limit
+from orders.idempotency import idempotent
 from orders.models import Order
-import urllib.parse
+from grocery_store import exports
+from grocery_store.metrics import SerializerTimingMixin
+from grocery_store.pagination import KeysetOrPageNumberPagination
+from grocery_store.throttling import PaymentThrottle
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     """
     API endpoint cho quản lý thanh toán
     """
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
+    throttle_classes = [PaymentThrottle]
+    pagination_class = KeysetOrPageNumberPagination
 
     def get_queryset(self):
         """User chỉ xem payment của đơn hàng mình, Admin xem tất cả"""
         user = self.request.user
-        if user.is_staff:
-            return Payment.objects.all()
-        return Payment.objects.filter(order__user=user)
+        queryset = Payment.objects.all()
+        if not user.is_staff:
+            queryset = queryset.filter(order__user=user)
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        # Chỉ N log mới nhất mỗi payment, một truy vấn cho cả trang
+        return queryset.prefetch_related(Prefetch(
+            'logs',
+            queryset=PaymentLog.objects.order_by('-created_at', '-id')[:recent_logs_limit()],
+            to_attr='recent_logs',
+        ))
 
     @action(detail=False, methods=['post'])
+    @idempotent('payment.create_qr_payment')
     def create_qr_payment(self, request):
         """
         Tạo thanh toán QR cho đơn hàng
@@ -47,9 +68,22 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        if order.status == 'cancelled':
+            return Response(
+                {"error": "Đơn hàng đã bị hủy"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         # Kiểm tra đã có payment chưa
         if hasattr(order, 'payment'):
             payment = order.payment
+            if payment.status in ('cancelled', 'failed') and not order.paid:
+                # Đơn vẫn còn mở: mở lại payment (OneToOne) để khách thanh toán tiếp
+                with payment_logs.batch():
+                    payment.status = 'pending'
+                    payment.amount = order.total_price
+                    payment.save(update_fields=['status', 'amount', 'updated_at'])
+                    payment_logs.add(payment, 'pending', 'Mở lại thanh toán')
         else:
             # Tạo payment mới
             payment = Payment.objects.create(
@@ -62,48 +96,27 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 account_name='TRAN NGOC PHUC HUY'
             )
 
-        # Tạo QR Code URL sử dụng VietQR API
+        # URL ảnh QR không đổi: chỉ lưu lần đầu (hoặc khi đổi domain)
         qr_url = self.generate_vietqr_url(payment)
-        payment.qr_code_url = qr_url
-        payment.save()
-
-        # Log
-        PaymentLog.objects.create(
-            payment=payment,
-            status='pending',
-            message='Tạo mã QR thanh toán'
-        )
+        if payment.qr_code_url != qr_url:
+            with payment_logs.batch():
+                payment.qr_code_url = qr_url
+                payment.save(update_fields=['qr_code_url', 'updated_at'])
+                payment_logs.add(payment, 'pending', 'Tạo mã QR thanh toán')
 
         serializer = self.get_serializer(payment)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def generate_vietqr_url(self, payment):
         """
-        Tạo URL mã QR thanh toán sử dụng VietQR API
-        https://api.vietqr.io/
+        URL ảnh QR VietQR do server tự tạo (payment.vietqr), không qua api.vietqr.io
         """
-        # Thông tin ngân hàng
-        bank_id = "970422"  # MB Bank code
-        account_no = payment.account_number or "0123456789"
-        account_name = payment.account_name or "GROCERY STORE"
-        amount = int(payment.amount)
-
-        # Nội dung chuyển khoản
-        add_info = f"Order {payment.order.id}"
-
-        # Tạo URL QR Code
-        # Format: https://img.vietqr.io/image/{BANK_ID}-{ACCOUNT_NO}-{TEMPLATE}.png?amount={AMOUNT}&addInfo={INFO}&accountName={NAME}
-        base_url = f"https://img.vietqr.io/image/{bank_id}-{account_no}-compact2.png"
-        params = {
-            'amount': amount,
-            'addInfo': add_info,
-            'accountName': account_name
-        }
-
-        qr_url = f"{base_url}?{urllib.parse.urlencode(params)}"
-        return qr_url
+        return self.request.build_absolute_uri(
+            reverse('payment-qr', kwargs={'pk': payment.pk, 'fmt': 'png'})
+        )
 
     @action(detail=True, methods=['post'])
+    @idempotent('payment.confirm_payment')
     def confirm_payment(self, request, pk=None):
         """
         Xác nhận thanh toán đã hoàn tất
@@ -111,33 +124,40 @@ class PaymentViewSet(viewsets.ModelViewSet):
         """
         payment = self.get_object()
 
-        if payment.status == 'completed':
-            return Response(
-                {"error": "Thanh toán đã được xác nhận trước đó"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        with payment_logs.batch():
+            # Khóa đơn rồi đọc lại trạng thái: sweeper (orders.expiry) bỏ qua đơn đang
+            # bị khóa, còn đơn sweeper đã hủy (hàng đã trả về kho) thì không xác nhận
+            order = Order.objects.select_for_update().get(pk=payment.order_id)
+            payment.refresh_from_db(fields=['status'])
+            error = self.confirm_error(payment, order)
+            if error:
+                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Cập nhật trạng thái
-        payment.status = 'completed'
-        payment.paid_at = timezone.now()
-        payment.save()
-
-        # Cập nhật đơn hàng
-        order = payment.order
-        order.paid = True
-        order.status = 'processing'
-        order.save()
-
-        # Log
-        PaymentLog.objects.create(
-            payment=payment,
-            status='completed',
-            message='Thanh toán đã được xác nhận'
-        )
+            # Cập nhật trạng thái
+            payment.status = 'completed'
+            payment.paid_at = timezone.now()
+            payment.save()
+
+            # Cập nhật đơn hàng
+            payment.order = order
+            order.paid = True
+            order.status = 'processing'
+            order.save()
+
+            payment_logs.add(payment, 'completed', 'Thanh toán đã được xác nhận')
 
         serializer = self.get_serializer(payment)
         return Response(serializer.data)
 
+    def confirm_error(self, payment, order):
+        if payment.status == 'completed':
+            return "Thanh toán đã được xác nhận trước đó"
+        if payment.status == 'cancelled':
+            return "Thanh toán đã bị hủy, vui lòng tạo lại mã QR"
+        if order.status == 'cancelled':
+            return "Đơn hàng đã bị hủy, không thể xác nhận thanh toán"
+        return None
+
     @action(detail=True, methods=['post'])
     def cancel_payment(self, request, pk=None):
         """
@@ -152,15 +172,10 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        payment.status = 'cancelled'
-        payment.save()
-
-        # Log
-        PaymentLog.objects.create(
-            payment=payment,
-            status='cancelled',
-            message='Thanh toán đã bị hủy'
-        )
+        with payment_logs.batch():
+            payment.status = 'cancelled'
+            payment.save()
+            payment_logs.add(payment, 'cancelled', 'Thanh toán đã bị hủy')
 
         serializer = self.get_serializer(payment)
         return Response(serializer.data)
@@ -174,16 +189,82 @@ class PaymentViewSet(viewsets.ModelViewSet):
         payment = self.get_object()
 
         if not payment.qr_code_url:
-            qr_url = self.generate_vietqr_url(payment)
-            payment.qr_code_url = qr_url
-            payment.save()
+            payment.qr_code_url = self.generate_vietqr_url(payment)
+            Payment.objects.filter(pk=payment.pk).update(qr_code_url=payment.qr_code_url)
 
         return Response({
             'qr_code_url': payment.qr_code_url,
+            'qr_svg_url': self.request.build_absolute_uri(
+                reverse('payment-qr', kwargs={'pk': payment.pk, 'fmt': 'svg'})
+            ),
+            # Chuỗi VietQR để app tự vẽ mã QR
+            'qr_payload': vietqr.payment_payload(payment),
             'amount': payment.amount,
             'bank_name': payment.bank_name,
             'account_number': payment.account_number,
             'account_name': payment.account_name,
-            'order_id': payment.order.id
+            'order_id': payment.order_id
         })
 
+    def qr_image(self, request, pk=None, fmt='png'):
+        """
+        Ảnh QR thanh toán (tạo trên server, cache theo nội dung)
+        GET /api/payment/{id}/qr.png hoặc /api/payment/{id}/qr.svg
+        """
+        payment = self.get_object()
+        key, content = vietqr.qr_images.get(vietqr.payment_payload(payment), fmt)
+        etag = f'"{key}"'
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=vietqr.FORMATS[fmt])
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=3600'
+        return response
+
+    def perform_content_negotiation(self, request, force=False):
+        # Ảnh QR trả về HttpResponse, không qua renderer: không báo 406 với Accept: image/*
+        return super().perform_content_negotiation(request, force=force or self.action == 'qr_image')
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def reconcile(self, request):
+        """
+        Đối soát sao kê ngân hàng, xác nhận các payment khớp "Order {id}" và số tiền
+        POST /api/payment/reconcile/ (multipart: file=<csv|xml>)
+        Query: ?fmt=csv|camt&dry_run=1
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {"error": "Vui lòng gửi file sao kê"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        file_format = reconciliation.detect_format(upload.name, request.query_params.get('fmt', 'csv'))
+        reconciler = reconciliation.Reconciler(dry_run=request.query_params.get('dry_run') in ('1', 'true'))
+        try:
+            result = reconciler.run(reconciliation.PARSERS[file_format](upload.file))
+        except (ValueError, UnicodeDecodeError, ElementTree.ParseError) as exc:
+            return Response({"error": f"File không hợp lệ: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict())
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Xuất lịch sử thanh toán dạng CSV/NDJSON theo luồng
+        GET /api/payment/export/?fmt=csv|ndjson&from=2025-01-01&to=2025-01-31
+        """
+        export_format = exports.get_export_format(request)
+        queryset = exports.filter_date_range(self.get_queryset(), request)
+        columns = [
+            ('id', 'id'),
+            ('order_id', 'order_id'),
+            ('username', 'order__user__username'),
+            ('amount', 'amount'),
+            ('method', 'method'),
+            ('status', 'status'),
+            ('transaction_id', 'transaction_id'),
+            ('bank_name', 'bank_name'),
+            ('created_at', 'created_at'),
+            ('paid_at', 'paid_at'),
+        ]
+        return exports.export_response(queryset, columns, export_format, 'payments')
@@ -3,10 +3,10 @@ from .models import Product, Category
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'description']
+    list_display = ['name', 'description', 'low_stock_threshold']
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'category', 'price', 'stock', 'is_available']
+    list_display = ['name', 'category', 'price', 'stock', 'low_stock_threshold', 'is_available']
     list_filter = ['category', 'is_available']
     search_fields = ['name']
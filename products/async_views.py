@@ -0,0 +1,165 @@
+"""
+Endpoint đọc catalog chạy async (ASGI), song song với viewset đồng bộ.
+
+Dùng async ORM (aget, aiterator) và values() thay cho DRF serializer, nên
+khi chạy dưới uvicorn mỗi request không chiếm một thread riêng. Chỉ có
+GET, không xác thực (giống quyền đọc của ProductViewSet/CategoryViewSet), giới
+hạn tần suất bằng CatalogThrottle như viewset (chung bucket).
+Dữ liệu trả về cùng dạng và cùng quy tắc với endpoint đồng bộ tương ứng.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Q
+from django.http import JsonResponse
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
+from rest_framework.fields import DateTimeField
+
+from grocery_store.throttling import CatalogThrottle, throttle_view
+
+from .low_stock import low_stock_tracker
+from .models import Category, Product
+
+PRODUCT_LIST_FIELDS = ('id', 'sku', 'name', 'category__name', 'price', 'quantity', 'is_available')
+PRODUCT_DETAIL_FIELDS = (
+    'id', 'sku', 'name', 'category', 'category__name', 'description', 'price',
+    'quantity', 'stock', 'low_stock_threshold', 'image', 'is_available', 'created_at', 'updated_at',
+)
+CATEGORY_FIELDS = ('id', 'name', 'description', 'low_stock_threshold', 'products_count', 'created_at', 'updated_at')
+MAX_PAGE_SIZE = 100
+
+_datetime = DateTimeField()
+
+
+def _error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+def _int_param(request, name, default, minimum=0, maximum=None):
+    try:
+        value = int(request.GET.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    value = max(value, minimum)
+    return min(value, maximum) if maximum else value
+
+
+def _product(row):
+    """Cùng dạng với ProductListSerializer/ProductSerializer"""
+    row['category_name'] = row.pop('category__name')
+    row['price'] = str(row['price'])
+    for field in ('created_at', 'updated_at'):
+        if field in row:
+            row[field] = _datetime.to_representation(row[field])
+    return row
+
+
+def _product_detail(request, row):
+    """Cùng dạng với ProductSerializer"""
+    if row['image']:
+        row['image'] = request.build_absolute_uri(settings.MEDIA_URL + row['image'])
+    else:
+        row['image'] = None
+    return _product(row)
+
+
+def _cursor_filter(queryset, cursor):
+    """cursor = '<created_at ISO>|<id>' của sản phẩm cuối trang trước"""
+    created_at, _, product_id = cursor.rpartition('|')
+    try:
+        created_at = parse_datetime(created_at)
+    except ValueError:
+        # Đúng định dạng nhưng sai giá trị, ví dụ tháng 13
+        return None
+    if created_at is None or not product_id.isdigit():
+        return None
+    return queryset.filter(
+        Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=int(product_id))
+    )
+
+
+@require_GET
+@throttle_view(CatalogThrottle)
+async def product_list(request):
+    """
+    GET /api/async/products/?category=&is_available=&page_size=&cursor=
+    Phân trang keyset theo (-created_at, -id) như KeysetPagination
+    """
+    page_size = _int_param(request, 'page_size', settings.REST_FRAMEWORK['PAGE_SIZE'], 1, MAX_PAGE_SIZE)
+    queryset = Product.objects.order_by('-created_at', '-id')
+
+    category = request.GET.get('category')
+    if category:
+        if not category.isdigit():
+            return _error("category không hợp lệ", 400)
+        queryset = queryset.filter(category_id=int(category))
+    is_available = request.GET.get('is_available')
+    if is_available is not None:
+        queryset = queryset.filter(is_available=is_available.lower() in ('true', '1'))
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        queryset = _cursor_filter(queryset, cursor)
+        if queryset is None:
+            return _error("cursor không hợp lệ", 400)
+
+    results = []
+    has_next = False
+    rows = queryset.values(*PRODUCT_LIST_FIELDS, 'created_at')[:page_size + 1]
+    async for row in rows.aiterator():
+        if len(results) == page_size:
+            has_next = True
+            break
+        last = (row.pop('created_at'), row['id'])
+        results.append(_product(row))
+
+    next_url = None
+    if has_next:
+        params = request.GET.copy()
+        params['cursor'] = f'{last[0].isoformat()}|{last[1]}'
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    return JsonResponse({'next': next_url, 'results': results})
+
+
+@require_GET
+@throttle_view(CatalogThrottle)
+async def product_detail(request, pk):
+    """GET /api/async/products/<id>/"""
+    try:
+        row = await Product.objects.values(*PRODUCT_DETAIL_FIELDS).aget(pk=pk)
+    except Product.DoesNotExist:
+        return _error("Không tìm thấy sản phẩm", 404)
+    return JsonResponse(_product_detail(request, row))
+
+
+@require_GET
+@throttle_view(CatalogThrottle)
+async def category_list(request):
+    """GET /api/async/categories/"""
+    rows = Category.objects.annotate(products_count=Count('products')).order_by('name').values(*CATEGORY_FIELDS)
+    results = []
+    async for row in rows.aiterator():
+        row['created_at'] = _datetime.to_representation(row['created_at'])
+        row['updated_at'] = _datetime.to_representation(row['updated_at'])
+        results.append(row)
+    return JsonResponse(results, safe=False)
+
+
+@require_GET
+@throttle_view(CatalogThrottle)
+async def low_stock(request):
+    """
+    GET /api/async/products/low_stock/[?threshold=10]
+    Như /api/products/low_stock/: mặc định theo ngưỡng của từng sản phẩm/danh mục
+    (products.low_stock), ?threshold=N thì cùng một ngưỡng, truy vấn DB
+    """
+    if 'threshold' not in request.GET:
+        # Thường đã nạp sẵn nên không truy vấn DB; lần nạp đầu chạy trong thread
+        return JsonResponse(await sync_to_async(low_stock_tracker.low_stock)(), safe=False)
+
+    threshold = _int_param(request, 'threshold', 10)
+    rows = Product.objects.filter(quantity__lte=threshold, is_available=True).order_by(
+        '-created_at', '-id'
+    ).values(*PRODUCT_DETAIL_FIELDS)
+    results = [_product_detail(request, row) async for row in rows.aiterator()]
+    return JsonResponse(results, safe=False)
@@ -0,0 +1,122 @@
+"""
+Cache đọc cho catalog (products, categories).
+
+Key có version: mọi thay đổi catalog chỉ cần tăng version (bump_version),
+các key cũ tự hết hạn theo timeout, không phải xóa từng key.
+Backend lấy từ settings.CACHES[CATALOG_CACHE_ALIAS] (LocMem, Redis, ...).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+VERSION_KEY = 'catalog:version'
+CHANGED_AT_KEY = 'catalog:changed_at'
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def get_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def get_changed_at():
+    return get_cache().get(CHANGED_AT_KEY)
+
+
+def bump_version():
+    """Đánh dấu catalog đã thay đổi, vô hiệu hóa toàn bộ cache cũ"""
+    cache = get_cache()
+    cache.add(VERSION_KEY, 1, None)
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        # Key vừa bị evict giữa add() và incr()
+        version = int(time.time())
+        cache.set(VERSION_KEY, version, None)
+    cache.set(CHANGED_AT_KEY, int(time.time()), None)
+    return version
+
+
+def make_key(request, view):
+    params = sorted(request.query_params.lists())
+    digest = hashlib.md5(f'{request.get_host()}|{params}'.encode()).hexdigest()
+    lookup = view.kwargs.get(view.lookup_url_kwarg or view.lookup_field, '')
+    return f'catalog:{get_version()}:{view.basename}:{view.action}:{lookup}:{digest}'
+
+
+class CatalogCacheMixin:
+    """
+    Cache kết quả list/retrieve theo filter, search, ordering, trang
+    và trả về ETag/Last-Modified để client gửi GET có điều kiện (304)
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, self.build_list)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, self.build_detail)
+
+    def build_list(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        objects = list(page if page is not None else queryset)
+
+        serializer = self.get_serializer(objects, many=True)
+        if page is not None:
+            data = self.get_paginated_response(serializer.data).data
+        else:
+            data = serializer.data
+
+        # Xóa sản phẩm không làm đổi updated_at của các dòng còn lại,
+        # nên lấy thêm thời điểm catalog thay đổi gần nhất
+        timestamps = [int(obj.updated_at.timestamp()) for obj in objects]
+        changed_at = get_changed_at()
+        if changed_at:
+            timestamps.append(changed_at)
+        return data, max(timestamps, default=None)
+
+    def build_detail(self):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        return serializer.data, int(instance.updated_at.timestamp())
+
+    def cached_response(self, request, build):
+        cache = get_cache()
+        key = make_key(request, self)
+        entry = cache.get(key)
+        if entry is None:
+            data, last_modified = build()
+            entry = {
+                'data': data,
+                'last_modified': last_modified,
+                'etag': quote_etag(hashlib.md5(key.encode()).hexdigest()),
+            }
+            cache.set(key, entry, get_timeout())
+
+        not_modified = get_conditional_response(
+            request._request, etag=entry['etag'], last_modified=entry['last_modified']
+        )
+        if not_modified is not None:
+            return not_modified
+
+        response = Response(entry['data'])
+        response['ETag'] = entry['etag']
+        if entry['last_modified']:
+            response['Last-Modified'] = http_date(entry['last_modified'])
+        return response
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.db.models import Case, IntegerField, Value, When
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from .search import product_index
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    ?search= tìm qua inverted index trong bộ nhớ (products.search)
+    thay vì LIKE '%term%' trên nhiều cột
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+
+        limit = getattr(settings, 'PRODUCT_SEARCH_MAX_RESULTS', 1000)
+        product_ids = product_index.search(query, limit=limit)
+        if not product_ids:
+            return queryset.none().annotate(search_rank=Value(0, output_field=IntegerField()))
+
+        # search_rank: thứ hạng của kết quả, dùng để sắp xếp/phân trang
+        return queryset.filter(pk__in=product_ids).annotate(search_rank=Case(
+            *[When(pk=product_id, then=Value(rank)) for rank, product_id in enumerate(product_ids)],
+            output_field=IntegerField(),
+        ))
+
+
+class ProductOrderingFilter(filters.OrderingFilter):
+    """Khi tìm kiếm mà không chỉ định ?ordering= thì sắp xếp theo độ liên quan"""
+
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param):
+            if request.query_params.get(api_settings.SEARCH_PARAM, '').strip():
+                return ['search_rank', '-id']
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,322 @@
+"""
+Nhập/cập nhật hàng loạt sản phẩm theo SKU từ file CSV hoặc JSON.
+
+File được đọc theo luồng, kiểm tra theo lô, danh mục tra theo tên từ một
+dict nạp một lần, và ghi bằng bulk_create(update_conflicts=True) (hoặc
+bulk_create + bulk_update nếu database không hỗ trợ upsert). Mỗi lô một
+transaction: file hỏng giữa chừng thì các dòng đọc được trước đó vẫn được ghi
+và báo lại trong kết quả (ImportResult.error, ImportResult.written).
+"""
+import csv
+import io
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import cache
+from .inventory import MAX_QUANTITY
+from .low_stock import get_states, low_stock_tracker, record_changes
+from .models import Category, Product
+from .search import product_index
+from .suggest import product_suggester
+
+# Luôn ghi khi cập nhật sản phẩm đã có (các cột bắt buộc của file)
+UPDATE_FIELDS = ['name', 'category', 'price', 'updated_at']
+# Cột tùy chọn: chỉ ghi đè khi file có cột đó, thiếu thì giữ giá trị đang có
+# (sản phẩm mới nhận giá trị mặc định của model)
+OPTIONAL_FIELDS = {
+    'description': ['description'],
+    'quantity': ['quantity', 'stock'],
+    'is_available': ['is_available'],
+}
+# Giới hạn của DecimalField(max_digits=10, decimal_places=2)
+MAX_PRICE = Decimal('100000000')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'có', 'x'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'không', ''}
+# Lỗi đọc file: sai định dạng CSV/JSON, sai encoding
+PARSE_ERRORS = (ValueError, UnicodeDecodeError, csv.Error)
+
+
+class ImportResult:
+
+    def __init__(self):
+        self.total = 0
+        self.written = 0
+        self.errors = []
+        # Lỗi đọc file làm dừng lần nhập (None nếu đọc hết file)
+        self.error = None
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self, max_errors=1000):
+        data = {
+            'total': self.total,
+            'written': self.written,
+            'failed': len(self.errors),
+            'errors': self.errors[:max_errors],
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+        if self.error:
+            data['error'] = self.error
+        return data
+
+
+def _text_stream(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+    return io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+
+def parse_csv(fileobj):
+    """Mỗi dòng CSV (có header) thành một dict"""
+    for row in csv.DictReader(_text_stream(fileobj)):
+        yield {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+
+
+def parse_json(fileobj):
+    """Mảng JSON hoặc NDJSON (mỗi dòng một object, đọc theo luồng)"""
+    stream = _text_stream(fileobj)
+    first = stream.read(1)
+    while first and first.isspace():
+        first = stream.read(1)
+    if first == '[':
+        # Mảng JSON phải nạp cả file; file lớn nên dùng NDJSON
+        yield from json.loads(first + stream.read())
+        return
+
+    pending = first
+    for line in stream:
+        line = (pending + line).strip()
+        pending = ''
+        if line:
+            yield json.loads(line)
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'json': parse_json,
+    'ndjson': parse_json,
+}
+
+
+def detect_format(filename, default='csv'):
+    extension = (filename or '').rsplit('.', 1)[-1].lower()
+    return extension if extension in PARSERS else default
+
+
+class ProductImporter:
+    """
+    importer = ProductImporter(batch_size=1000)
+    result = importer.run(parse_csv(file))
+    """
+
+    def __init__(self, batch_size=1000, create_categories=False, dry_run=False):
+        self.batch_size = batch_size
+        self.create_categories = create_categories
+        self.dry_run = dry_run
+        # Tên danh mục (chữ thường) -> id, nạp 1 lần cho cả lần nhập
+        self.categories = {
+            name.lower(): category_id
+            for name, category_id in Category.objects.values_list('name', 'id')
+        }
+
+    def run(self, rows):
+        result = ImportResult()
+        batch = []
+        try:
+            for line, row in self.read(rows, result):
+                result.total += 1
+                batch.append((line, row))
+                if len(batch) >= self.batch_size:
+                    self.process_batch(batch, result)
+                    batch = []
+            if batch:
+                self.process_batch(batch, result)
+        finally:
+            # Các lô đã commit vẫn phải làm mới cache/index dù lần nhập dừng giữa chừng
+            if result.written and not self.dry_run:
+                self.after_import()
+            result.elapsed = time.perf_counter() - result.started
+        return result
+
+    def read(self, rows, result):
+        """(số dòng, dòng) của file; file hỏng thì dừng và ghi lỗi vào result.error"""
+        try:
+            yield from enumerate(rows, start=1)
+        except PARSE_ERRORS as exc:
+            result.error = f'File không hợp lệ ở dòng {result.total + 1}: {exc}'
+
+    def process_batch(self, batch, result):
+        if self.create_categories:
+            self.ensure_categories(row.get('category') for _, row in batch if isinstance(row, dict))
+
+        products = {}
+        for line, row in batch:
+            product, errors = self.build_product(row)
+            if errors:
+                sku = row.get('sku') if isinstance(row, dict) else None
+                result.errors.append({'row': line, 'sku': sku, 'errors': errors})
+            else:
+                # SKU trùng trong cùng lô: dòng sau thắng
+                products[product.sku] = (product, self.update_fields(row))
+
+        if products and not self.dry_run:
+            self.write(list(products.values()))
+        result.written += len(products)
+
+    def update_fields(self, row):
+        """Các field được ghi đè khi SKU đã tồn tại: cột bắt buộc và cột tùy chọn có trong dòng"""
+        fields = list(UPDATE_FIELDS)
+        for column, column_fields in OPTIONAL_FIELDS.items():
+            if self.has_value(row, column):
+                fields.extend(column_fields)
+        return tuple(fields)
+
+    def has_value(self, row, column):
+        # Ô số lượng để trống cũng coi như không có cột, không hiểu thành 0
+        if column == 'quantity':
+            return row.get(column) not in (None, '')
+        return column in row
+
+    def build_product(self, row):
+        if not isinstance(row, dict):
+            return None, ['Dòng không phải object']
+
+        errors = []
+        sku = str(row.get('sku') or '').strip()
+        name = str(row.get('name') or '').strip()
+        if not sku:
+            errors.append('Thiếu sku')
+        elif len(sku) > 64:
+            errors.append('sku tối đa 64 ký tự')
+        if not name:
+            errors.append('Thiếu name')
+        elif len(name) > 200:
+            errors.append('name tối đa 200 ký tự')
+
+        category_id = self.categories.get(str(row.get('category') or '').strip().lower())
+        if category_id is None:
+            errors.append(f"Danh mục không tồn tại: {row.get('category')}")
+
+        try:
+            price = Decimal(str(row.get('price')).replace(',', ''))
+            if not price.is_finite() or price <= 0:
+                errors.append('Giá sản phẩm phải lớn hơn 0')
+            elif price >= MAX_PRICE:
+                errors.append(f'Giá sản phẩm phải nhỏ hơn {MAX_PRICE}')
+            else:
+                price = price.quantize(Decimal('0.01'))
+        except (InvalidOperation, ValueError):
+            errors.append(f"Giá không hợp lệ: {row.get('price')}")
+            price = None
+
+        quantity = None
+        if self.has_value(row, 'quantity'):
+            try:
+                quantity = int(row['quantity'])
+                if quantity < 0:
+                    errors.append('Số lượng không thể âm')
+                elif quantity > MAX_QUANTITY:
+                    errors.append(f'Số lượng tối đa là {MAX_QUANTITY}')
+            except (TypeError, ValueError):
+                errors.append(f"Số lượng không hợp lệ: {row.get('quantity')}")
+
+        is_available = row.get('is_available', True)
+        if isinstance(is_available, str):
+            value = is_available.strip().lower()
+            if value in TRUE_VALUES:
+                is_available = True
+            elif value in FALSE_VALUES:
+                is_available = False
+            else:
+                errors.append(f'is_available không hợp lệ: {is_available}')
+
+        if errors:
+            return None, errors
+        product = Product(
+            sku=sku,
+            name=name,
+            category_id=category_id,
+            description=str(row.get('description') or ''),
+            price=price,
+            is_available=bool(is_available),
+        )
+        if quantity is not None:
+            product.quantity = product.stock = quantity
+        return product, []
+
+    def ensure_categories(self, names):
+        missing = {}
+        for name in names:
+            name = str(name or '').strip()
+            if name and name.lower() not in self.categories:
+                missing[name.lower()] = name
+        if not missing:
+            return
+        if self.dry_run:
+            # Không ghi database, chỉ coi như danh mục đã có
+            self.categories.update((key, 0) for key in missing)
+            return
+        Category.objects.bulk_create(
+            [Category(name=name[:100]) for name in missing.values()], ignore_conflicts=True
+        )
+        self.categories.update(
+            (name.lower(), category_id)
+            for name, category_id in Category.objects.filter(name__in=missing.values()).values_list('name', 'id')
+        )
+
+    def write(self, products):
+        """
+        products: [(Product, update_fields)]. Dòng được gom theo tập field cần
+        ghi; file CSV chỉ có một tập nên vẫn là 1 câu ghi cho mỗi lô
+        """
+        groups = {}
+        for product, fields in products:
+            groups.setdefault(fields, []).append(product)
+        rows = Product.objects.filter(sku__in=[product.sku for product, _ in products])
+
+        with transaction.atomic():
+            # Trạng thái trước/sau của lô để gửi sự kiện vượt ngưỡng sắp hết hàng
+            before = get_states(rows, lock=True)
+            self.write_groups(groups, rows)
+            record_changes(before, get_states(rows))
+
+    def write_groups(self, groups, rows):
+        """Upsert từng nhóm, hoặc bulk_create + bulk_update nếu database không hỗ trợ"""
+        if connection.features.supports_update_conflicts:
+            for fields, group in groups.items():
+                kwargs = {'update_conflicts': True, 'update_fields': list(fields)}
+                if connection.features.supports_update_conflicts_with_target:
+                    kwargs['unique_fields'] = ['sku']
+                Product.objects.bulk_create(group, batch_size=self.batch_size, **kwargs)
+            return
+
+        existing = dict(rows.values_list('sku', 'id'))
+        now = timezone.now()
+        to_create = []
+        for fields, group in groups.items():
+            to_update = []
+            for product in group:
+                if product.sku in existing:
+                    product.pk = existing[product.sku]
+                    product.updated_at = now
+                    to_update.append(product)
+                else:
+                    to_create.append(product)
+            Product.objects.bulk_update(to_update, list(fields), batch_size=self.batch_size)
+        Product.objects.bulk_create(to_create, batch_size=self.batch_size)
+
+    def after_import(self):
+        # bulk_create/bulk_update không gửi signal: làm mới cache và index một lần
+        cache.bump_version()
+        product_index.clear()
+        product_suggester.clear()
+        low_stock_tracker.clear()
@@ -0,0 +1,201 @@
+"""
+Dịch vụ tồn kho: giữ/trả hàng cho cả giỏ hàng theo kiểu all-or-nothing.
+
+Mọi thay đổi tồn kho đều là UPDATE có điều kiện với F(), không đọc-sửa-ghi
+trên instance, nên nhiều checkout song song không thể bán vượt tồn kho.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from . import cache
+from .low_stock import get_states, product_state, record_changes
+from .models import Product
+from .signals import stock_changed
+
+# Giới hạn của PositiveIntegerField
+MAX_QUANTITY = 2147483647
+
+
+class InsufficientStock(Exception):
+    """Không đủ tồn kho cho ít nhất một sản phẩm trong giỏ hàng"""
+
+    def __init__(self, shortages, products=None):
+        # shortages: {product_id: số lượng còn trong kho}
+        self.shortages = shortages
+        self.products = products or {}
+        super().__init__(self.message)
+
+    @property
+    def message(self):
+        messages = []
+        for product_id, available in self.shortages.items():
+            product = self.products.get(product_id)
+            if product is None:
+                messages.append(f'Sản phẩm #{product_id} không tồn tại')
+            else:
+                messages.append(f'Chỉ còn {available} sản phẩm "{product.name}" trong kho')
+        return '; '.join(messages)
+
+
+def aggregate_quantities(lines):
+    """Gộp các dòng (product_id, quantity) trùng sản phẩm"""
+    quantities = defaultdict(int)
+    for product_id, quantity in lines:
+        quantities[int(product_id)] += int(quantity)
+    return dict(quantities)
+
+
+def _quantity_case(quantities):
+    return Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def reserve(quantities):
+    """
+    Giữ hàng cho cả giỏ: khóa các product bằng 1 query select_for_update,
+    rồi trừ stock/quantity bằng 1 câu UPDATE ... WHERE stock >= số lượng.
+    Thiếu hàng ở bất kỳ dòng nào thì không trừ dòng nào (raise InsufficientStock).
+    Trả về dict {product_id: Product} với tồn kho đã được cập nhật.
+    """
+    if not quantities:
+        return {}
+
+    with transaction.atomic():
+        # Chỉ khóa dòng product; category lấy kèm để tính ngưỡng sắp hết hàng
+        products = Product.objects.select_for_update(of=('self',)).select_related('category').in_bulk(
+            list(quantities)
+        )
+        shortages = {
+            product_id: products[product_id].stock if product_id in products else 0
+            for product_id, quantity in quantities.items()
+            if product_id not in products or products[product_id].stock < quantity
+        }
+        if shortages:
+            raise InsufficientStock(shortages, products)
+
+        ordered = _quantity_case(quantities)
+        updated = Product.objects.filter(pk__in=list(quantities), stock__gte=ordered).update(
+            stock=F('stock') - ordered,
+            quantity=F('quantity') - ordered,
+            updated_at=timezone.now(),
+        )
+        if updated != len(quantities):
+            # Chỉ xảy ra khi DB không hỗ trợ khóa dòng; rollback toàn bộ giỏ hàng
+            raise InsufficientStock(
+                {product_id: products[product_id].stock for product_id in quantities},
+                products,
+            )
+
+        before = {product_id: product_state(products[product_id]) for product_id in quantities}
+        for product_id, quantity in quantities.items():
+            products[product_id].stock -= quantity
+            products[product_id].quantity -= quantity
+        record_changes(before, {product_id: product_state(products[product_id]) for product_id in quantities})
+
+    levels = {product_id: products[product_id].quantity for product_id in quantities}
+    transaction.on_commit(lambda: stock_changed.send(sender=Product, levels=levels))
+    # Cache catalog chứa quantity/stock: bỏ cache cũ khi đơn đã commit
+    transaction.on_commit(cache.bump_version)
+    return products
+
+
+def release(quantities):
+    """
+    Trả lại hàng đã giữ (đơn bị hủy/hết hạn): 1 câu UPDATE stock = stock + số lượng,
+    không khóa trước nên không chờ các checkout đang giữ dòng product.
+    Trả về dict {product_id: quantity mới}
+    """
+    if not quantities:
+        return {}
+
+    with transaction.atomic():
+        released = _quantity_case(quantities)
+        Product.objects.filter(pk__in=list(quantities)).update(
+            stock=F('stock') + released,
+            quantity=F('quantity') + released,
+            updated_at=timezone.now(),
+        )
+        # Dòng đã bị UPDATE khóa: tồn kho trước đó = tồn kho mới - số lượng trả
+        after = get_states(Product.objects.filter(pk__in=list(quantities)))
+        before = {
+            product_id: dict(state, quantity=state['quantity'] - quantities[product_id])
+            for product_id, state in after.items()
+        }
+        record_changes(before, after)
+        levels = {product_id: state['quantity'] for product_id, state in after.items()}
+        transaction.on_commit(lambda: stock_changed.send(sender=Product, levels=levels))
+        # Gọi trong transaction ngoài (sweeper): chỉ vô hiệu hóa cache khi đã commit
+        transaction.on_commit(cache.bump_version)
+    return levels
+
+
+def adjust(changes):
+    """
+    Điều chỉnh tồn kho hàng loạt trong 1 transaction.
+    changes: [{'id': 1, 'quantity': 10}, {'id': 2, 'delta': -3}, ...]
+    Dòng hợp lệ được ghi bằng 1 câu UPDATE ... CASE WHEN; dòng lỗi
+    (không tồn tại, âm kho, sai định dạng) được bỏ qua và báo lại.
+    Trả về danh sách kết quả theo thứ tự đầu vào:
+    {'id': 1, 'quantity': 10} hoặc {'id': 2, 'error': '...'}
+    """
+    parsed = []
+    for change in changes:
+        try:
+            product_id = int(change['id'])
+            if 'quantity' in change:
+                parsed.append((product_id, 'quantity', int(change['quantity'])))
+            elif 'delta' in change:
+                parsed.append((product_id, 'delta', int(change['delta'])))
+            else:
+                parsed.append((product_id, None, 'Cần quantity hoặc delta'))
+        except (KeyError, TypeError, ValueError):
+            parsed.append((change.get('id') if isinstance(change, dict) else None, None, 'Dữ liệu không hợp lệ'))
+
+    results = []
+    levels = {}
+    with transaction.atomic():
+        ids = [product_id for product_id, kind, _ in parsed if kind is not None]
+        states = get_states(Product.objects.filter(pk__in=ids), lock=True)
+        current = {product_id: state['quantity'] for product_id, state in states.items()}
+
+        for product_id, kind, value in parsed:
+            if kind is None:
+                results.append({'id': product_id, 'error': value})
+                continue
+            if product_id not in current:
+                results.append({'id': product_id, 'error': 'Sản phẩm không tồn tại'})
+                continue
+
+            quantity = value if kind == 'quantity' else current[product_id] + value
+            if quantity < 0:
+                results.append({'id': product_id, 'error': f'Số lượng không thể âm (hiện có {current[product_id]})'})
+                continue
+            if quantity > MAX_QUANTITY:
+                results.append({'id': product_id, 'error': f'Số lượng tối đa là {MAX_QUANTITY}'})
+                continue
+
+            # Cùng id xuất hiện nhiều lần: các delta cộng dồn theo thứ tự
+            current[product_id] = quantity
+            levels[product_id] = quantity
+            results.append({'id': product_id, 'quantity': quantity})
+
+        if levels:
+            new_quantity = _quantity_case(levels)
+            Product.objects.filter(pk__in=list(levels)).update(
+                quantity=new_quantity,
+                stock=new_quantity,
+                updated_at=timezone.now(),
+            )
+            record_changes(states, {
+                product_id: dict(states[product_id], quantity=quantity) for product_id, quantity in levels.items()
+            })
+            transaction.on_commit(lambda: stock_changed.send(sender=Product, levels=levels))
+            # 1 lần cho cả lô thay vì 1 lần cho mỗi sản phẩm, chỉ khi đã commit
+            transaction.on_commit(cache.bump_version)
+
+    return results
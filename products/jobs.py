@@ -0,0 +1,8 @@
+from tasks.queue import task
+
+from . import low_stock
+
+
+@task('products.low_stock_events')
+def low_stock_events(payload):
+    low_stock.emit(payload['sink'], payload['events'])
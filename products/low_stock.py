@@ -0,0 +1,307 @@
+"""
+Cảnh báo sản phẩm sắp hết hàng.
+
+Ngưỡng của mỗi sản phẩm: Product.low_stock_threshold, nếu trống thì
+Category.low_stock_threshold, nếu trống nữa thì LOW_STOCK_DEFAULT_THRESHOLD.
+
+Sự kiện: mỗi nơi ghi tồn kho (products.inventory, Product.save, import, đổi
+ngưỡng danh mục) đọc trạng thái trước/sau của sản phẩm và gọi record_changes().
+Sản phẩm vượt qua ngưỡng (xuống dưới hoặc được nhập lại) có một sự kiện đưa vào
+hàng đợi task trong cùng transaction, tới các sink trong LOW_STOCK_SINKS.
+
+Đọc danh sách: LowStockTracker giữ các sản phẩm dưới ngưỡng (còn bán,
+quantity <= ngưỡng) đã sắp xếp theo tồn kho, không cần truy vấn database. Nạp
+khi có người xem danh sách (GET low_stock) rồi cập nhật qua signal của
+product/category và stock_changed; trước lần nạp đầu, các signal bỏ qua. Signal
+chỉ tới process hiện tại nên danh sách được nạp lại sau LOW_STOCK_INDEX_TTL giây.
+"""
+import bisect
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.request
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from tasks.queue import enqueue
+
+logger = logging.getLogger(__name__)
+
+LOW = 'low_stock'
+RESTOCKED = 'restocked'
+
+
+def default_threshold():
+    return getattr(settings, 'LOW_STOCK_DEFAULT_THRESHOLD', 10)
+
+
+def threshold_for(threshold, category_threshold):
+    if threshold is not None:
+        return threshold
+    return category_threshold if category_threshold is not None else default_threshold()
+
+
+def is_low(state):
+    return state['is_available'] and state['quantity'] <= state['threshold']
+
+
+def get_states(queryset, lock=False):
+    """
+    product_id -> trạng thái dùng để so ngưỡng (name, quantity, is_available, threshold).
+    lock=True: khóa dòng product (không khóa category) tới hết transaction
+    """
+    if lock:
+        queryset = queryset.select_for_update(of=('self',))
+    rows = queryset.values_list(
+        'id', 'name', 'quantity', 'is_available', 'low_stock_threshold', 'category__low_stock_threshold',
+    )
+    return {
+        product_id: {
+            'name': name,
+            'quantity': quantity,
+            'is_available': is_available,
+            'threshold': threshold_for(threshold, category_threshold),
+        }
+        for product_id, name, quantity, is_available, threshold, category_threshold in rows
+    }
+
+
+def product_state(product):
+    return {
+        'name': product.name,
+        'quantity': product.quantity,
+        'is_available': product.is_available,
+        'threshold': threshold_for(product.low_stock_threshold, product.category.low_stock_threshold),
+    }
+
+
+def record_changes(before, after):
+    """
+    So trạng thái trước/sau một lần ghi ({product_id: trạng thái}, sản phẩm mới
+    không có trong before) và gửi sự kiện cho các sản phẩm vượt ngưỡng.
+    Gọi trong transaction của lần ghi: task được commit cùng dữ liệu, rollback thì không báo
+    """
+    now = timezone.now().isoformat()
+    events = []
+    for product_id, state in after.items():
+        old = before.get(product_id)
+        was_low = old is not None and is_low(old)
+        if was_low == is_low(state):
+            continue
+        events.append({
+            'event': RESTOCKED if was_low else LOW,
+            'product_id': product_id,
+            'name': state['name'],
+            'quantity': state['quantity'],
+            'threshold': state['threshold'],
+            'at': now,
+        })
+    dispatch(events)
+    return events
+
+
+class LogSink:
+    """Ghi sự kiện ra logger products.low_stock"""
+
+    def emit(self, event):
+        logger.warning(
+            '%s: #%s %s còn %s (ngưỡng %s)',
+            event['event'], event['product_id'], event['name'], event['quantity'], event['threshold'],
+        )
+
+
+class WebhookSink:
+    """POST sự kiện dạng JSON tới LOW_STOCK_WEBHOOK_URL (bỏ qua nếu chưa cấu hình)"""
+
+    def __init__(self, url=None, timeout=2):
+        self.url = url or getattr(settings, 'LOW_STOCK_WEBHOOK_URL', None)
+        self.timeout = timeout
+
+    def emit(self, event):
+        if not self.url:
+            logger.debug('Webhook chưa cấu hình, bỏ qua: %s', event)
+            return
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(event, ensure_ascii=False).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except OSError as exc:
+            logger.error('Gửi webhook tồn kho thất bại: %s', exc)
+            raise
+
+
+class QueueSink:
+    """Đưa sự kiện vào hàng đợi trong process cho consumer khác đọc"""
+
+    events = queue.Queue(maxsize=10000)
+
+    def emit(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            logger.warning('Hàng đợi sự kiện tồn kho đầy, bỏ sự kiện #%s', event['product_id'])
+
+
+# Sink đã khởi tạo, theo đường dẫn trong LOW_STOCK_SINKS
+_sinks = {}
+
+
+def get_sink_paths():
+    return getattr(settings, 'LOW_STOCK_SINKS', ['products.low_stock.LogSink'])
+
+
+def get_sink(path):
+    if path not in _sinks:
+        _sinks[path] = import_string(path)()
+    return _sinks[path]
+
+
+def dispatch(events):
+    """Đưa sự kiện vào hàng đợi task (products.jobs), mỗi sink một task để sink lỗi được chạy lại riêng"""
+    if not events:
+        return
+    for path in get_sink_paths():
+        enqueue('products.low_stock_events', {'sink': path, 'events': events})
+
+
+def emit(path, events):
+    """Gửi sự kiện tới một sink (chạy trong worker); lỗi được raise để task chạy lại"""
+    sink = get_sink(path)
+    for event in events:
+        sink.emit(event)
+
+
+class LowStockTracker:
+    """Danh sách sản phẩm dưới ngưỡng trong bộ nhớ, chỉ dùng để đọc (không gửi sự kiện)"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # product_id -> thông tin sản phẩm (cùng dạng ProductListSerializer + threshold)
+            self._products = {}
+            # Các sản phẩm dưới ngưỡng, sắp xếp theo (quantity, id)
+            self._low = []
+            self._built_at = None
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def build(self):
+        from .models import Product
+
+        rows = Product.objects.values_list(
+            'id', 'sku', 'name', 'category__name', 'price', 'quantity', 'is_available',
+            'low_stock_threshold', 'category__low_stock_threshold',
+        )
+        products = {}
+        low = []
+        for row in rows.iterator(chunk_size=2000):
+            entry = self._entry(*row)
+            products[entry['id']] = entry
+            if is_low(entry):
+                low.append((entry['quantity'], entry['id']))
+        low.sort()
+
+        with self._lock:
+            self._products = products
+            self._low = low
+            self._built_at = time.monotonic()
+
+    def is_stale(self):
+        ttl = getattr(settings, 'LOW_STOCK_INDEX_TTL', None)
+        return self._built_at is None or bool(ttl and time.monotonic() - self._built_at > ttl)
+
+    def ensure_built(self):
+        if self.is_stale():
+            with self._lock:
+                if self.is_stale():
+                    self.build()
+
+    def _entry(self, product_id, sku, name, category_name, price, quantity, is_available,
+               threshold, category_threshold):
+        return {
+            'id': product_id,
+            'sku': sku,
+            'name': name,
+            'category_name': category_name,
+            'price': str(price),
+            'quantity': quantity,
+            'is_available': is_available,
+            'threshold': threshold_for(threshold, category_threshold),
+        }
+
+    def _set(self, entry):
+        """Thay entry của sản phẩm"""
+        old = self._products.get(entry['id'])
+        if old is not None and is_low(old):
+            self._low.remove((old['quantity'], old['id']))
+        self._products[entry['id']] = entry
+        if is_low(entry):
+            bisect.insort(self._low, (entry['quantity'], entry['id']))
+
+    def update(self, product, update_fields=None):
+        """Sau Product.save()"""
+        if not self.is_built:
+            return
+        category = product.category
+        entry = self._entry(
+            product.pk, product.sku, product.name, category.name, product.price, product.quantity,
+            product.is_available, product.low_stock_threshold, category.low_stock_threshold,
+        )
+        with self._lock:
+            old = self._products.get(product.pk)
+            if old is not None and update_fields is not None and 'quantity' not in update_fields:
+                # save() không ghi tồn kho: giá trị trên instance có thể đã cũ
+                entry['quantity'] = old['quantity']
+            self._set(entry)
+
+    def update_quantities(self, levels):
+        """Sau products.inventory (stock_changed): levels = {product_id: tồn kho mới}"""
+        with self._lock:
+            if not self.is_built:
+                return
+            for product_id, quantity in levels.items():
+                old = self._products.get(product_id)
+                if old is not None:
+                    self._set(dict(old, quantity=quantity))
+
+    def update_category(self, category):
+        """Đổi tên/ngưỡng danh mục: tính lại các sản phẩm thuộc danh mục"""
+        if not self.is_built:
+            return
+        from .models import Product
+
+        rows = Product.objects.filter(category=category).values_list('id', 'low_stock_threshold')
+        with self._lock:
+            for product_id, threshold in rows.iterator():
+                old = self._products.get(product_id)
+                if old is not None:
+                    threshold = threshold_for(threshold, category.low_stock_threshold)
+                    self._set(dict(old, category_name=category.name, threshold=threshold))
+
+    def remove(self, product_id):
+        with self._lock:
+            old = self._products.pop(product_id, None)
+            if old is not None and is_low(old):
+                self._low.remove((old['quantity'], old['id']))
+
+    def low_stock(self):
+        """Sản phẩm dưới ngưỡng, tồn kho thấp nhất trước"""
+        self.ensure_built()
+        with self._lock:
+            return [dict(self._products[product_id]) for _, product_id in self._low]
+
+
+low_stock_tracker = LowStockTracker()
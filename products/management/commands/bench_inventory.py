@@ -0,0 +1,103 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from products import inventory
+from products.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress test tồn kho: N luồng checkout song song vào cùng một sản phẩm "
+        "trên database đang cấu hình, kiểm tra không bán vượt tồn kho"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32, help='Số checkout song song')
+        parser.add_argument('--checkouts', type=int, default=20, help='Số checkout mỗi luồng')
+        parser.add_argument('--stock', type=int, default=200, help='Tồn kho ban đầu')
+        parser.add_argument('--quantity', type=int, default=1, help='Số lượng mỗi checkout')
+        parser.add_argument(
+            '--mode', choices=['engine', 'naive'], default='engine',
+            help="engine: products.inventory; naive: đọc-sửa-ghi product.save() như trước đây",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            raise CommandError('SQLite không hỗ trợ ghi song song, hãy chạy với MySQL/PostgreSQL')
+
+        threads = options['threads']
+        stock = options['stock']
+        quantity = options['quantity']
+        checkout = self.checkout_engine if options['mode'] == 'engine' else self.checkout_naive
+
+        category, _ = Category.objects.get_or_create(name='__bench_inventory__')
+        product = Product.objects.create(
+            name='Bench inventory', category=category, price=1, quantity=stock
+        )
+
+        results = {'sold': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            barrier.wait()
+            try:
+                for _ in range(options['checkouts']):
+                    try:
+                        ok = checkout(product.pk, quantity)
+                    except OperationalError:
+                        ok = None
+                    with lock:
+                        if ok is None:
+                            results['errors'] += 1
+                        elif ok:
+                            results['sold'] += 1
+                        else:
+                            results['rejected'] += 1
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db()
+        sold_units = results['sold'] * quantity
+        oversold = max(0, sold_units - stock)
+        drift = product.stock - (stock - sold_units)
+        total = threads * options['checkouts']
+
+        self.stdout.write(f"Mode:          {options['mode']}")
+        self.stdout.write(f'Checkouts:     {total} ({threads} luồng) trong {elapsed:.2f}s ({total / elapsed:.0f}/s)')
+        self.stdout.write(f"Thành công:    {results['sold']}  Hết hàng: {results['rejected']}  Lỗi DB: {results['errors']}")
+        self.stdout.write(f'Tồn kho:       {stock} -> {product.stock} (đã bán {sold_units})')
+
+        product.delete()
+        if not category.products.exists():
+            category.delete()
+
+        if oversold or drift:
+            raise CommandError(f'Bán vượt {oversold} sản phẩm, tồn kho lệch {drift} so với số đã bán')
+        self.stdout.write(self.style.SUCCESS('Không bán vượt tồn kho'))
+
+    def checkout_engine(self, product_id, quantity):
+        try:
+            inventory.reserve({product_id: quantity})
+        except inventory.InsufficientStock:
+            return False
+        return True
+
+    def checkout_naive(self, product_id, quantity):
+        product = Product.objects.get(pk=product_id)
+        if product.stock < quantity:
+            return False
+        product.quantity -= quantity
+        product.save()
+        return True
@@ -0,0 +1,94 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from products.models import Category, Product
+from products.search import ProductSearchIndex
+
+WORDS = [
+    'cà phê', 'trà', 'sữa', 'đường', 'bánh', 'kẹo', 'gạo', 'mì', 'nước mắm', 'dầu ăn',
+    'nước ngọt', 'bia', 'rau', 'thịt', 'cá', 'trứng', 'muối', 'tiêu', 'bột', 'đậu',
+    'xanh', 'đỏ', 'tươi', 'khô', 'hộp', 'gói', 'chai', 'lon', 'túi', 'thùng',
+    'đà lạt', 'hà nội', 'sài gòn', 'huế', 'nha trang', 'cao cấp', 'hữu cơ', 'nhập khẩu',
+]
+SYLLABLES = ['vi', 'na', 'mi', 'lo', 'ha', 'tan', 'kim', 'phu', 'an', 'thanh', 'long', 'minh', 'sa', 'co', 'hoa']
+QUERIES = ['ca phe', 'sữa tươi', 'banh', 'nuoc mam', 'da lat', 'hữu cơ', 'gao', 'tra xanh', 'bi', 'thung bia', 'vinami', 'kimlong sua']
+
+
+class Command(BaseCommand):
+    help = (
+        "So sánh ?search= kiểu cũ (icontains trên name, description) với inverted index "
+        "trên catalog tổng hợp; dữ liệu được tạo trong transaction và rollback sau khi chạy"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=3, help='Số lần lặp mỗi truy vấn')
+        parser.add_argument('--page-size', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['products'], options['batch_size'])
+            self.run(options['repeat'], options['page_size'])
+            transaction.set_rollback(True)
+
+    def seed(self, count, batch_size):
+        rng = random.Random(42)
+        # Thương hiệu tổng hợp để từ điển có kích thước gần với catalog thật
+        brands = [''.join(rng.sample(SYLLABLES, 3)) for _ in range(5000)]
+        categories = [
+            Category.objects.create(name=f'__bench_search__ {name}')
+            for name in ('Đồ uống', 'Bánh kẹo', 'Gia vị', 'Thực phẩm tươi')
+        ]
+
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            Product.objects.bulk_create([
+                Product(
+                    name=f"{' '.join(rng.sample(WORDS, 3)).capitalize()} {rng.choice(brands)}",
+                    description=' '.join(rng.sample(WORDS, 8)),
+                    category=rng.choice(categories),
+                    price=rng.randint(1, 500) * 1000,
+                    quantity=rng.randint(0, 100),
+                )
+                for _ in range(min(batch_size, count - offset))
+            ], batch_size=batch_size)
+        self.stdout.write(f'Tạo {count} sản phẩm: {time.perf_counter() - started:.1f}s')
+
+    def run(self, repeat, page_size):
+        index = ProductSearchIndex()
+        started = time.perf_counter()
+        index.build()
+        self.stdout.write(f'Build index: {time.perf_counter() - started:.1f}s')
+
+        self.stdout.write(f"{'query':<12}{'icontains (ms)':>16}{'index (ms)':>12}{'kết quả':>10}")
+        for query in QUERIES:
+            legacy = self.measure(repeat, lambda: self.legacy_search(query, page_size))
+            results = []
+            indexed = self.measure(repeat, lambda: results.append(self.index_search(index, query, page_size)))
+            self.stdout.write(f'{query:<12}{legacy:>16.1f}{indexed:>12.1f}{results[-1]:>10}')
+
+    def measure(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings)
+
+    def legacy_search(self, query, page_size):
+        # Tương đương SearchFilter với search_fields = ['name', 'description']
+        queryset = Product.objects.select_related('category').order_by('-created_at')
+        for term in query.split():
+            queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        queryset.count()
+        return list(queryset[:page_size])
+
+    def index_search(self, index, query, page_size):
+        product_ids = index.search(query, limit=1000)
+        list(Product.objects.select_related('category').filter(pk__in=product_ids[:page_size]))
+        return len(product_ids)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importers import PARSERS, ProductImporter, detect_format
+
+
+class Command(BaseCommand):
+    help = "Nhập/cập nhật sản phẩm theo SKU từ file CSV hoặc JSON/NDJSON của nhà cung cấp"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Đường dẫn file (CSV có header: sku,name,category,price,quantity,...)')
+        parser.add_argument('--format', choices=sorted(PARSERS), help='Mặc định đoán theo đuôi file')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--create-categories', action='store_true', help='Tự tạo danh mục chưa có')
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ kiểm tra, không ghi database')
+        parser.add_argument('--max-errors', type=int, default=50, help='Số lỗi in ra tối đa')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or detect_format(options['path'])
+        importer = ProductImporter(
+            batch_size=options['batch_size'],
+            create_categories=options['create_categories'],
+            dry_run=options['dry_run'],
+        )
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                result = importer.run(PARSERS[file_format](fileobj))
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for error in result.errors[:options['max_errors']]:
+            self.stderr.write(f"Dòng {error['row']} (sku={error['sku']}): {'; '.join(error['errors'])}")
+
+        action = 'Hợp lệ' if options['dry_run'] else 'Đã ghi'
+        self.stdout.write(
+            f'{action} {result.written}/{result.total} dòng, lỗi {len(result.errors)} '
+            f'trong {result.elapsed:.2f}s ({result.rows_per_second:.0f} dòng/s)'
+        )
+        if result.error:
+            raise CommandError(f'{result.error} (đã ghi {result.written} dòng trước đó)')
+        if result.errors:
+            raise CommandError(f'{len(result.errors)} dòng lỗi')
@@ -0,0 +1,169 @@
+import asyncio
+import math
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class HTTPClient:
+    """Client HTTP/1.1 keep-alive tối giản trên asyncio (không cần thư viện ngoài)"""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            await self.connect()
+        self.writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n'
+            f'Accept: application/json\r\nConnection: keep-alive\r\n\r\n'.encode()
+        )
+        await self.writer.drain()
+        return await asyncio.wait_for(self.read_response(), self.timeout)
+
+    async def read_response(self):
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip().lower()
+
+        if headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await self.reader.readexactly(int(headers.get('content-length', 0)))
+
+        if headers.get('connection') == 'close':
+            await self.close()
+        return status
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo throughput và độ trễ (p50/p90/p99) của các endpoint catalog ở độ đồng thời cao, "
+        "ví dụ so sánh viewset đồng bộ (WSGI) với endpoint async (ASGI)"
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', dest='targets', metavar='TÊN=URL',
+            help='Có thể lặp lại, ví dụ wsgi=http://127.0.0.1:8000/api/products/',
+        )
+        parser.add_argument(
+            '--base-url', default='http://127.0.0.1:8000',
+            help='Khi không có --target: so sánh /api/... với /api/async/... trên server này',
+        )
+        parser.add_argument('--product-id', type=int, default=1, help='Sản phẩm dùng cho endpoint chi tiết')
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=5000, help='Số request mỗi target')
+        parser.add_argument('--warmup', type=int, default=200)
+        parser.add_argument('--timeout', type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        targets = self.parse_targets(options)
+        self.stdout.write(
+            f"{'target':<22}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'lỗi':>8}"
+        )
+        for name, url in targets:
+            stats = asyncio.run(self.run(url, options))
+            self.stdout.write(
+                f"{name:<22}{stats['rps']:>10.0f}{stats['p50']:>10.1f}{stats['p90']:>10.1f}"
+                f"{stats['p99']:>10.1f}{stats['max']:>10.1f}{stats['errors']:>8}"
+            )
+
+    def parse_targets(self, options):
+        if options['targets']:
+            targets = []
+            for target in options['targets']:
+                name, sep, url = target.partition('=')
+                if not sep or not url.startswith('http://'):
+                    raise CommandError(f'--target không hợp lệ: {target} (TÊN=http://...)')
+                targets.append((name, url))
+            return targets
+
+        base = options['base_url'].rstrip('/')
+        product_id = options['product_id']
+        return [
+            ('products', f'{base}/api/products/'),
+            ('async products', f'{base}/api/async/products/'),
+            ('product detail', f'{base}/api/products/{product_id}/'),
+            ('async product detail', f'{base}/api/async/products/{product_id}/'),
+            ('categories', f'{base}/api/categories/'),
+            ('async categories', f'{base}/api/async/categories/'),
+            ('low_stock', f'{base}/api/products/low_stock/'),
+            ('async low_stock', f'{base}/api/async/products/low_stock/'),
+        ]
+
+    async def run(self, url, options):
+        parts = urlsplit(url)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        concurrency = options['concurrency']
+
+        async def worker(count, latencies, errors):
+            client = HTTPClient(parts.hostname, parts.port or 80, options['timeout'])
+            try:
+                for _ in range(count):
+                    started = time.perf_counter()
+                    try:
+                        status = await client.get(path)
+                        if status >= 400:
+                            errors.append(status)
+                    except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as exc:
+                        errors.append(exc)
+                        await client.close()
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                await client.close()
+
+        async def phase(total):
+            latencies = []
+            errors = []
+            counts = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(count, latencies, errors) for count in counts if count))
+            return latencies, errors, time.perf_counter() - started
+
+        if options['warmup']:
+            await phase(options['warmup'])
+        latencies, errors, elapsed = await phase(options['requests'])
+        latencies.sort()
+        return {
+            'rps': len(latencies) / elapsed if elapsed else 0.0,
+            'p50': self.percentile(latencies, 0.50),
+            'p90': self.percentile(latencies, 0.90),
+            'p99': self.percentile(latencies, 0.99),
+            'max': latencies[-1] * 1000 if latencies else 0.0,
+            'errors': len(errors),
+        }
+
+    def percentile(self, ordered, fraction):
+        if not ordered:
+            return 0.0
+        return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)] * 1000
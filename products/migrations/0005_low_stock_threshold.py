@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='low_stock_threshold',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='low_stock_threshold',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -1,8 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
+    low_stock_threshold = models.PositiveIntegerField(null=True, blank=True)  # Ngưỡng sắp hết hàng mặc định của danh mục
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -15,12 +16,14 @@ class Category(models.Model):
 
 
 class Product(models.Model):
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)  # Mã hàng của nhà cung cấp
     name = models.CharField(max_length=200)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField(default=0)  # Số lượng tồn kho
     stock = models.PositiveIntegerField(default=0)  # Alias cho quantity
+    low_stock_threshold = models.PositiveIntegerField(null=True, blank=True)  # Bỏ trống: dùng ngưỡng của danh mục
     image = models.ImageField(upload_to='products/', blank=True, null=True)
     is_available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -28,12 +31,61 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Danh sách mặc định / phân trang keyset
+            models.Index(fields=['-created_at', '-id'], name='product_created_idx'),
+            # ?category=&is_available= sắp xếp theo -created_at
+            models.Index(fields=['category', 'is_available', '-created_at'], name='product_cat_avail_idx'),
+            # low_stock: is_available=True, quantity <= threshold
+            models.Index(fields=['is_available', 'quantity'], name='product_avail_qty_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    STOCK_FIELDS = ('quantity', 'stock')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Ghi nhớ tồn kho lúc đọc để save() không ghi đè số liệu của checkout khác
+        instance._loaded_quantity = instance.__dict__.get('quantity')
+        return instance
+
     def save(self, *args, **kwargs):
         # Tự động đồng bộ quantity và stock
         if self.quantity != self.stock:
             self.stock = self.quantity
-        super().save(*args, **kwargs)
+
+        # Không đổi tồn kho thì không ghi lại quantity/stock (đã có thể bị
+        # products.inventory trừ đi trong lúc instance này được giữ trong bộ nhớ)
+        loaded_quantity = getattr(self, '_loaded_quantity', None)
+        if (
+            self.pk is not None
+            and loaded_quantity is not None
+            and self.quantity == loaded_quantity
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+            and not self._state.adding
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.STOCK_FIELDS
+            ]
+
+        from .low_stock import get_states, product_state, record_changes
+
+        with transaction.atomic():
+            # Trạng thái trước khi ghi (khóa dòng) để gửi sự kiện khi vượt ngưỡng sắp hết hàng
+            before = {}
+            if self.pk is not None and not self._state.adding:
+                before = get_states(Product.objects.filter(pk=self.pk), lock=True)
+            super().save(*args, **kwargs)
+
+            after = product_state(self)
+            update_fields = kwargs.get('update_fields')
+            if self.pk in before and update_fields is not None and 'quantity' not in update_fields:
+                # Không ghi tồn kho: tồn kho thật là giá trị trong database
+                after['quantity'] = before[self.pk]['quantity']
+            record_changes(before, {self.pk: after})
+        self._loaded_quantity = self.quantity
@@ -0,0 +1,175 @@
+"""
+Tìm kiếm sản phẩm bằng inverted index trong bộ nhớ.
+
+Token được chuẩn hóa (chữ thường, bỏ dấu tiếng Việt) từ tên, mô tả và tên
+danh mục. Index được nạp lần đầu khi có truy vấn và cập nhật dần qua
+signal khi product/category thay đổi (products/signals.py). Signal chỉ tới
+process hiện tại nên index được nạp lại sau PRODUCT_SEARCH_INDEX_TTL giây.
+"""
+import bisect
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Trọng số theo trường: khớp ở tên quan trọng hơn khớp ở mô tả
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'category': 2.0,
+    'description': 1.0,
+}
+
+# Số token tối đa được mở rộng cho một tiền tố (tránh tiền tố 1 ký tự quét cả từ điển)
+MAX_PREFIX_EXPANSION = 500
+
+
+def normalize(text):
+    """Chữ thường, bỏ dấu: 'Cà phê Đà Lạt' -> 'ca phe da lat'"""
+    text = unicodedata.normalize('NFD', text or '')
+    text = ''.join(ch for ch in text if unicodedata.category(ch) != 'Mn')
+    return text.replace('đ', 'd').replace('Đ', 'D').lower()
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text))
+
+
+class ProductSearchIndex:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built_at = None
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # token -> {product_id: trọng số}
+            self._postings = defaultdict(dict)
+            # product_id -> tập token (để xóa khi cập nhật)
+            self._documents = {}
+            self._tokens = []
+            self._built_at = None
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def build(self, queryset=None, chunk_size=2000):
+        """Nạp lại toàn bộ index từ database"""
+        from .models import Product
+
+        if queryset is None:
+            queryset = Product.objects.all()
+        rows = queryset.values_list('id', 'name', 'description', 'category__name')
+
+        with self._lock:
+            self.clear()
+            for product_id, name, description, category_name in rows.iterator(chunk_size=chunk_size):
+                self._add(product_id, name, description, category_name)
+            self._tokens = sorted(self._postings)
+            self._built_at = time.monotonic()
+
+    def ensure_built(self):
+        ttl = getattr(settings, 'PRODUCT_SEARCH_INDEX_TTL', 300)
+        if self._built_at is None or (ttl and time.monotonic() - self._built_at > ttl):
+            with self._lock:
+                if self._built_at is None or (ttl and time.monotonic() - self._built_at > ttl):
+                    self.build()
+
+    def add(self, product_id, name, description='', category_name=''):
+        """Thêm hoặc cập nhật một sản phẩm"""
+        with self._lock:
+            if not self.is_built:
+                return
+            self._remove(product_id)
+            for token in self._add(product_id, name, description, category_name):
+                index = bisect.bisect_left(self._tokens, token)
+                if index == len(self._tokens) or self._tokens[index] != token:
+                    self._tokens.insert(index, token)
+
+    def remove(self, product_id):
+        with self._lock:
+            if self.is_built:
+                self._remove(product_id)
+
+    def _add(self, product_id, name, description, category_name):
+        weights = defaultdict(float)
+        for field, text in (('name', name), ('category', category_name), ('description', description)):
+            for token in tokenize(text):
+                weights[token] += FIELD_WEIGHTS[field]
+
+        for token, weight in weights.items():
+            self._postings[token][product_id] = weight
+        self._documents[product_id] = set(weights)
+        return weights
+
+    def _remove(self, product_id):
+        for token in self._documents.pop(product_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[token]
+                index = bisect.bisect_left(self._tokens, token)
+                if index < len(self._tokens) and self._tokens[index] == token:
+                    del self._tokens[index]
+
+    def expand(self, term):
+        """Các token bắt đầu bằng term (tìm theo tiền tố cho autocomplete)"""
+        start = bisect.bisect_left(self._tokens, term)
+        end = bisect.bisect_left(self._tokens, term + '\uffff', lo=start)
+        return self._tokens[start:min(end, start + MAX_PREFIX_EXPANSION)]
+
+    def search(self, query, limit=None, prefix=True):
+        """
+        Trả về danh sách product_id khớp TẤT CẢ các từ trong query,
+        sắp xếp theo điểm (trọng số trường x idf) giảm dần
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        self.ensure_built()
+        with self._lock:
+            total = max(len(self._documents), 1)
+            scores = None
+            for term in dict.fromkeys(terms):
+                tokens = self.expand(term) if prefix else [term]
+                term_scores = defaultdict(float)
+                for token in tokens:
+                    postings = self._postings.get(token)
+                    if not postings:
+                        continue
+                    idf = math.log(1 + total / len(postings))
+                    # Khớp nguyên từ được ưu tiên hơn khớp tiền tố
+                    boost = 1.0 if token == term else 0.5
+                    for product_id, weight in postings.items():
+                        score = weight * idf * boost
+                        if score > term_scores[product_id]:
+                            term_scores[product_id] = score
+
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        product_id: score + term_scores[product_id]
+                        for product_id, score in scores.items()
+                        if product_id in term_scores
+                    }
+                if not scores:
+                    return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [product_id for product_id, _ in ranked]
+
+
+product_index = ProductSearchIndex()
@@ -7,10 +7,13 @@ class CategorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Category
-        fields = ['id', 'name', 'description', 'products_count', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'description', 'low_stock_threshold', 'products_count', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
     def get_products_count(self, obj):
+        # products_count được annotate sẵn trong CategoryViewSet
+        if hasattr(obj, 'products_count'):
+            return obj.products_count
         return obj.products.count()
 
 
@@ -20,8 +23,8 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'category', 'category_name', 'description',
-            'price', 'quantity', 'stock', 'image', 'is_available',
+            'id', 'sku', 'name', 'category', 'category_name', 'description',
+            'price', 'quantity', 'stock', 'low_stock_threshold', 'image', 'is_available',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at', 'stock']
@@ -36,6 +39,10 @@ class ProductSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Số lượng không thể âm")
         return value
 
+    def validate_sku(self, value):
+        # Lưu NULL thay vì chuỗi rỗng để không vi phạm unique
+        return value or None
+
 
 class ProductListSerializer(serializers.ModelSerializer):
     """Serializer đơn giản cho danh sách sản phẩm"""
@@ -43,5 +50,5 @@ class ProductListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'category_name', 'price', 'quantity', 'is_available']
+        fields = ['id', 'sku', 'name', 'category_name', 'price', 'quantity', 'is_available']
 
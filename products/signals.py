@@ -0,0 +1,98 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from . import cache
+from .low_stock import get_states, low_stock_tracker, record_changes
+from .models import Category, Product
+from .search import product_index
+from .suggest import product_suggester
+
+# Gửi sau khi commit các thay đổi tồn kho không đi qua Product.save()
+# (products.inventory). levels: {product_id: tồn kho mới}
+stock_changed = Signal()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Catalog thay đổi: tăng version để bỏ toàn bộ cache cũ"""
+    cache.bump_version()
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    product_index.add(instance.pk, instance.name, instance.description, instance.category.name)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    product_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created, **kwargs):
+    """Đổi tên danh mục: cập nhật token danh mục của các sản phẩm thuộc nó"""
+    if created or not product_index.is_built:
+        return
+    rows = Product.objects.filter(category=instance).values_list('id', 'name', 'description')
+    for product_id, name, description in rows.iterator():
+        product_index.add(product_id, name, description, instance.name)
+
+
+@receiver(post_save, sender=Product)
+def update_suggestions(sender, instance, **kwargs):
+    product_suggester.update(
+        instance.pk, instance.name, instance.price, instance.is_available, instance.quantity
+    )
+
+
+@receiver(post_delete, sender=Product)
+def remove_suggestions(sender, instance, **kwargs):
+    product_suggester.remove(instance.pk)
+
+
+@receiver(stock_changed)
+def update_suggestion_stock(sender, levels, **kwargs):
+    for product_id, quantity in levels.items():
+        product_suggester.update_quantity(product_id, quantity)
+
+
+@receiver(post_save, sender=Product)
+def track_low_stock(sender, instance, update_fields=None, **kwargs):
+    low_stock_tracker.update(instance, update_fields)
+
+
+@receiver(post_delete, sender=Product)
+def untrack_low_stock(sender, instance, **kwargs):
+    low_stock_tracker.remove(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def track_category_threshold(sender, instance, created, **kwargs):
+    if not created:
+        low_stock_tracker.update_category(instance)
+
+
+@receiver(pre_save, sender=Category)
+def load_threshold_states(sender, instance, **kwargs):
+    """Đổi ngưỡng danh mục: ghi nhớ trạng thái các sản phẩm trước khi lưu"""
+    instance._low_stock_before = None
+    if instance.pk is None:
+        return
+    threshold = Category.objects.filter(pk=instance.pk).values_list('low_stock_threshold', flat=True).first()
+    if threshold != instance.low_stock_threshold:
+        instance._low_stock_before = get_states(Product.objects.filter(category_id=instance.pk))
+
+
+@receiver(post_save, sender=Category)
+def record_threshold_crossings(sender, instance, **kwargs):
+    before = getattr(instance, '_low_stock_before', None)
+    if before:
+        record_changes(before, get_states(Product.objects.filter(category=instance)))
+
+
+@receiver(stock_changed)
+def track_low_stock_levels(sender, levels, **kwargs):
+    low_stock_tracker.update_quantities(levels)
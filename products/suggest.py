@@ -0,0 +1,170 @@
+"""
+Gợi ý sản phẩm khi gõ (typeahead) không cần truy vấn database.
+
+Mảng đã sắp xếp các khóa (tên chuẩn hóa, tính từ mỗi từ trong tên) được
+tìm theo tiền tố bằng bisect. Nạp ở truy vấn đầu tiên, sau đó cập nhật qua
+signal của product và stock_changed. Signal chỉ tới process hiện tại nên
+index được nạp lại sau PRODUCT_SUGGEST_INDEX_TTL giây.
+
+Kết quả xếp theo độ khớp: khớp nguyên từ trước khớp một phần từ, khớp ở đầu
+tên trước khớp ở từ sau, rồi tên ngắn hơn trước.
+"""
+import bisect
+import heapq
+import threading
+import time
+
+from django.conf import settings
+
+from .search import normalize
+
+# Số khóa tối đa được xét cho một tiền tố (tránh tiền tố 1 ký tự quét cả index)
+MAX_CANDIDATES = 1000
+
+
+class ProductSuggester:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # Các khóa đã sắp xếp và product_id tương ứng (2 mảng song song)
+            self._keys = []
+            self._ids = []
+            # product_id -> thông tin trả về cho client
+            self._products = {}
+            # product_id -> độ dài tên chuẩn hóa (để xếp hạng)
+            self._lengths = {}
+            self._built_at = None
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def build(self):
+        """
+        Nạp lại toàn bộ index. Đọc database trong lock để update() từ signal
+        chờ tới khi nạp xong, không bị ghi đè bởi dữ liệu vừa đọc
+        """
+        from .models import Product
+
+        with self._lock:
+            rows = Product.objects.values_list('id', 'name', 'price', 'is_available', 'quantity')
+            entries = []
+            products = {}
+            lengths = {}
+            for product_id, name, price, is_available, quantity in rows.iterator(chunk_size=2000):
+                products[product_id] = self._entry(product_id, name, price, is_available, quantity)
+                lengths[product_id] = len(' '.join(normalize(name).split()))
+                entries.extend((key, product_id) for key in self._keys_for(name))
+            entries.sort()
+
+            self._keys = [key for key, _ in entries]
+            self._ids = [product_id for _, product_id in entries]
+            self._products = products
+            self._lengths = lengths
+            self._built_at = time.monotonic()
+
+    def is_stale(self):
+        ttl = getattr(settings, 'PRODUCT_SUGGEST_INDEX_TTL', 300)
+        return self._built_at is None or bool(ttl and time.monotonic() - self._built_at > ttl)
+
+    def ensure_built(self):
+        if self.is_stale():
+            with self._lock:
+                if self.is_stale():
+                    self.build()
+
+    def _entry(self, product_id, name, price, is_available, quantity):
+        return {
+            'id': product_id,
+            'name': name,
+            'price': str(price),
+            'is_available': is_available,
+            'quantity': quantity,
+        }
+
+    def _keys_for(self, name):
+        """'Cà phê sữa' -> ['ca phe sua', 'phe sua', 'sua']: khớp từ bất kỳ trong tên"""
+        words = normalize(name).split()
+        return {' '.join(words[i:]) for i in range(len(words))}
+
+    def update(self, product_id, name, price, is_available, quantity):
+        with self._lock:
+            if not self.is_built:
+                return
+            self._remove(product_id)
+            self._products[product_id] = self._entry(product_id, name, price, is_available, quantity)
+            self._lengths[product_id] = len(' '.join(normalize(name).split()))
+            for key in self._keys_for(name):
+                index = bisect.bisect_left(self._keys, key)
+                self._keys.insert(index, key)
+                self._ids.insert(index, product_id)
+
+    def update_quantity(self, product_id, quantity):
+        with self._lock:
+            entry = self._products.get(product_id)
+            if entry is not None:
+                entry['quantity'] = quantity
+
+    def remove(self, product_id):
+        with self._lock:
+            if self.is_built:
+                self._remove(product_id)
+
+    def _remove(self, product_id):
+        entry = self._products.pop(product_id, None)
+        self._lengths.pop(product_id, None)
+        if entry is None:
+            return
+        for key in self._keys_for(entry['name']):
+            index = bisect.bisect_left(self._keys, key)
+            while index < len(self._keys) and self._keys[index] == key:
+                if self._ids[index] == product_id:
+                    del self._keys[index]
+                    del self._ids[index]
+                    break
+                index += 1
+
+    def suggest(self, query, limit=10):
+        """
+        Tối đa `limit` sản phẩm còn bán, còn hàng có tên chứa từ bắt đầu bằng
+        query, khớp tốt nhất trước
+        """
+        prefix = ' '.join(normalize(query).split())
+        if not prefix:
+            return []
+
+        self.ensure_built()
+        # product_id -> điểm (càng nhỏ càng khớp), lấy điểm tốt nhất trong các khóa
+        ranks = {}
+        with self._lock:
+            index = bisect.bisect_left(self._keys, prefix)
+            end = min(len(self._keys), index + MAX_CANDIDATES)
+            while index < end:
+                key = self._keys[index]
+                if not key.startswith(prefix):
+                    break
+                product_id = self._ids[index]
+                index += 1
+                entry = self._products[product_id]
+                if not entry['is_available'] or entry['quantity'] <= 0:
+                    continue
+                length = self._lengths[product_id]
+                rank = (
+                    # Khớp nguyên từ ('tra' với 'trà xanh') trước khớp một phần ('trái cây')
+                    0 if len(key) == len(prefix) or key[len(prefix)] == ' ' else 1,
+                    # Vị trí khớp trong tên: từ đầu tiên trước
+                    length - len(key),
+                    length,
+                    product_id,
+                )
+                if product_id not in ranks or rank < ranks[product_id]:
+                    ranks[product_id] = rank
+
+            best = heapq.nsmallest(limit, ranks.items(), key=lambda item: item[1])
+            return [dict(self._products[product_id]) for product_id, _ in best]
+
+product_suggester = ProductSuggester()
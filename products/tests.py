@@ -1,3 +1,684 @@
-from django.test import TestCase
+import tempfile
+from urllib.parse import urlencode
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from grocery_store import throttling
+from tasks.worker import run_pending
+
+from . import cache, inventory, low_stock
+from .importers import ProductImporter
+from .low_stock import QueueSink, low_stock_tracker
+from .models import Category, Product
+from .search import product_index
+from .suggest import product_suggester
+
+
+class CatalogQueryCountTests(APITestCase):
+    """Số query của mỗi endpoint phải cố định, không phụ thuộc số dòng"""
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['catalog'].clear()
+
+    def create_catalog(self, categories, products_per_category=3):
+        start = Category.objects.count()
+        for i in range(start, start + categories):
+            category = Category.objects.create(name=f'Danh mục {i}')
+            Product.objects.bulk_create([
+                Product(name=f'Sản phẩm {i}-{j}', category=category, price=10, quantity=5, stock=5)
+                for j in range(products_per_category)
+            ])
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_category_list_query_count_is_constant(self):
+        self.create_catalog(1)
+        small = self.count_queries('/api/categories/')
+        self.create_catalog(9)
+        large = self.count_queries('/api/categories/')
+        self.assertEqual(small, large)
+        self.assertEqual(large, 2)
+
+    def test_category_products_count(self):
+        self.create_catalog(1, products_per_category=4)
+        response = self.client.get('/api/categories/')
+        self.assertEqual(response.data['results'][0]['products_count'], 4)
+
+    def test_product_list_query_count_is_constant(self):
+        self.create_catalog(1)
+        small = self.count_queries('/api/products/')
+        self.create_catalog(5)
+        large = self.count_queries('/api/products/')
+        self.assertEqual(small, large)
+        self.assertEqual(large, 1)
+
+    def test_low_stock_query_count_is_constant(self):
+        self.client.force_authenticate(User.objects.create_user('staff', 'staff@example.com', 'password123'))
+        self.create_catalog(1)
+        # Lần đầu nạp danh sách sắp hết hàng (1 query), sau đó không query
+        low_stock_tracker.clear()
+        self.count_queries('/api/products/low_stock/')
+        small = self.count_queries('/api/products/low_stock/')
+        self.create_catalog(5)
+        large = self.count_queries('/api/products/low_stock/')
+        self.assertEqual(small, large)
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {'catalog': '3/min', 'search': '1/min', 'auth': '1/min'},
+})
+class ThrottleTests(APITestCase):
+
+    def setUp(self):
+        caches['catalog'].clear()
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password123')
+
+    def test_token_bucket_refills_over_time(self):
+        state, wait = None, 0
+        for _ in range(2):
+            state, wait = throttling.take(state, 2, 1 / 30, now=0)
+            self.assertEqual(wait, 0)
+        state, wait = throttling.take(state, 2, 1 / 30, now=0)
+        self.assertEqual(wait, 30)
+        self.assertEqual(throttling.take(state, 2, 1 / 30, now=15)[1], 15)
+        self.assertEqual(throttling.take(state, 2, 1 / 30, now=30)[1], 0)
+        self.assertEqual(throttling.parse_rate('60/min'), (60, 1))
+
+    def test_rejects_before_database_with_retry_after(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/products/?search=cafe').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/products/?search=tra')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(len(queries), 0)
+
+        # Bucket riêng cho mỗi scope và mỗi user
+        self.assertEqual(self.client.get('/api/products/').status_code, 200)
+        self.assertEqual(self.client.get('/api/products/').status_code, 429)
+        self.client.force_authenticate(User.objects.create_user('other', 'other@example.com', 'password123'))
+        self.assertEqual(self.client.get('/api/products/').status_code, 200)
+
+    def test_async_endpoints_share_catalog_bucket(self):
+        self.assertEqual(self.client.get('/api/products/').status_code, 200)
+        self.assertEqual(self.client.get('/api/async/products/').status_code, 200)
+        self.assertEqual(self.client.get('/api/async/categories/').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/async/products/low_stock/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(self.client.get('/api/products/').status_code, 429)
+
+    def test_auth_is_limited_per_ip_with_cache_store(self):
+        with override_settings(THROTTLE_STORE='grocery_store.throttling.CacheStore'):
+            self.assertIsInstance(throttling.get_store(), throttling.CacheStore)
+            credentials = {'username': 'buyer', 'password': 'wrong'}
+            self.assertEqual(self.client.post('/api/auth/login/', credentials).status_code, 401)
+            response = self.client.post('/api/auth/login/', credentials)
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('Retry-After', response)
+
+    def test_spoofed_forwarded_for_does_not_reset_ip_bucket(self):
+        credentials = {'username': 'buyer', 'password': 'wrong'}
+        self.assertEqual(self.client.post('/api/auth/login/', credentials).status_code, 401)
+        for address in ('10.0.0.1', '10.0.0.2, 127.0.0.1'):
+            response = self.client.post('/api/auth/login/', credentials, HTTP_X_FORWARDED_FOR=address)
+            self.assertEqual(response.status_code, 429)
+
+        # Sau 1 proxy tin cậy: IP do proxy ghi cuối X-Forwarded-For mới là client
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            response = self.client.post('/api/auth/login/', credentials, HTTP_X_FORWARDED_FOR='1.2.3.4, 10.0.0.3')
+            self.assertEqual(response.status_code, 401)
+            response = self.client.post('/api/auth/login/', credentials, HTTP_X_FORWARDED_FOR='5.6.7.8, 10.0.0.3')
+            self.assertEqual(response.status_code, 429)
+
+
+class CatalogCacheTests(APITestCase):
+
+    def setUp(self):
+        caches['catalog'].clear()
+        self.category = Category.objects.create(name='Rau củ')
+        self.product = Product.objects.create(name='Cà rốt', category=self.category, price=10, quantity=5)
+
+    def test_cached_list_skips_database(self):
+        self.client.get('/api/products/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 0)
+
+    def test_cache_key_includes_query_params(self):
+        self.client.get('/api/products/')
+        response = self.client.get('/api/products/', {'search': 'không có'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_save_invalidates_list_and_detail(self):
+        self.client.get('/api/products/')
+        self.client.get(f'/api/products/{self.product.pk}/')
+        self.product.name = 'Cà rốt Đà Lạt'
+        self.product.save()
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.data['results'][0]['name'], 'Cà rốt Đà Lạt')
+        response = self.client.get(f'/api/products/{self.product.pk}/')
+        self.assertEqual(response.data['name'], 'Cà rốt Đà Lạt')
+
+    def test_delete_invalidates_list(self):
+        self.client.get('/api/products/')
+        self.product.delete()
+        self.assertEqual(self.client.get('/api/products/').data['results'], [])
+
+    def test_category_change_invalidates_category_list(self):
+        self.client.get('/api/categories/')
+        Product.objects.create(name='Bắp cải', category=self.category, price=10, quantity=5)
+        response = self.client.get('/api/categories/')
+        self.assertEqual(response.data['results'][0]['products_count'], 2)
+
+    def test_conditional_get_returns_not_modified(self):
+        response = self.client.get(f'/api/products/{self.product.pk}/')
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+
+        response = self.client.get(f'/api/products/{self.product.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(f'/api/products/{self.product.pk}/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        self.product.save()
+        response = self.client.get(f'/api/products/{self.product.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_reserve_invalidates_cached_stock(self):
+        etag = self.client.get(f'/api/products/{self.product.pk}/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve({self.product.pk: 2})
+
+        response = self.client.get(f'/api/products/{self.product.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['quantity'], 3)
+
+
+class ProductSearchTests(APITestCase):
+
+    def setUp(self):
+        caches['catalog'].clear()
+        product_index.clear()
+        drinks = Category.objects.create(name='Đồ uống')
+        snacks = Category.objects.create(name='Bánh kẹo')
+        self.coffee = Product.objects.create(name='Cà phê sữa đá', category=drinks, price=10, quantity=5)
+        self.tea = Product.objects.create(
+            name='Trà xanh', category=drinks, description='Thơm vị cà phê', price=10, quantity=5
+        )
+        self.cake = Product.objects.create(name='Bánh quy bơ', category=snacks, price=10, quantity=5)
+
+    def search(self, term, **params):
+        response = self.client.get('/api/products/', {'search': term, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_unaccented_query_matches_and_ranks_name_first(self):
+        self.assertEqual(self.search('ca phe'), [self.coffee.pk, self.tea.pk])
+
+    def test_prefix_and_category_match(self):
+        self.assertEqual(self.search('banh'), [self.cake.pk])
+        self.assertEqual(self.search('do uon'), [self.tea.pk, self.coffee.pk])
+
+    def test_no_match(self):
+        self.assertEqual(self.search('sữa chua'), [])
+
+    def test_index_follows_save_and_delete(self):
+        self.search('ca phe')
+        self.cake.name = 'Bánh cà phê'
+        self.cake.save()
+        self.assertIn(self.cake.pk, self.search('ca phe'))
+        self.coffee.delete()
+        self.assertNotIn(self.coffee.pk, self.search('ca phe'))
+
+    def test_index_reloads_after_ttl(self):
+        self.search('banh')
+        # Process khác thêm sản phẩm: process này chỉ thấy sau khi hết TTL
+        Product.objects.bulk_create([
+            Product(name='Bánh mì', category=self.cake.category, price=10, quantity=5),
+        ])
+        self.assertEqual(product_index.search('banh mi'), [])
+        with self.settings(PRODUCT_SEARCH_INDEX_TTL=60):
+            product_index._built_at -= 61
+            self.assertEqual(len(product_index.search('banh mi')), 1)
+
+    def test_explicit_ordering_overrides_rank(self):
+        self.assertEqual(self.search('ca phe', ordering='name'), [self.coffee.pk, self.tea.pk])
+        self.assertEqual(self.search('ca phe', ordering='-name'), [self.tea.pk, self.coffee.pk])
+
+
+class ProductSuggestTests(APITestCase):
+
+    def setUp(self):
+        product_suggester.clear()
+        category = Category.objects.create(name='Đồ uống')
+        self.coffee = Product.objects.create(name='Cà phê sữa', category=category, price=10, quantity=5)
+        self.coffee_beans = Product.objects.create(name='Cà phê hạt', category=category, price=10, quantity=5)
+        self.sold_out = Product.objects.create(name='Cà pháo', category=category, price=10, quantity=0)
+        self.hidden = Product.objects.create(
+            name='Cà phê đá', category=category, price=10, quantity=5, is_available=False
+        )
+
+    def suggest(self, q, **params):
+        response = self.client.get('/api/products/suggest/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data]
+
+    def test_prefix_returns_available_products_without_queries(self):
+        self.suggest('ca')
+        with CaptureQueriesContext(connection) as queries:
+            ids = self.suggest('ca ph')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(ids, [self.coffee.pk, self.coffee_beans.pk])
+
+    def test_matches_any_word_and_limit(self):
+        self.assertEqual(self.suggest('sua'), [self.coffee.pk])
+        self.assertEqual(len(self.suggest('ca', limit=1)), 1)
+
+    def test_follows_product_changes(self):
+        self.suggest('ca')
+        self.coffee.name = 'Trà sữa'
+        self.coffee.save()
+        self.assertEqual(self.suggest('tra'), [self.coffee.pk])
+        self.assertNotIn(self.coffee.pk, self.suggest('ca'))
+        self.coffee_beans.delete()
+        self.assertEqual(self.suggest('ca'), [])
+
+    def test_ranks_by_match_quality(self):
+        category = self.coffee.category
+        milk = Product.objects.create(name='Sữa tươi', category=category, price=10, quantity=5)
+        fruit = Product.objects.create(name='Trái cây', category=category, price=10, quantity=5)
+        tea = Product.objects.create(name='Trà', category=category, price=10, quantity=5)
+        # Khớp ở đầu tên trước khớp ở từ sau, dù khóa 'sua' của cà phê sữa đứng trước
+        self.assertEqual(self.suggest('sua'), [milk.pk, self.coffee.pk])
+        self.assertEqual(self.suggest('sua', limit=1), [milk.pk])
+        # Khớp nguyên từ trước khớp một phần từ
+        self.assertEqual(self.suggest('tra'), [tea.pk, fruit.pk])
+
+    def test_reloads_after_ttl(self):
+        self.suggest('ca')
+        # Process khác đổi tồn kho: process này chỉ thấy sau khi hết TTL
+        Product.objects.filter(pk=self.coffee.pk).update(quantity=0, stock=0)
+        self.assertIn(self.coffee.pk, self.suggest('ca'))
+        with self.settings(PRODUCT_SUGGEST_INDEX_TTL=60):
+            product_suggester._built_at -= 61
+            self.assertEqual(self.suggest('ca'), [self.coffee_beans.pk])
+
+
+class BulkStockTests(APITestCase):
+
+    def setUp(self):
+        caches['catalog'].clear()
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        category = Category.objects.create(name='Đồ uống')
+        self.products = [
+            Product.objects.create(name=f'SP {i}', category=category, price=10, quantity=10)
+            for i in range(3)
+        ]
+
+    def test_applies_batch_and_reports_errors(self):
+        first, second, third = self.products
+        self.client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/products/bulk_stock/', {'items': [
+                {'id': first.pk, 'quantity': 3},
+                {'id': second.pk, 'delta': -4},
+                {'id': third.pk, 'delta': -11},
+                {'id': 999999, 'quantity': 1},
+            ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        # 1 câu UPDATE cho cả lô
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 1)
+
+        levels = dict(Product.objects.values_list('pk', 'stock'))
+        self.assertEqual(levels[first.pk], 3)
+        self.assertEqual(levels[second.pk], 6)
+        self.assertEqual(levels[third.pk], 10)
+
+    def test_requires_admin(self):
+        user = User.objects.create_user('user', password='x')
+        self.client.force_authenticate(user)
+        response = self.client.post(
+            '/api/products/bulk_stock/', [{'id': self.products[0].pk, 'quantity': 1}], format='json'
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class InventoryTests(APITestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Rau củ')
+        self.first = Product.objects.create(name='Cà rốt', category=category, price=10, quantity=5)
+        self.second = Product.objects.create(name='Bắp cải', category=category, price=10, quantity=2)
+
+    def stock(self, product):
+        return Product.objects.values_list('stock', 'quantity').get(pk=product.pk)
+
+    def test_reserve_shortage_decrements_nothing(self):
+        with self.assertRaises(inventory.InsufficientStock) as raised:
+            inventory.reserve({self.first.pk: 1, self.second.pk: 3})
+        self.assertEqual(raised.exception.shortages, {self.second.pk: 2})
+        self.assertEqual(self.stock(self.first), (5, 5))
+        self.assertEqual(self.stock(self.second), (2, 2))
+
+    def test_stale_instance_save_keeps_concurrent_decrement(self):
+        stale = Product.objects.get(pk=self.first.pk)
+        inventory.reserve({self.first.pk: 3})
+
+        stale.name = 'Cà rốt Đà Lạt'
+        stale.save()
+        self.assertEqual(self.stock(self.first), (2, 2))
+        self.assertEqual(Product.objects.get(pk=self.first.pk).name, 'Cà rốt Đà Lạt')
+
+    def test_adjust_bumps_cache_version_on_commit(self):
+        version = cache.get_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            inventory.adjust([{'id': self.first.pk, 'delta': -1}])
+            self.assertEqual(cache.get_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(cache.get_version(), version)
+
+
+class ProductImportTests(APITestCase):
+
+    def setUp(self):
+        caches['catalog'].clear()
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.category = Category.objects.create(name='Đồ uống')
+        self.existing = Product.objects.create(
+            sku='NUOC-1', name='Nước suối', category=self.category, price=5,
+            quantity=40, description='Chai 500ml', is_available=False,
+        )
+
+    def upsert(self, rows):
+        self.client.force_authenticate(self.admin)
+        response = self.client.post('/api/products/bulk_upsert/', rows, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def import_csv(self, content):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8') as fileobj:
+            fileobj.write(content)
+            fileobj.flush()
+            call_command('import_products', fileobj.name, stdout=mock.Mock(), stderr=mock.Mock())
+
+    def test_missing_columns_keep_existing_values(self):
+        result = self.upsert([{'sku': 'NUOC-1', 'name': 'Nước suối 500ml', 'category': 'Đồ uống', 'price': '6'}])
+        self.assertEqual((result['written'], result['failed']), (1, 0))
+
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.name, 'Nước suối 500ml')
+        self.assertEqual(str(self.existing.price), '6.00')
+        self.assertEqual((self.existing.quantity, self.existing.stock), (40, 40))
+        self.assertEqual(self.existing.description, 'Chai 500ml')
+        self.assertFalse(self.existing.is_available)
+
+    def test_csv_updates_present_columns_and_inserts_new_products(self):
+        # Ô quantity trống không bị hiểu thành 0
+        self.import_csv(
+            'sku,name,category,price,quantity\n'
+            'NUOC-1,Nước suối,Đồ uống,5,\n'
+            'NUOC-2,Nước ngọt,Đồ uống,12,30\n'
+        )
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.quantity, self.existing.description), (40, 'Chai 500ml'))
+
+        self.import_csv('sku,name,category,price,quantity,is_available\nNUOC-1,Nước suối,Đồ uống,5,7,1\n')
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.quantity, self.existing.stock, self.existing.is_available), (7, 7, True))
+
+        created = Product.objects.get(sku='NUOC-2')
+        self.assertEqual((created.quantity, created.stock, created.is_available, created.description), (30, 30, True, ''))
+
+    def test_without_upsert_support_uses_same_fields(self):
+        with mock.patch.object(connection.features, 'supports_update_conflicts', False):
+            self.upsert([
+                {'sku': 'NUOC-1', 'name': 'Nước suối', 'category': 'Đồ uống', 'price': '5', 'description': ''},
+                {'sku': 'NUOC-3', 'name': 'Trà xanh', 'category': 'Đồ uống', 'price': '9'},
+            ])
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.quantity, self.existing.description), (40, ''))
+        self.assertEqual(Product.objects.get(sku='NUOC-3').quantity, 0)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        result = self.upsert([
+            {'sku': 'NUOC-1', 'name': 'Nước suối', 'category': 'Đồ uống', 'price': '5', 'quantity': '-1'},
+            {'sku': '', 'name': 'Không mã', 'category': 'Không có', 'price': 'abc'},
+            {'sku': 'NUOC-4', 'name': 'Sữa', 'category': 'Đồ uống', 'price': '20', 'quantity': 'nhiều'},
+            {'sku': 'NUOC-5', 'name': 'Cà phê', 'category': 'Đồ uống', 'price': '25', 'quantity': '3'},
+        ])
+        self.assertEqual((result['total'], result['written'], result['failed']), (4, 1, 3))
+        self.assertEqual([error['row'] for error in result['errors']], [1, 2, 3])
+        self.assertEqual(len(result['errors'][1]['errors']), 3)
+        self.assertEqual(Product.objects.get(sku='NUOC-1').quantity, 40)
+        self.assertFalse(Product.objects.filter(sku='NUOC-4').exists())
+
+        with self.assertRaises(CommandError):
+            self.import_csv('sku,name,category,price\nNUOC-6,Bia,Không có,10\n')
+        self.assertFalse(Product.objects.filter(sku='NUOC-6').exists())
+
+    def upload(self, name, content, **params):
+        self.client.force_authenticate(self.admin)
+        upload = SimpleUploadedFile(name, content.encode('utf-8'))
+        return self.client.post(f'/api/products/bulk_upsert/?{urlencode(params)}', {'file': upload})
+
+    def test_broken_file_reports_rows_written_before_error(self):
+        version = cache.get_version()
+        product_index.build()
+        response = self.upload('products.ndjson', (
+            '{"sku": "NUOC-7", "name": "Bia", "category": "Đồ uống", "price": "15"}\n'
+            '{"sku": "NUOC-8", "name": "Rượu", "category": "Đồ uống", "price": "90"}\n'
+            '{"sku": "NUOC-9", "name": \n'
+        ), batch_size=1)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('dòng 3', response.data['error'])
+        self.assertEqual((response.data['total'], response.data['written']), (2, 2))
+        self.assertEqual(Product.objects.filter(sku__in=['NUOC-7', 'NUOC-8']).count(), 2)
+        # Các lô đã ghi vẫn làm mới cache và index
+        self.assertGreater(cache.get_version(), version)
+        self.assertFalse(product_index.is_built)
+
+    def test_malformed_csv_is_bad_request(self):
+        response = self.upload('products.csv', 'sku,name,category,price,description\n'
+                               f'NUOC-7,Bia,Đồ uống,15,"{"x" * 200000}"\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['written'], 0)
+        self.assertIn('File không hợp lệ', response.data['error'])
+
+
+class AsyncCatalogTests(APITestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Đồ uống')
+        self.products = [
+            Product.objects.create(name=f'SP {i}', category=category, price=10, quantity=i * 5)
+            for i in range(3)
+        ]
+
+    async def test_product_list_matches_sync_and_paginates(self):
+        response = await self.async_client.get('/api/async/products/', {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([row['id'] for row in data['results']], [self.products[2].pk, self.products[1].pk])
+        self.assertEqual(data['results'][0]['category_name'], 'Đồ uống')
+        self.assertEqual(data['results'][0]['price'], '10.00')
+
+        response = await self.async_client.get(data['next'])
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.products[0].pk])
+        self.assertIsNone(response.json()['next'])
+
+    async def test_detail_categories_and_low_stock(self):
+        response = await self.async_client.get(f'/api/async/products/{self.products[0].pk}/')
+        self.assertEqual(response.json()['name'], 'SP 0')
+        response = await self.async_client.get('/api/async/products/999999/')
+        self.assertEqual(response.status_code, 404)
+
+        response = await self.async_client.get('/api/async/categories/')
+        self.assertEqual(response.json()[0]['products_count'], 3)
+
+        response = await self.async_client.get('/api/async/products/low_stock/', {'threshold': 5})
+        self.assertEqual({row['id'] for row in response.json()}, {self.products[0].pk, self.products[1].pk})
+
+    async def test_invalid_cursor_is_bad_request(self):
+        for cursor in ('abc', '2025-13-45T00:00:00|5'):
+            response = await self.async_client.get('/api/async/products/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'cursor không hợp lệ'})
+
+    def test_same_payload_as_sync_endpoints(self):
+        caches['catalog'].clear()
+        low_stock_tracker.clear()
+        Product.objects.filter(pk=self.products[2].pk).update(low_stock_threshold=5)
+        pk = self.products[0].pk
+        pairs = [
+            (f'/api/products/{pk}/', f'/api/async/products/{pk}/'),
+            ('/api/products/low_stock/', '/api/async/products/low_stock/'),
+            ('/api/products/low_stock/?threshold=5', '/api/async/products/low_stock/?threshold=5'),
+        ]
+        for sync_url, async_url in pairs:
+            self.assertEqual(self.client.get(async_url).json(), self.client.get(sync_url).json())
+        self.assertEqual(
+            self.client.get('/api/async/categories/').json(),
+            self.client.get('/api/categories/').json()['results'],
+        )
+        # Ngưỡng riêng của sản phẩm được áp dụng như endpoint đồng bộ
+        ids = [row['id'] for row in self.client.get('/api/async/products/low_stock/').json()]
+        self.assertEqual(ids, [self.products[0].pk, self.products[1].pk])
+
+
+@override_settings(LOW_STOCK_SINKS=['products.low_stock.QueueSink'])
+class LowStockTrackerTests(APITestCase):
+
+    def setUp(self):
+        low_stock_tracker.clear()
+        low_stock._sinks.clear()
+        while not QueueSink.events.empty():
+            QueueSink.events.get_nowait()
+        self.client.force_authenticate(User.objects.create_user('staff', 'staff@example.com', 'password123'))
+        self.drinks = Category.objects.create(name='Đồ uống', low_stock_threshold=20)
+        self.snacks = Category.objects.create(name='Bánh kẹo')
+        self.milk = Product.objects.create(name='Sữa', category=self.drinks, price=10, quantity=15)
+        self.candy = Product.objects.create(name='Kẹo', category=self.snacks, price=10, quantity=15)
+        self.rice = Product.objects.create(
+            name='Gạo', category=self.snacks, price=10, quantity=40, low_stock_threshold=50
+        )
+        # Bỏ sự kiện của dữ liệu mẫu
+        self.events()
+
+    def low_stock_ids(self):
+        response = self.client.get('/api/products/low_stock/')
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data]
+
+    def events(self):
+        run_pending()
+        events = []
+        while not QueueSink.events.empty():
+            events.append(QueueSink.events.get_nowait())
+        return [(event['event'], event['product_id']) for event in events]
+
+    def test_uses_product_then_category_threshold_without_queries(self):
+        self.low_stock_ids()
+        with CaptureQueriesContext(connection) as queries:
+            ids = self.low_stock_ids()
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(ids, [self.milk.pk, self.rice.pk])
+
+    def test_explicit_threshold_queries_database(self):
+        response = self.client.get('/api/products/low_stock/', {'threshold': 15})
+        self.assertEqual({row['id'] for row in response.data}, {self.milk.pk, self.candy.pk})
+
+    def test_tracks_saves_and_checkout_and_emits_crossings(self):
+        self.low_stock_ids()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.candy.quantity = 5
+            self.candy.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.adjust([{'id': self.milk.pk, 'quantity': 30}, {'id': self.rice.pk, 'delta': -1}])
+        self.assertEqual(self.low_stock_ids(), [self.candy.pk, self.rice.pk])
+        self.assertEqual(self.events(), [('low_stock', self.candy.pk), ('restocked', self.milk.pk)])
+
+    def test_category_threshold_change(self):
+        self.low_stock_ids()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.snacks.low_stock_threshold = 15
+            self.snacks.save()
+        self.assertEqual(self.low_stock_ids(), [self.milk.pk, self.candy.pk, self.rice.pk])
+        self.assertEqual(self.events(), [('low_stock', self.candy.pk)])
+
+    def test_list_skips_updates_until_built_and_reloads_after_ttl(self):
+        product_table = f"FROM {connection.ops.quote_name('products_product')}"
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve({self.candy.pk: 10})
+        self.assertFalse(low_stock_tracker.is_built)
+        self.assertEqual(len([query for query in queries if product_table in query['sql']]), 1)
+        # Sự kiện không phụ thuộc danh sách trong bộ nhớ
+        self.assertEqual(self.events(), [('low_stock', self.candy.pk)])
+
+        self.assertEqual(self.low_stock_ids(), [self.candy.pk, self.milk.pk, self.rice.pk])
+        # Process khác đổi tồn kho: process này chỉ thấy sau khi hết TTL
+        Product.objects.filter(pk=self.milk.pk).update(quantity=30, stock=30)
+        with self.settings(LOW_STOCK_INDEX_TTL=60):
+            self.assertEqual(self.low_stock_ids(), [self.candy.pk, self.milk.pk, self.rice.pk])
+            low_stock_tracker._built_at -= 61
+            self.assertEqual(self.low_stock_ids(), [self.candy.pk, self.rice.pk])
+
+    def test_every_write_site_emits_crossings_without_built_list(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.release({self.milk.pk: 10})
+        self.assertEqual(self.events(), [('restocked', self.milk.pk)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.adjust([{'id': self.candy.pk, 'delta': -6}])
+        self.assertEqual(self.events(), [('low_stock', self.candy.pk)])
+
+        # save() không ghi tồn kho vẫn so với tồn kho trong database
+        stale = Product.objects.get(pk=self.rice.pk)
+        inventory.adjust([{'id': self.rice.pk, 'quantity': 60}])
+        self.events()
+        stale.low_stock_threshold = 55
+        stale.save()
+        self.assertEqual(self.events(), [])
+        stale.low_stock_threshold = 60
+        stale.save()
+        self.assertEqual(self.events(), [('low_stock', self.rice.pk)])
+
+        self.snacks.low_stock_threshold = 3
+        self.snacks.save()
+        self.assertEqual(self.events(), [('restocked', self.candy.pk)])
+
+        importer = ProductImporter()
+        Product.objects.filter(pk=self.milk.pk).update(sku='SUA-1')
+        importer.write([(
+            Product(sku='SUA-1', name='Sữa', category=self.drinks, price=10, quantity=2, stock=2),
+            ('name', 'category', 'price', 'quantity', 'stock', 'updated_at'),
+        )])
+        self.assertEqual(self.events(), [('low_stock', self.milk.pk)])
+        self.assertFalse(low_stock_tracker.is_built)
+
+    def test_rollback_emits_nothing(self):
+        with self.assertRaises(inventory.InsufficientStock):
+            inventory.reserve({self.candy.pk: 10, self.milk.pk: 100})
+        self.assertEqual(self.events(), [])
@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import ProductViewSet, CategoryViewSet
 
 router = DefaultRouter()
@@ -8,5 +9,10 @@ router.register(r'categories', CategoryViewSet, basename='category')
 
 urlpatterns = [
     path('', include(router.urls)),
-]
 
+    # Endpoint đọc async (chạy dưới ASGI)
+    path('async/products/', async_views.product_list, name='async-product-list'),
+    path('async/products/low_stock/', async_views.low_stock, name='async-product-low-stock'),
+    path('async/products/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('async/categories/', async_views.category_list, name='async-category-list'),
+]
@@ -1,27 +1,39 @@
+from django.conf import settings
 from django.shortcuts import render
+from django.db.models import Count
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
+from grocery_store.metrics import SerializerTimingMixin
+from grocery_store.pagination import KeysetOrPageNumberPagination
+from grocery_store.throttling import CatalogThrottle, SearchThrottle
+from .cache import CatalogCacheMixin
+from . import inventory
+from .filters import ProductOrderingFilter, ProductSearchFilter
+from .importers import PARSERS, ProductImporter, detect_format
+from .low_stock import low_stock_tracker
+from .suggest import product_suggester
 from .models import Product, Category
 from .serializers import ProductSerializer, ProductListSerializer, CategorySerializer
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(SerializerTimingMixin, CatalogCacheMixin, viewsets.ModelViewSet):
     """
     API endpoint cho quản lý categories
     """
-    queryset = Category.objects.all()
+    queryset = Category.objects.annotate(products_count=Count('products'))
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    throttle_classes = [CatalogThrottle, SearchThrottle]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(SerializerTimingMixin, CatalogCacheMixin, viewsets.ModelViewSet):
     """
     API endpoint cho quản lý products (CRUD)
     - List: GET /api/products/
@@ -33,11 +45,12 @@ class ProductViewSet(viewsets.ModelViewSet):
     """
     queryset = Product.objects.select_related('category').all()
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    throttle_classes = [CatalogThrottle, SearchThrottle]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, ProductOrderingFilter]
     filterset_fields = ['category', 'is_available']
-    search_fields = ['name', 'description']
     ordering_fields = ['name', 'price', 'quantity', 'created_at']
-    ordering = ['-created_at']
+    ordering = ['-created_at', '-id']
+    pagination_class = KeysetOrPageNumberPagination
 
     def get_serializer_class(self):
         """Sử dụng serializer khác nhau cho list và detail"""
@@ -72,12 +85,95 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def low_stock(self, request):
-        """Lấy danh sách sản phẩm sắp hết hàng"""
+        """
+        Lấy danh sách sản phẩm sắp hết hàng
+        - Mặc định: theo ngưỡng của từng sản phẩm/danh mục, lấy từ bộ nhớ (không truy vấn DB)
+        - ?threshold=N: cùng một ngưỡng cho mọi sản phẩm, truy vấn DB
+        """
+        if 'threshold' not in request.query_params:
+            return Response(low_stock_tracker.low_stock())
+
         threshold = int(request.query_params.get('threshold', 10))
         products = self.queryset.filter(quantity__lte=threshold, is_available=True)
         serializer = self.get_serializer(products, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk_upsert(self, request):
+        """
+        Nhập/cập nhật hàng loạt sản phẩm theo SKU
+        POST /api/products/bulk_upsert/
+        - multipart: file=<csv|json|ndjson>
+        - hoặc JSON body: [{"sku": ..., "name": ..., "category": "<tên>", "price": ..., "quantity": ...}]
+        Query: ?batch_size=1000&create_categories=1&dry_run=1
+        """
+        params = request.query_params
+        try:
+            batch_size = max(1, min(int(params.get('batch_size', 1000)), 10000))
+        except ValueError:
+            return Response({"error": "batch_size không hợp lệ"}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload = request.FILES.get('file')
+        if upload is not None:
+            rows = PARSERS[detect_format(upload.name, params.get('fmt', 'csv'))](upload.file)
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            return Response(
+                {"error": "Vui lòng gửi file hoặc danh sách sản phẩm"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        importer = ProductImporter(
+            batch_size=batch_size,
+            create_categories=params.get('create_categories') in ('1', 'true'),
+            dry_run=params.get('dry_run') in ('1', 'true'),
+        )
+        result = importer.run(rows)
+        if result.error:
+            # Các lô trước dòng lỗi đã được ghi: trả kèm báo cáo (written)
+            return Response(result.as_dict(), status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict())
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk_stock(self, request):
+        """
+        Cập nhật tồn kho hàng loạt trong 1 transaction
+        POST /api/products/bulk_stock/
+        Body: {"items": [{"id": 1, "quantity": 10}, {"id": 2, "delta": -3}]}
+        """
+        items = request.data.get('items') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"error": "Vui lòng cung cấp danh sách items"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_items = getattr(settings, 'BULK_STOCK_MAX_ITEMS', 10000)
+        if len(items) > max_items:
+            return Response(
+                {"error": f"Tối đa {max_items} sản phẩm mỗi lần"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = inventory.adjust(items)
+        return Response({
+            'updated': sum(1 for result in results if 'error' not in result),
+            'failed': sum(1 for result in results if 'error' in result),
+            'results': results,
+        })
+
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """
+        Gợi ý sản phẩm khi gõ, không truy vấn database
+        GET /api/products/suggest/?q=ca ph&limit=10
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            limit = 10
+        return Response(product_suggester.suggest(request.query_params.get('q', ''), limit=limit))
+
     @action(detail=True, methods=['post'])
     def update_stock(self, request, pk=None):
         """Cập nhật số lượng tồn kho"""
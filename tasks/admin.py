@@ -0,0 +1,23 @@
+from django.contrib import admin
+from .models import DeadLetter, Task
+from .queue import retry_dead_letters
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'created_at', 'finished_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['started_at', 'finished_at', 'locked_by', 'last_error', 'created_at']
+
+
+@admin.register(DeadLetter)
+class DeadLetterAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'attempts', 'error', 'failed_at']
+    list_filter = ['name']
+    readonly_fields = ['name', 'payload', 'attempts', 'error', 'created_at', 'failed_at']
+    actions = ['retry']
+
+    def retry(self, request, queryset):
+        count = retry_dead_letters(queryset)
+        self.message_user(request, f"Đã đưa {count} task trở lại hàng đợi")
+    retry.short_description = "Chạy lại"
@@ -0,0 +1,27 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from tasks.worker import Worker
+
+
+class Command(BaseCommand):
+    help = "Chạy worker xử lý hàng đợi task (tasks.Task); dừng an toàn bằng Ctrl+C/SIGTERM"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10, help='Số task khóa mỗi lượt')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Thời gian chờ khi hàng đợi trống (giây)')
+        parser.add_argument('--max-tasks', type=int, default=None, help='Dừng sau khi xử lý N task')
+        parser.add_argument('--once', action='store_true', help='Chạy các task đang đến hạn rồi dừng')
+
+    def handle(self, *args, **options):
+        worker = Worker(batch_size=options['batch_size'])
+        # Xong task đang chạy rồi mới dừng
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+
+        self.stdout.write(f'Worker {worker.name} bắt đầu')
+        processed = worker.run(
+            sleep=options['sleep'], max_tasks=options['max_tasks'], until_empty=options['once'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Worker dừng, đã xử lý {processed} task'))
@@ -0,0 +1,55 @@
+"""
+Số liệu hàng đợi: độ sâu theo trạng thái/tên task, tuổi task chờ lâu nhất,
+độ trễ (từ lúc đến hạn tới lúc worker bắt đầu chạy) và thời gian chạy của
+các task xong gần đây.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import DeadLetter, Task
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """Phân vị (giây) của danh sách số, làm tròn ms"""
+    if not values:
+        return {}
+    values = sorted(values)
+    result = {f'p{point}': round(values[min(len(values) * point // 100, len(values) - 1)], 3) for point in points}
+    result['max'] = round(values[-1], 3)
+    return result
+
+
+def snapshot(window=900, sample=10000):
+    """Số liệu hiện tại; độ trễ tính trên tối đa `sample` task xong trong `window` giây gần nhất"""
+    now = timezone.now()
+    depth = {'queued': 0, 'running': 0, 'done': 0}
+    by_name = {}
+    for row in Task.objects.values('status', 'name').annotate(count=Count('id')).order_by():
+        depth[row['status']] += row['count']
+        if row['status'] != 'done':
+            by_name.setdefault(row['name'], {'queued': 0, 'running': 0})[row['status']] += row['count']
+
+    oldest = Task.objects.filter(status='queued', run_at__lte=now).aggregate(oldest=Min('run_at'))['oldest']
+    finished = Task.objects.filter(
+        status='done', finished_at__gte=now - timedelta(seconds=window)
+    ).order_by('-finished_at').values_list('run_at', 'started_at', 'finished_at')[:sample]
+
+    latency = []
+    duration = []
+    for run_at, started_at, finished_at in finished:
+        latency.append(max((started_at - run_at).total_seconds(), 0))
+        duration.append((finished_at - started_at).total_seconds())
+
+    return {
+        'queued': depth['queued'],
+        'running': depth['running'],
+        'dead': DeadLetter.objects.count(),
+        'by_name': by_name,
+        'oldest_queued_seconds': round((now - oldest).total_seconds(), 3) if oldest else 0,
+        'window_seconds': window,
+        'completed': len(latency),
+        'latency_seconds': percentiles(latency),
+        'duration_seconds': percentiles(duration),
+    }
@@ -0,0 +1,46 @@
+from django.db import models
+
+
+class Task(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Đang chờ'),
+        ('running', 'Đang chạy'),
+        ('done', 'Hoàn thành'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField()  # Chưa tới giờ thì worker chưa lấy (retry có backoff)
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)  # host:pid của worker
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Worker lấy task: status='queued' AND run_at <= now ORDER BY run_at
+            models.Index(fields=['status', 'run_at'], name='task_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
+
+
+class DeadLetter(models.Model):
+    """Task thất bại quá max_attempts lần, giữ lại để xem và chạy lại"""
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField()  # Thời điểm task được tạo
+    failed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-failed_at']
+
+    def __str__(self):
+        return f"{self.name} ({self.failed_at})"
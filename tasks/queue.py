@@ -0,0 +1,111 @@
+"""
+Hàng đợi task lưu trong database, không cần broker ngoài.
+
+Mỗi app khai báo handler trong <app>/jobs.py:
+
+    @task('analytics.record_order')
+    def record_order(payload): ...
+
+và đưa việc vào hàng đợi bằng enqueue('analytics.record_order', {'order_id': 1}).
+Dòng Task được ghi trong cùng transaction với thay đổi gây ra nó, nên
+rollback thì task cũng biến mất và worker (run_worker) chỉ thấy task khi
+dữ liệu đã commit. TASKS_ALWAYS_EAGER=True: chạy handler ngay sau commit
+trong process hiện tại (không cần worker).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DeadLetter, Task
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def get_max_attempts():
+    return getattr(settings, 'TASKS_MAX_ATTEMPTS', 5)
+
+
+def is_eager():
+    return getattr(settings, 'TASKS_ALWAYS_EAGER', False)
+
+
+def task(name, max_attempts=None):
+    """Đăng ký handler nhận payload (dict); raise exception để được chạy lại"""
+    def decorator(func):
+        _handlers[name] = (func, max_attempts)
+        return func
+    return decorator
+
+
+def get_handler(name):
+    try:
+        return _handlers[name][0]
+    except KeyError:
+        raise KeyError(f'Chưa đăng ký task {name}')
+
+
+def enqueue(name, payload=None, delay=0):
+    """Đưa task vào hàng đợi (hoặc chạy sau commit nếu TASKS_ALWAYS_EAGER)"""
+    if name not in _handlers:
+        raise KeyError(f'Chưa đăng ký task {name}')
+    payload = payload or {}
+    if is_eager():
+        transaction.on_commit(lambda: run_eager(name, payload))
+        return None
+    return Task.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=_handlers[name][1] or get_max_attempts(),
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue_many(name, payloads, batch_size=1000):
+    """Như enqueue() cho nhiều payload, ghi bằng bulk_create; trả về số task"""
+    if name not in _handlers:
+        raise KeyError(f'Chưa đăng ký task {name}')
+    payloads = list(payloads)
+    if is_eager():
+        for payload in payloads:
+            transaction.on_commit(lambda payload=payload: run_eager(name, payload))
+        return len(payloads)
+    now = timezone.now()
+    max_attempts = _handlers[name][1] or get_max_attempts()
+    Task.objects.bulk_create(
+        (Task(name=name, payload=payload, max_attempts=max_attempts, run_at=now) for payload in payloads),
+        batch_size=batch_size,
+    )
+    return len(payloads)
+
+
+def run_eager(name, payload):
+    # Lỗi không được làm hỏng request đã commit: ghi vào dead-letter để chạy lại sau
+    try:
+        get_handler(name)(payload)
+    except Exception as exc:
+        logger.exception('Task %s lỗi', name)
+        DeadLetter.objects.create(
+            name=name, payload=payload, attempts=1, error=repr(exc), created_at=timezone.now()
+        )
+
+
+def retry_dead_letters(queryset):
+    """Đưa các task trong dead-letter trở lại hàng đợi; trả về số task"""
+    now = timezone.now()
+    count = 0
+    with transaction.atomic():
+        for letter in queryset.select_for_update():
+            Task.objects.create(
+                name=letter.name,
+                payload=letter.payload,
+                max_attempts=_handlers.get(letter.name, (None, None))[1] or get_max_attempts(),
+                run_at=now,
+            )
+            letter.delete()
+            count += 1
+    return count
@@ -0,0 +1,125 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from .models import DeadLetter, Task
+from .queue import enqueue, retry_dead_letters, task
+from .worker import Worker, run_pending
+
+calls = []
+
+
+@task('tests.record')
+def record(payload):
+    calls.append(payload['value'])
+
+
+@task('tests.flaky', max_attempts=2)
+def flaky(payload):
+    calls.append('flaky')
+    raise RuntimeError('lỗi tạm thời')
+
+
+class TaskQueueTests(APITestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_worker_runs_queued_tasks_in_order(self):
+        enqueue('tests.record', {'value': 1})
+        enqueue('tests.record', {'value': 2})
+        later = enqueue('tests.record', {'value': 3}, delay=60)
+
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(Task.objects.filter(status='done').count(), 2)
+        later.refresh_from_db()
+        self.assertEqual(later.status, 'queued')
+
+    def test_retries_with_backoff_then_dead_letter(self):
+        enqueue('tests.flaky')
+        with self.assertLogs('tasks.worker', level='WARNING'):
+            self.assertEqual(run_pending(), 1)
+        queued = Task.objects.get()
+        self.assertEqual((queued.status, queued.attempts), ('queued', 1))
+        self.assertIn('lỗi tạm thời', queued.last_error)
+        self.assertGreater(queued.run_at, timezone.now())
+
+        # Chưa tới hạn: worker không lấy
+        self.assertEqual(run_pending(), 0)
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('tasks.worker', level='ERROR'):
+            run_pending()
+        self.assertFalse(Task.objects.exists())
+        letter = DeadLetter.objects.get()
+        self.assertEqual((letter.name, letter.attempts), ('tests.flaky', 2))
+        self.assertEqual(calls, ['flaky', 'flaky'])
+
+        self.assertEqual(retry_dead_letters(DeadLetter.objects.all()), 1)
+        self.assertEqual(Task.objects.get().status, 'queued')
+
+    def test_requeues_stale_running_tasks(self):
+        stale = enqueue('tests.record', {'value': 1})
+        Task.objects.filter(pk=stale.pk).update(
+            status='running', started_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(Worker().requeue_stale(), 1)
+        run_pending()
+        self.assertEqual(calls, [1])
+
+    def test_started_at_is_per_task_and_requeued_tasks_are_skipped(self):
+        first = enqueue('tests.record', {'value': 1})
+        second = enqueue('tests.record', {'value': 2})
+        worker = Worker(batch_size=2)
+        claimed = worker.claim()
+
+        # Task thứ hai chờ trong lô quá lâu: worker khác trả lại hàng đợi
+        Task.objects.filter(pk=second.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(Worker().requeue_stale(), 1)
+
+        before = timezone.now()
+        with self.assertLogs('tasks.worker', level='INFO'):
+            self.assertEqual([worker.execute(task) for task in claimed], [True, False])
+        self.assertGreaterEqual(Task.objects.get(pk=first.pk).started_at, before)
+        run_pending()
+        self.assertEqual(calls, [1, 2])
+
+    def test_rolled_back_enqueue_is_discarded(self):
+        with self.assertRaises(ZeroDivisionError):
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    enqueue('tests.record', {'value': 1})
+                    1 / 0
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager_runs_after_commit(self):
+        with self.assertLogs('tasks.queue', level='ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertIsNone(enqueue('tests.record', {'value': 7}))
+                enqueue('tests.flaky')
+                self.assertEqual(calls, [])
+        self.assertEqual(calls, [7, 'flaky'])
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(DeadLetter.objects.get().name, 'tests.flaky')
+
+    def test_metrics_endpoint(self):
+        enqueue('tests.record', {'value': 1})
+        enqueue('tests.record', {'value': 2}, delay=60)
+        Worker(batch_size=1).run_once()
+
+        admin = User.objects.create_user('admin', 'admin@example.com', 'password123', is_staff=True)
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/tasks/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['queued'], 1)
+        self.assertEqual(response.data['completed'], 1)
+        self.assertEqual(response.data['by_name'], {'tests.record': {'queued': 1, 'running': 0}})
+        self.assertIn('p50', response.data['latency_seconds'])
+
+        self.client.force_authenticate(User.objects.create_user('buyer', 'buyer@example.com', 'password123'))
+        self.assertEqual(self.client.get('/api/tasks/metrics/').status_code, 403)
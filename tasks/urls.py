@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import queue_metrics
+
+urlpatterns = [
+    path('tasks/metrics/', queue_metrics, name='task-metrics'),
+]
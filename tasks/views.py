@@ -0,0 +1,19 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from . import metrics
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def queue_metrics(request):
+    """
+    Độ sâu hàng đợi và độ trễ xử lý task, chỉ dành cho admin
+    GET /api/tasks/metrics/?window=900 (giây)
+    """
+    try:
+        window = min(max(int(request.query_params.get('window', 900)), 1), 24 * 60 * 60)
+    except ValueError:
+        window = 900
+    return Response(metrics.snapshot(window=window))
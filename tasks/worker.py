@@ -0,0 +1,139 @@
+"""
+Worker lấy task từ bảng Task và chạy handler.
+
+Mỗi lượt, worker khóa một lô task đến hạn bằng SELECT ... FOR UPDATE SKIP
+LOCKED (nhiều worker chạy song song không lấy trùng), đánh dấu running rồi
+chạy từng task trong transaction riêng; started_at được ghi lại khi từng task
+bắt đầu chạy, không phải lúc cả lô được lấy. Task lỗi được chạy lại sau
+TASKS_RETRY_BACKOFF * 2^(lần thử - 1) giây; quá max_attempts thì chuyển
+sang DeadLetter. Task running quá TASKS_VISIBILITY_TIMEOUT giây (worker bị
+kill giữa chừng, hoặc task chờ quá lâu trong lô) được trả lại hàng đợi; worker
+đã lấy task đó sẽ bỏ qua thay vì chạy lần hai.
+"""
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DeadLetter, Task
+from .queue import get_handler
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'TASKS_RETRY_BACKOFF', 5)
+    return min(base * 2 ** (attempts - 1), getattr(settings, 'TASKS_RETRY_MAX_DELAY', 3600))
+
+
+class Worker:
+
+    def __init__(self, batch_size=10, name=None):
+        self.batch_size = batch_size
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+
+    def requeue_stale(self):
+        """Trả lại hàng đợi các task running quá lâu; trả về số task"""
+        timeout = getattr(settings, 'TASKS_VISIBILITY_TIMEOUT', 300)
+        return Task.objects.filter(
+            status='running', started_at__lt=timezone.now() - timedelta(seconds=timeout)
+        ).update(status='queued', locked_by='', run_at=timezone.now())
+
+    def purge_done(self):
+        """Xóa task đã xong cũ hơn TASKS_DONE_RETENTION giây (giữ lại để tính latency)"""
+        retention = getattr(settings, 'TASKS_DONE_RETENTION', 3600)
+        return Task.objects.filter(
+            status='done', finished_at__lt=timezone.now() - timedelta(seconds=retention)
+        ).delete()[0]
+
+    def claim(self):
+        now = timezone.now()
+        with transaction.atomic():
+            tasks = list(
+                Task.objects.select_for_update(skip_locked=True)
+                .filter(status='queued', run_at__lte=now)
+                .order_by('run_at', 'id')[:self.batch_size]
+            )
+            if tasks:
+                Task.objects.filter(pk__in=[task.pk for task in tasks]).update(
+                    status='running', locked_by=self.name, started_at=now, attempts=F('attempts') + 1
+                )
+        for task in tasks:
+            task.started_at = now
+            task.attempts += 1
+        return tasks
+
+    def execute(self, task):
+        started = timezone.now()
+        if not Task.objects.filter(pk=task.pk, status='running', locked_by=self.name).update(started_at=started):
+            # Đã bị requeue_stale trả lại hàng đợi khi đang chờ trong lô
+            logger.info('Task %s #%s đã được trả lại hàng đợi, bỏ qua', task.name, task.pk)
+            return False
+        task.started_at = started
+        try:
+            with transaction.atomic():
+                get_handler(task.name)(task.payload)
+        except Exception as exc:
+            self.fail(task, exc)
+            return False
+        Task.objects.filter(pk=task.pk).update(status='done', finished_at=timezone.now(), last_error='')
+        return True
+
+    def fail(self, task, exc):
+        error = f'{type(exc).__name__}: {exc}'
+        if task.attempts >= task.max_attempts:
+            logger.error('Task %s #%s thất bại sau %s lần: %s', task.name, task.pk, task.attempts, error)
+            with transaction.atomic():
+                DeadLetter.objects.create(
+                    name=task.name, payload=task.payload, attempts=task.attempts,
+                    error=error, created_at=task.created_at,
+                )
+                Task.objects.filter(pk=task.pk).delete()
+            return
+        delay = retry_delay(task.attempts)
+        logger.warning('Task %s #%s lỗi (lần %s), chạy lại sau %ss: %s', task.name, task.pk, task.attempts, delay, error)
+        Task.objects.filter(pk=task.pk).update(
+            status='queued', locked_by='', last_error=error,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+
+    def run_once(self):
+        """Chạy một lô task đến hạn; trả về số task đã xử lý"""
+        tasks = self.claim()
+        for task in tasks:
+            self.execute(task)
+        return len(tasks)
+
+    def run(self, sleep=1.0, max_tasks=None, until_empty=False, maintenance_every=60):
+        processed = 0
+        last_maintenance = None
+        while not self.stopping:
+            if last_maintenance is None or time.monotonic() - last_maintenance >= maintenance_every:
+                self.requeue_stale()
+                self.purge_done()
+                last_maintenance = time.monotonic()
+
+            count = self.run_once()
+            processed += count
+            if max_tasks and processed >= max_tasks:
+                break
+            if not count:
+                if until_empty:
+                    break
+                time.sleep(sleep)
+        return processed
+
+    def stop(self, *args):
+        self.stopping = True
+
+
+def run_pending(batch_size=100):
+    """Chạy hết các task đang đến hạn trong process hiện tại (dùng trong test, shell)"""
+    return Worker(batch_size=batch_size).run(until_empty=True)
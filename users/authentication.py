@@ -0,0 +1,131 @@
+"""
+Xác thực JWT không đọc bảng auth_user ở mỗi request.
+
+JWTAuthentication mặc định chạy SELECT user cho mọi request có token, trong
+khi các view chỉ dùng id và is_staff. CachedJWTAuthentication giữ user trong
+LRU có TTL (USER_CACHE_TTL giây, tối đa USER_CACHE_SIZE user); lưu hoặc xóa
+User (đổi profile, đổi mật khẩu, đổi quyền) thì bỏ user đó khỏi cache.
+
+AUTH_STATELESS_TOKENS = True: khi cache chưa có, user được dựng thẳng từ claim
+username/is_staff trong token (xem set_user_claims), không query database.
+Đổi quyền hoặc khóa tài khoản khi đó chỉ có hiệu lực với token cấp sau.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+USER_CLAIMS = ('username', 'is_staff')
+
+
+def set_user_claims(token, user):
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+def tokens_for_user(user):
+    """Cặp refresh/access token mang claim username, is_staff (access copy claim từ refresh)"""
+    refresh = set_user_claims(RefreshToken.for_user(user), user)
+    return {'access': str(refresh.access_token), 'refresh': str(refresh)}
+
+
+def token_user(token):
+    """User dựng từ claim, không có email/mật khẩu; đủ cho lọc theo user và kiểm tra is_staff"""
+    user = User(
+        pk=User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM]),
+        username=token['username'],
+        is_staff=token['is_staff'],
+        is_active=True,
+    )
+    user._state.adding = False
+    return user
+
+
+class UserCache:
+    """LRU {user_id: (hết hạn lúc, User)} dùng chung giữa các thread của process"""
+
+    def __init__(self, max_entries=None, ttl=None):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def max_entries(self):
+        return self._max_entries or getattr(settings, 'USER_CACHE_SIZE', 1024)
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else getattr(settings, 'USER_CACHE_TTL', 60)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def key(self, user_id):
+        # simplejwt ghi user_id trong token dạng chuỗi
+        return User._meta.pk.to_python(user_id)
+
+    def get(self, user_id):
+        """Bản sao của user trong cache (view sửa thoải mái), None nếu chưa có hoặc đã hết hạn"""
+        user_id = self.key(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return copy.copy(entry[1])
+
+    def set(self, user):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[user.pk] = (time.monotonic() + self.ttl, copy.copy(user))
+            self._entries.move_to_end(user.pk)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(self.key(user_id), None)
+
+    def load(self, user_id):
+        """Lấy từ cache, chưa có thì đọc database; None nếu user không tồn tại"""
+        user = self.get(user_id)
+        if user is None:
+            user = User.objects.filter(pk=user_id).first()
+            if user is not None:
+                self.set(user)
+        return user
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is not None:
+            user = user_cache.get(user_id)
+            if user is not None:
+                return user
+            if getattr(settings, 'AUTH_STATELESS_TOKENS', False) and all(
+                claim in validated_token for claim in USER_CLAIMS
+            ):
+                return token_user(validated_token)
+
+        # Chưa có trong cache: đường mặc định, user không tồn tại/bị khóa thì báo lỗi như simplejwt
+        user = super().get_user(validated_token)
+        user_cache.set(user)
+        return user
@@ -0,0 +1,12 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import user_cache
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Đổi profile/mật khẩu/quyền hoặc xóa user: request sau đọc lại từ database"""
+    user_cache.invalidate(instance.pk)
@@ -1,3 +1,73 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from .authentication import user_cache
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password123')
+
+    def login(self, username='buyer', password='password123'):
+        response = self.client.post('/api/auth/login/', {'username': username, 'password': password})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def user_queries(self, url, token):
+        # Chỉ đếm query đọc user (FROM auth_user), không tính JOIN của danh sách đơn hàng
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        table = f"FROM {connection.ops.quote_name('auth_user')} "
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len([query for query in queries if table in query['sql']])
+
+    def test_tokens_carry_user_claims(self):
+        access = AccessToken(self.login()['access'])
+        self.assertEqual((access['username'], access['is_staff']), ('buyer', False))
+
+        response = self.client.post('/api/auth/register/', {
+            'username': 'new', 'email': 'new@example.com', 'password': 'Str0ng-pass!', 'password2': 'Str0ng-pass!',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AccessToken(response.data['access'])['username'], 'new')
+
+    def test_user_is_cached_until_changed(self):
+        token = self.login()['access']
+        self.assertEqual(self.user_queries('/api/orders/', token), 1)
+        self.assertEqual(self.user_queries('/api/orders/', token), 0)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.user_queries('/api/orders/', token), 1)
+        self.assertTrue(user_cache.get(self.user.pk).is_staff)
+
+        response = self.client.put('/api/auth/change-password/', {
+            'old_password': 'password123', 'new_password': 'Str0ng-pass!',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(user_cache.get(self.user.pk))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/orders/').status_code, 401)
+
+    @override_settings(AUTH_STATELESS_TOKENS=True)
+    def test_stateless_mode_and_refresh_updates_claims(self):
+        tokens = self.login()
+        self.assertEqual(self.user_queries('/api/payment/', tokens['access']), 0)
+
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(AccessToken(response.data['access'])['is_staff'])
+
+        # Profile luôn đọc từ database, không trả dữ liệu thiếu của user dựng từ claim
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        self.assertEqual(self.client.get('/api/auth/profile/').data['email'], 'buyer@example.com')
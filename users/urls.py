@@ -1,12 +1,18 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from grocery_store.throttling import AuthThrottle
+from .serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from .views import RegisterView, UserProfileView, ChangePasswordView
 
 urlpatterns = [
     # Authentication
     path('register/', RegisterView.as_view(), name='register'),
-    path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('login/', TokenObtainPairView.as_view(
+        serializer_class=TokenObtainPairSerializer, throttle_classes=[AuthThrottle],
+    ), name='token_obtain_pair'),
+    path('token/refresh/', TokenRefreshView.as_view(
+        serializer_class=TokenRefreshSerializer, throttle_classes=[AuthThrottle],
+    ), name='token_refresh'),
 
     # User Profile
     path('profile/', UserProfileView.as_view(), name='user_profile'),
@@ -3,7 +3,8 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth.models import User
-from rest_framework_simplejwt.tokens import RefreshToken
+from grocery_store.throttling import AuthThrottle
+from .authentication import tokens_for_user
 from .serializers import RegisterSerializer, UserSerializer, ChangePasswordSerializer
 
 
@@ -19,6 +20,7 @@ class RegisterView(generics.CreateAPIView):
     """
     queryset = User.objects.all()
     permission_classes = [AllowAny]
+    throttle_classes = [AuthThrottle]
     serializer_class = RegisterSerializer
 
     def create(self, request, *args, **kwargs):
@@ -29,12 +31,9 @@ class RegisterView(generics.CreateAPIView):
         user = serializer.save()
 
         # Tạo JWT tokens
-        refresh = RefreshToken.for_user(user)
-
         return Response({
             'user': UserSerializer(user).data,
-            'access': str(refresh.access_token),
-            'refresh': str(refresh),
+            **tokens_for_user(user),
         }, status=status.HTTP_201_CREATED)
 
 
@@ -47,7 +46,8 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
 
     def get_object(self):
-        return self.request.user
+        # request.user có thể lấy từ cache/claim của token: đọc bản mới nhất trước khi sửa
+        return User.objects.get(pk=self.request.user.pk)
 
 
 class ChangePasswordView(generics.UpdateAPIView):
@@ -62,7 +62,7 @@ class ChangePasswordView(generics.UpdateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        user = request.user
+        user = User.objects.get(pk=request.user.pk)
 
         # Kiểm tra mật khẩu cũ
         if not user.check_password(serializer.validated_data['old_password']):